@@ -1,13 +1,19 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
+import os
 import sys
 import re
+import json
 import multiprocessing as mp
 
+import numpy as np
+
 import nlg.NlgSymbols as NlgSymbols
 
-from collections import defaultdict
+from collections import defaultdict, Counter
+from collections.abc import MutableMapping
+from scipy.sparse import csr_matrix, hstack, vstack
 
 from nlg.nlgCluster.Indistinguishables import Indistinguishables
 
@@ -18,6 +24,17 @@ __date__, __version__ = '10/04/2017', '1.0' # Creation
 __date__, __version__ = '30/08/2021', '1.1' # Add alphabet as an argument to fromFile method in Vectors.
 											 # Modifications of _build_vector method. Addition of a conditional statement for alphabet as an argument.
 __date__, __version__ = '10/12/2021', '1.2' # Introduce multiprocessing to utilise multi-core cpu
+__date__, __version__ = '17/10/2026', '1.3' # Vectors stored as a sparse count matrix (CSR) with a word to row index
+__date__, __version__ = '17/10/2026', '1.4' # Character counts and alphabet computed in one vectorized pass over all lines
+__date__, __version__ = '17/10/2026', '1.5' # Chunked process pool: dimensions shipped once per worker, sequential below a size threshold
+__date__, __version__ = '17/10/2026', '1.6' # Binary format (directory of .npy files, memory-mappable) besides the text .vec format
+__date__, __version__ = '17/10/2026', '1.7' # Incremental addition of words (add_words) with new dimensions appended
+__date__, __version__ = '17/10/2026', '1.8' # SIGMORPHON morph features and lemmas interned to integer ids and scattered into the matrix
+__date__, __version__ = '17/10/2026', '1.9' # Token features counted with a token to column dictionary, one Counter per line
+__date__, __version__ = '17/10/2026', '1.10' # Feature selection (select_features): keep the dimensions with highest variance or entropy
+__date__, __version__ = '17/10/2026', '1.11' # Constructor fromArray (used for anchor features)
+__date__, __version__ = '17/10/2026', '1.12' # Indistinguishables computed lazily, on first use, from the count matrix
+__date__, __version__ = '17/10/2026', '1.13' # New words added to the indistinguishables with Indistinguishables.add
 
 __description__ = 'Class for vector representation of string for nlgclu input'
 
@@ -26,8 +43,30 @@ __trace__ = False
 
 __morph_delimiter__ =';'
 
+__processes__ = None						# Number of worker processes (None: number of CPUs).
+__multiprocess_threshold__ = 50000		# Below this number of lines, the vectors are computed sequentially.
+__chunk_size__ = 5000					# Number of lines sent to a worker at once.
+
+__feature_criterion__ = 'variance'		# Ranking of the dimensions in select_features: 'variance' or 'entropy'.
+
+__binary_format__ = 'nlg-vectors'		# Name and version of the binary format written by Vectors.toBinary.
+__binary_version__ = 1
+
 ###############################################################################
-def parse_sigmorphon_file(lines, morph_delimiter=__morph_delimiter__):
+def parse_sigmorphon_file(lines, morph_delimiter=__morph_delimiter__, feature_ids=None):
+	"""
+	Parse lines in SIGMORPHON format (lemma, word form and features separated by tabs).
+	If a dictionary feature_ids is given, the features are interned while reading:
+	each feature is replaced by its integer id in feature_ids (new features get the next id).
+
+	>>> parse_sigmorphon_file(['go\\tgoes\\tV;3;SG;PRS'])
+	[('goes', 'go', ['V', '3', 'SG', 'PRS'])]
+	>>> feature_ids = {}
+	>>> parse_sigmorphon_file(['go\\tgoes\\tV;3;SG;PRS', 'go\\twent\\tV;PST'], feature_ids=feature_ids)
+	[('goes', 'go', (0, 1, 2, 3)), ('went', 'go', (0, 4))]
+	>>> list(feature_ids)
+	['V', '3', 'SG', 'PRS', 'PST']
+	"""
 	parsed_lines = []
 	unparsed_lines = []
 	for i, line in enumerate(lines):
@@ -35,6 +74,8 @@ def parse_sigmorphon_file(lines, morph_delimiter=__morph_delimiter__):
 		if len(splitted_line) == 3:
 			lemma, wordform, raw_features = splitted_line
 			features = raw_features.split(morph_delimiter)
+			if feature_ids is not None:
+				features = tuple( feature_ids.setdefault(feature, len(feature_ids)) for feature in features )
 			parsed_lines.append((wordform, lemma, features))
 		else:
 			unparsed_lines.append(line)
@@ -60,9 +101,119 @@ def print_duplicates(alphagrams):
 						NlgSymbols.duplicate,
 						word.replace(':','\\:')))
 
+def char_count_matrix(lines, alphabet=None):
+	"""
+	Count the characters of all lines in one pass.
+	All lines are encoded into one array of code points with line offsets,
+	the code points are mapped to symbol ids
+	and the counts are scattered into a sparse matrix (one row per line).
+	If no alphabet is given, it is computed in the same pass (sorted, as _build_char_dim does).
+	Characters not in a given alphabet are ignored.
+	Return the alphabet and the count matrix.
+
+	>>> alphabet, counts = char_count_matrix(['toto', 'tata', 'papa'])
+	>>> alphabet
+	['a', 'o', 'p', 't']
+	>>> counts.toarray().tolist()
+	[[0, 2, 0, 2], [2, 0, 0, 2], [2, 0, 2, 0]]
+	>>> alphabet, counts = char_count_matrix(['toto', 'tata', 'papa'], alphabet=['t', 'o'])
+	>>> counts.toarray().tolist()
+	[[2, 2], [2, 0], [0, 0]]
+	"""
+	offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+	np.cumsum(np.fromiter(map(len, lines), dtype=np.int64, count=len(lines)), out=offsets[1:])
+	codepoints = np.frombuffer(''.join(lines).encode('utf-32-le', errors='surrogatepass'), dtype=np.uint32)
+	rows = np.repeat(np.arange(len(lines), dtype=np.int64), np.diff(offsets))
+	if alphabet is None:
+		symbols, ids = np.unique(codepoints, return_inverse=True)
+		alphabet = [ chr(c) for c in symbols.tolist() ]
+	elif len(alphabet) == 0:
+		rows, ids = rows[:0], rows[:0]
+	else:
+		symbols = np.array([ ord(c) for c in alphabet ], dtype=np.uint32)
+		order = np.argsort(symbols, kind='stable')
+		positions = np.minimum(np.searchsorted(symbols[order], codepoints), len(symbols) - 1)
+		found = symbols[order][positions] == codepoints
+		rows, ids = rows[found], order[positions[found]]
+	counts = csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, ids.ravel())),
+						shape=(len(lines), len(alphabet)), dtype=np.int32)
+	counts.sum_duplicates()
+	return list(alphabet), counts
+
+# Dimensions of the current featurization, set once in each worker process by _init_worker.
+_worker_dimensions = None
+
+def _init_worker(dimensions):
+	""" Worker initializer: receive the dimension lists once instead of with each task """
+	global _worker_dimensions
+	_worker_dimensions = dimensions
+
+def _featurize_block(block, dimensions=None):
+	"""
+	Compute the vectors of a block of (line, feature ids, lemma id) triples
+	for the token, morph and lemma dimensions.
+	Tokens are counted once per line and looked up in token_ids (token to column).
+	Morph features and lemmas are interned:
+	the arrays morph_columns and lemma_columns give the column of each id,
+	so that a lemma costs one entry per word, whatever the number of lemmas.
+	Return the vectors as a sparse matrix, one row per line, in the order of the block.
+	"""
+	if dimensions is None: dimensions = _worker_dimensions
+	token_ids, token_delimiter, morph_columns, lemma_columns, width = dimensions
+	token_rows, token_columns, token_counts = [], [], []
+	morph_rows, morph_ids = [], []
+	lemma_rows, lemma_ids = [], []
+	for i, (line, feature_ids, lemma_id) in enumerate(block):
+		if token_ids:
+			for token, count in Counter(line.split(token_delimiter)).items():
+				j = token_ids.get(token)
+				if j is not None:
+					token_rows.append(i)
+					token_columns.append(j)
+					token_counts.append(count)
+		if morph_columns is not None:
+			morph_rows += [ i ] * len(feature_ids)
+			morph_ids += feature_ids
+			if lemma_columns is not None and lemma_id is not None:
+				lemma_rows.append(i)
+				lemma_ids.append(lemma_id)
+	rows = np.array(token_rows + morph_rows + lemma_rows, dtype=np.int64)
+	columns = np.concatenate([ np.array(token_columns, dtype=np.int64),
+		morph_columns[morph_ids] if morph_ids else np.zeros(0, dtype=np.int64),
+		lemma_columns[lemma_ids] if lemma_ids else np.zeros(0, dtype=np.int64) ])
+	data = np.concatenate([ np.array(token_counts, dtype=np.int32), np.ones(len(morph_ids) + len(lemma_ids), dtype=np.int32) ])
+	result = csr_matrix((data, (rows, columns)), shape=(len(block), width), dtype=np.int32)
+	result.sum_duplicates()
+	return result
+
+def featurize_blocks(triples, dimensions, multiprocess=True, processes=__processes__,
+					threshold=__multiprocess_threshold__, chunk_size=__chunk_size__, verbose=__verbose__):
+	"""
+	Compute the vectors of all (line, feature ids, lemma id) triples, block by block.
+	Under the threshold (or without multiprocessing), the blocks are computed in this process.
+	Otherwise, a pool of worker processes receives the dimensions once through its initializer
+	and returns the blocks in order.
+	The pool is closed and joined before returning.
+	"""
+	blocks = [ triples[i:i+chunk_size] for i in range(0, len(triples), chunk_size) ]
+	if not multiprocess or len(triples) < threshold or len(blocks) < 2:
+		results = [ _featurize_block(block, dimensions) for block in blocks ]
+	else:
+		processes = min(processes or mp.cpu_count(), len(blocks))
+		if verbose: print(f'# Multiprocessing pool: {processes} processes, {len(blocks)} blocks', file=sys.stderr)
+		pool = mp.Pool(processes, initializer=_init_worker, initargs=(dimensions,))
+		try:
+			results = pool.map(_featurize_block, blocks, chunksize=1)
+		finally:
+			pool.close()
+			pool.join()
+	if not results:
+		return csr_matrix((0, dimensions[-1]), dtype=np.int32)
+	return vstack(results, format='csr')
+
 ###############################################################################
 
-class Vectors(defaultdict):
+class Vectors(MutableMapping):
 
 	"""
 	Class for vector representations of strings.
@@ -73,12 +224,218 @@ class Vectors(defaultdict):
 		- Lemmas (mainly for SIGMORPHON file)
 
 	word: (value, value, value, ...)
+
+	Internally, the vectors are stored as a sparse count matrix (CSR),
+	one row per word, with a dictionary from words to row indices:
+		- self.words:	list of the words, in row order
+		- self.index:	word -> row in self.matrix
+		- self.matrix:	scipy.sparse.csr_matrix of shape (number of words, number of dimensions)
+	The mapping interface (vectors[word], vectors.items(), ...) returns tuples of integers as before.
+
+	>>> vectors = Vectors()
+	>>> vectors['toto'] = (0, 2, 2)
+	>>> vectors['tata'] = (2, 0, 2)
+	>>> vectors['toto'], len(vectors), vectors.matrix.shape
+	((0, 2, 2), 2, (2, 3))
+	>>> sorted(vectors.items())
+	[('tata', (2, 0, 2)), ('toto', (0, 2, 2))]
 	"""
 	def __init__(self):
 		self.feature_list = defaultdict(list)
 		self.lemma_list = defaultdict(list)
-		defaultdict.__init__(self, tuple)
-		self.indistinguishables = Indistinguishables.fromFeatureVectors(self)
+		self.feature_names = []
+		self.lemma_names = []
+		self.dimension = []
+		self.dimension_kind = []	# For each dimension: 'char', 'token', 'morph', 'lemma' or 'anchor' (empty if unknown)
+		self.token_delimiter = ' '
+		self.words = []
+		self.index = {}
+		self._matrix = csr_matrix((0, 0), dtype=np.int32)
+		self._pending = {}
+		self._row_keys = None
+		self._indistinguishables = None
+
+	@property
+	def indistinguishables(self):
+		""" Groups of words with the same vector, computed on first use after any change of the vectors """
+		if self._indistinguishables is None:
+			self._indistinguishables = Indistinguishables.fromFeatureVectors(self)
+		return self._indistinguishables
+
+	@indistinguishables.setter
+	def indistinguishables(self, indistinguishables):
+		self._indistinguishables = indistinguishables
+
+	@property
+	def matrix(self):
+		""" The sparse count matrix, one row per word in self.words """
+		if self._pending:
+			self._flush()
+		return self._matrix
+
+	def _flush(self):
+		""" Write the vectors assigned one by one with vectors[word] = vector into the matrix """
+		pending, self._pending = self._pending, {}
+		new_words = [ word for word in pending if word not in self.index ]
+		old_words = [ word for word in pending if word in self.index ]
+		width = len(next(iter(pending.values())))
+		if self._matrix.shape[0] == 0:
+			self._matrix = csr_matrix((0, width), dtype=np.int32)
+		assert all( len(vector) == self._matrix.shape[1] for vector in pending.values() ), \
+			'All vectors should have the same length.'
+		if old_words:
+			matrix = self._matrix.tolil()
+			for word in old_words:
+				matrix[self.index[word]] = pending[word]
+			self._matrix = matrix.tocsr()
+		if new_words:
+			rows = np.array([ pending[word] for word in new_words ], dtype=np.int32).reshape(len(new_words), width)
+			self._append_rows(new_words, csr_matrix(rows))
+
+	def _append_rows(self, words, matrix):
+		""" Append the rows of matrix (sparse, same number of columns) for the given new words """
+		self.index.update( (word, i) for i, word in enumerate(words, len(self.words)) )
+		self.words += words
+		self._matrix = vstack([self._matrix, matrix.astype(np.int32)], format='csr')
+		self._row_keys = None
+		self._indistinguishables = None
+
+	def _set_matrix(self, words, matrix):
+		"""
+		Replace the content of the vectors by the rows of matrix for the words.
+		Repeated words keep their first row.
+		"""
+		index = {}
+		rows = [ index.setdefault(word, i) for i, word in enumerate(words) if word not in index ]
+		if len(rows) < len(words):
+			matrix = matrix[rows]
+			words = [ words[i] for i in rows ]
+		self.words = list(words)
+		self.index = { word : i for i, word in enumerate(self.words) }
+		self._matrix = csr_matrix(matrix, dtype=np.int32)
+		self._pending = {}
+		self._row_keys = None
+		self._indistinguishables = None
+
+	def _set_rows(self, words, rows):
+		""" Replace the content of the vectors by the given tuples, one per word """
+		width = len(rows[0]) if rows else len(self.dimension)
+		assert all( len(row) == width for row in rows ), 'All vectors should have the same length.'
+		self._set_matrix(words, csr_matrix(np.array(rows, dtype=np.int32).reshape(len(rows), width)))
+
+	def _row(self, i):
+		""" Dense row i of the matrix as a tuple of integers """
+		matrix = self._matrix
+		start, stop = matrix.indptr[i], matrix.indptr[i+1]
+		vector = np.zeros(matrix.shape[1], dtype=matrix.dtype)
+		vector[matrix.indices[start:stop]] = matrix.data[start:stop]
+		return tuple(vector.tolist())
+
+	def __getitem__(self, word):
+		if word in self._pending:
+			return self._pending[word]
+		return self._row(self.index[word])
+
+	def __setitem__(self, word, vector):
+		self._pending[word] = tuple(vector)
+
+	def __delitem__(self, word):
+		if self._pending:
+			self._flush()
+		i = self.index[word]
+		keep = [ j for j in range(len(self.words)) if j != i ]
+		self._set_matrix([ self.words[j] for j in keep ], self._matrix[keep])
+
+	def __contains__(self, word):
+		return word in self.index or word in self._pending
+
+	def __iter__(self):
+		if self._pending:
+			self._flush()
+		return iter(self.words)
+
+	def __len__(self):
+		if self._pending:
+			self._flush()
+		return len(self.words)
+
+	def toarray(self, dtype=None):
+		""" Dense count matrix (number of words x number of dimensions), rows in the order of self.words """
+		return self.matrix.toarray() if dtype is None else self.matrix.toarray().astype(dtype, copy=False)
+
+	def subset(self, words):
+		""" New Vectors restricted to the given words (no copy of the tuples) """
+		result = self.__class__()
+		result.dimension = list(self.dimension)
+		result.dimension_kind = list(self.dimension_kind)
+		result.token_delimiter = self.token_delimiter
+		words = list(words)
+		result._set_matrix(words, self.matrix[[ self.index[word] for word in words ]])
+		return result
+
+	def feature_scores(self, criterion=__feature_criterion__):
+		"""
+		Score of each dimension over all words:
+		the variance of the counts ('variance')
+		or the entropy of the distribution of the counts ('entropy').
+
+		>>> vectors = Vectors.fromFile(['aab', 'ab', 'abc', 'b'])
+		>>> [ float(score) for score in vectors.feature_scores('variance') ]
+		[0.5, 0.0, 0.1875]
+		>>> [ round(float(score), 3) for score in vectors.feature_scores('entropy') ]
+		[1.04, 0.0, 0.562]
+		"""
+		matrix = self.matrix.tocoo()
+		n, width = matrix.shape
+		if n == 0:
+			return np.zeros(width)
+		if criterion == 'variance':
+			mean = np.bincount(matrix.col, weights=matrix.data, minlength=width) / n
+			square = np.bincount(matrix.col, weights=matrix.data.astype(np.float64) ** 2, minlength=width) / n
+			return square - mean ** 2
+		elif criterion == 'entropy':
+			# Number of words for each pair (dimension, non-zero count), then zero counts.
+			pairs, frequencies = np.unique(np.stack([matrix.col, matrix.data]), axis=1, return_counts=True)
+			p = frequencies / n
+			result = np.bincount(pairs[0], weights=-p * np.log(p), minlength=width)
+			p = (n - np.bincount(matrix.col, minlength=width)) / n
+			result -= p * np.log(np.where(p > 0, p, 1))
+			return result
+		raise ValueError(f'Unknown feature selection criterion: {criterion}')
+
+	def select_features(self, feature_number, criterion=__feature_criterion__, verbose=__verbose__):
+		"""
+		New Vectors restricted to the feature_number dimensions with the highest scores (see feature_scores).
+		The kept dimensions keep their order; ties are broken by the order of the dimensions.
+		Words which differ only on the dropped dimensions become indistinguishable.
+
+		>>> vectors = Vectors.fromFile(['aab', 'ab', 'abc', 'b'])
+		>>> reduced = vectors.select_features(1)
+		>>> reduced.dimension, reduced['abc']
+		(['a'], (1,))
+		>>> reduced.indistinguishables['ab']
+		['ab', 'abc']
+
+		Vectors without dimension labels (e.g., read by fromListOfVectors) give vectors without labels.
+
+		>>> reduced = Vectors.fromListOfVectors(['aab\\t2 1 0', 'ab\\t1 1 0', 'abc\\t1 1 1', 'b\\t0 1 0']).select_features(1)
+		>>> reduced.dimension, reduced['abc']
+		([], (1,))
+		"""
+		scores = self.feature_scores(criterion)
+		columns = np.sort(np.argsort(-scores, kind='stable')[:feature_number])
+		width = self.matrix.shape[1]
+		result = self.__class__()
+		# The labels are only carried over when there is one for each dimension.
+		result.dimension = [ self.dimension[j] for j in columns ] if len(self.dimension) == width else []
+		result.dimension_kind = [ self.dimension_kind[j] for j in columns ] if len(self.dimension_kind) == width else []
+		result.token_delimiter = self.token_delimiter
+		result._set_matrix(self.words, self.matrix[:, columns])
+		if verbose:
+			print(f'# Feature selection ({criterion}): {len(columns)} dimensions kept out of {width}', file=sys.stderr)
+			print(f'# Distinguishable words: {len(self.indistinguishables)} -> {len(result.indistinguishables)} '
+				f'({len(self.indistinguishables) - len(result.indistinguishables)} words made indistinguishable)', file=sys.stderr)
+		return result
 
 	# RH modified on 18/08/2021
 	@classmethod
@@ -91,34 +448,37 @@ class Vectors(defaultdict):
 							char_feature=char_feature,
 							token_feature=token_feature,
 							token_delimiter=token_delimiter)
-			vectors.indistinguishables = Indistinguishables.fromFeatureVectors(vectors)
 		return vectors
 
 	@classmethod
 	def fromSigmorphonFile(cls, lines, char_feature=True, morph_feature=True, morph_delimiter=__morph_delimiter__, lemma_feature=False, lemma_dim=True):
 		vectors = cls()
-		words = set()
-		lines = parse_sigmorphon_file(lines, morph_delimiter=morph_delimiter)
+		# Morph features and lemmas are interned to integer ids while reading:
+		# feature_list and lemma_list contain ids, feature_names and lemma_names give back the strings.
+		feature_ids, lemma_ids = {}, {}
+		if lemma_dim:
+			LEMMA = feature_ids.setdefault("LEMMA", len(feature_ids))
+		lines = parse_sigmorphon_file(lines, morph_delimiter=morph_delimiter, feature_ids=feature_ids)
 		for line in lines:
 			if len(line) == 3:
 				lemma,form,features = line
 				vectors.feature_list[form] = features
-				vectors.lemma_list[form] = lemma
-				words.add(form)
+				vectors.lemma_list[form] = lemma_ids.setdefault(lemma, len(lemma_ids))
 				if lemma_dim:
-					vectors.feature_list[lemma] = [ "LEMMA" ]
-					vectors.lemma_list[lemma] = lemma
-					words.add(lemma)
-		vectors._build_vector(list(words),
+					vectors.feature_list[lemma] = ( LEMMA, )
+					vectors.lemma_list[lemma] = lemma_ids.setdefault(lemma, len(lemma_ids))
+		vectors.feature_names = list(feature_ids)
+		vectors.lemma_names = list(lemma_ids)
+		vectors._build_vector(list(vectors.feature_list),
 						char_feature=char_feature,
 						morph_feature=morph_feature,
 						lemma_feature=lemma_feature)
-		vectors.indistinguishables = Indistinguishables.fromFeatureVectors(vectors)
 		return vectors
 
 	@classmethod
 	def fromListOfVectors(cls, lines):
 		vectors =  cls()
+		words, rows = [], []
 		for line in lines:
 			if re.match(rf"^{NlgSymbols.comment}", line) is None: # Not comment lines
 				word, vector = line.strip().split('\t')
@@ -130,30 +490,219 @@ class Vectors(defaultdict):
 					vector = tuple(map(int, vector.split()[0]))
 				else: # vector's length = 0
 					vector = tuple()
-				vectors[word] = vector
-		# Get the indistinguishable lines
-		vectors.indistinguishables = Indistinguishables.fromFeatureVectors(vectors)
+				words.append(word)
+				rows.append(vector)
+		vectors._set_rows(words, rows)
 		return vectors
 
+	@classmethod
+	def fromArray(cls, words, array, dimension, dimension_kind=None):
+		"""
+		Vectors from an integer array (or sparse matrix), one row per word, one column per dimension.
+
+		>>> vectors = Vectors.fromArray(['ab', 'ba', 'c'], np.array([[1, 0], [1, 0], [0, 2]]), ['x', 'y'])
+		>>> vectors['c'], vectors.indistinguishables['ab']
+		((0, 2), ['ab', 'ba'])
+		"""
+		vectors = cls()
+		vectors.dimension = list(dimension)
+		vectors.dimension_kind = list(dimension_kind) if dimension_kind is not None else []
+		vectors._set_matrix(list(words), csr_matrix(array, dtype=np.int32))
+		return vectors
+
+	def toBinary(self, path):
+		"""
+		Write the vectors in binary format into the directory path (created if needed):
+			header.json		format, shape, dimension labels and indistinguishables (only groups of more than one word)
+			words.bin		the words encoded in UTF-8, one after the other
+			words.npy		the offsets of the words in words.bin (number of words + 1)
+			data.npy, indices.npy, indptr.npy
+							the count matrix in CSR format
+		All .npy files can be memory-mapped when reading (see fromBinary).
+		"""
+		os.makedirs(path, exist_ok=True)
+		matrix = self.matrix
+		encoded = [ word.encode('utf-8', errors='surrogateescape') for word in self.words ]
+		offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+		np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+		with open(os.path.join(path, 'words.bin'), 'wb') as file:
+			file.write(b''.join(encoded))
+		np.save(os.path.join(path, 'words.npy'), offsets)
+		np.save(os.path.join(path, 'data.npy'), matrix.data.astype(np.int32, copy=False))
+		np.save(os.path.join(path, 'indices.npy'), matrix.indices.astype(np.int32, copy=False))
+		np.save(os.path.join(path, 'indptr.npy'), matrix.indptr.astype(np.int64, copy=False))
+		header = {
+			'format': __binary_format__,
+			'version': __binary_version__,
+			'shape': list(matrix.shape),
+			'dimension': list(self.dimension),
+			'dimension_kind': list(self.dimension_kind),
+			'token_delimiter': self.token_delimiter,
+			'indistinguishables': [ words for words in self.indistinguishables.values() if len(words) > 1 ],
+		}
+		with open(os.path.join(path, 'header.json'), 'w', encoding='utf-8', errors='surrogateescape') as file:
+			json.dump(header, file, ensure_ascii=False)
+
+	@classmethod
+	def fromBinary(cls, path, mmap_mode='r'):
+		"""
+		Read vectors written by toBinary.
+		With mmap_mode='r' (default), the count matrix is memory-mapped, not read.
+		"""
+		with open(os.path.join(path, 'header.json'), encoding='utf-8', errors='surrogateescape') as file:
+			header = json.load(file)
+		assert header.get('format') == __binary_format__ and header.get('version') == __binary_version__, \
+			'{}: not a binary vector file (format {} version {} expected)'.format(path, __binary_format__, __binary_version__)
+		offsets = np.load(os.path.join(path, 'words.npy'))
+		with open(os.path.join(path, 'words.bin'), 'rb') as file:
+			encoded = file.read()
+		words = [ encoded[start:stop].decode('utf-8', errors='surrogateescape')
+					for start, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist()) ]
+		matrix = csr_matrix((np.load(os.path.join(path, 'data.npy'), mmap_mode=mmap_mode),
+							np.load(os.path.join(path, 'indices.npy'), mmap_mode=mmap_mode),
+							np.load(os.path.join(path, 'indptr.npy'), mmap_mode=mmap_mode)),
+							shape=tuple(header['shape']), copy=False)
+		vectors = cls()
+		vectors.dimension = header['dimension']
+		vectors.dimension_kind = header.get('dimension_kind', [])
+		vectors.token_delimiter = header.get('token_delimiter', ' ')
+		vectors.words = words
+		vectors.index = { word : i for i, word in enumerate(words) }
+		vectors._matrix = matrix
+		# Rebuild the indistinguishables: words not in a group are only indistinguishable from themselves.
+		groups = { word : group for group in header['indistinguishables'] for word in group }
+		indistinguishables = dict()
+		for word in words:
+			group = groups.get(word, [word])
+			if group[0] not in indistinguishables:
+				indistinguishables[group[0]] = group
+		vectors.indistinguishables = Indistinguishables(indistinguishables)
+		return vectors
+
+	def add_words(self, lines, verbose=__verbose__):
+		"""
+		Add new words to vectors built from strings (fromFile or fromBinary)
+		without recomputing the vectors of the words already there.
+		Symbols (or tokens) never seen before are appended as new dimensions
+		and the existing rows have 0 on these dimensions.
+		The indistinguishables, if already computed, are updated with the new words only.
+		Words already present are ignored.
+		Return the list of the words actually added.
+
+		>>> vectors = Vectors.fromFile(['toto', 'tata'])
+		>>> vectors.dimension
+		['a', 'o', 't']
+		>>> vectors.add_words(['papa', 'atat'])
+		['papa', 'atat']
+		>>> vectors.dimension, vectors['toto'], vectors['papa']
+		(['a', 'o', 't', 'p'], (0, 2, 2, 0), (2, 0, 0, 2))
+		>>> vectors.indistinguishables.all('atat')
+		['atat', 'tata']
+		>>> vectors.dimension_permutation().tolist()
+		[0, 1, 3, 2]
+		"""
+		assert self.dimension_kind and len(self.dimension_kind) == self.matrix.shape[1], \
+			'add_words: the kind of each dimension should be known (vectors built with fromFile or fromBinary).'
+		assert set(self.dimension_kind) <= { 'char', 'token' }, \
+			'add_words: only character and token features can be extended.'
+		lines = [ line for line in dict.fromkeys( line.strip() for line in lines ) if line not in self ]
+		if not lines:
+			return lines
+		old_width = self.matrix.shape[1]
+		blocks = []
+		if 'char' in self.dimension_kind:
+			columns = { label : i for i, (label, kind) in enumerate(zip(self.dimension, self.dimension_kind)) if kind == 'char' }
+			new_chars = sorted(frozenset( c for line in lines for c in line ) - columns.keys())
+			self._add_dimensions(new_chars, 'char', columns)
+			alphabet, counts = char_count_matrix(lines, list(columns))
+			blocks.append((list(columns.values()), counts))
+		if 'token' in self.dimension_kind:
+			columns = { label : i for i, (label, kind) in enumerate(zip(self.dimension, self.dimension_kind)) if kind == 'token' }
+			new_tokens = self._build_dim_by_separator(lines, self.token_delimiter)
+			self._add_dimensions([ token for token in new_tokens if token not in columns ], 'token', columns)
+			counts = featurize_blocks([ (line, (), None) for line in lines ],
+								({ token : j for j, token in enumerate(columns) }, self.token_delimiter, None, None, len(columns)),
+								multiprocess=False)
+			blocks.append((list(columns.values()), counts))
+		if verbose: print(f'# {len(lines)} words added, {len(self.dimension) - old_width} new dimensions', file=sys.stderr)
+		# Existing rows: zero columns for the new dimensions.
+		matrix = self.matrix.copy()
+		matrix.resize((matrix.shape[0], len(self.dimension)))
+		self._matrix = matrix
+		# New rows: scatter the counts of each kind of feature into their columns.
+		rows = csr_matrix((len(lines), len(self.dimension)), dtype=np.int32)
+		for columns, counts in blocks:
+			counts = counts.tocoo()
+			rows = rows + csr_matrix((counts.data, (counts.row, np.array(columns, dtype=np.int64)[counts.col])),
+									shape=rows.shape, dtype=np.int32)
+		# Indistinguishables already computed are updated, otherwise they stay to be computed on first use.
+		indistinguishables = self._indistinguishables
+		row_keys = self._get_row_keys() if indistinguishables is not None else None
+		self._append_rows(lines, rows)
+		if indistinguishables is not None:
+			self._indistinguishables, self._row_keys = indistinguishables, row_keys
+			self._add_indistinguishables(lines)
+		return lines
+
+	def _add_dimensions(self, labels, kind, columns):
+		""" Append new dimensions of the given kind and record their columns """
+		for label in labels:
+			columns[label] = len(self.dimension)
+			self.dimension.append(label)
+			self.dimension_kind.append(kind)
+
+	def _row_key(self, i):
+		""" Hashable key of row i (non-zero columns and values) """
+		matrix = self._matrix
+		start, stop = matrix.indptr[i], matrix.indptr[i+1]
+		return matrix.indices[start:stop].tobytes() + b'|' + matrix.data[start:stop].tobytes()
+
+	def _get_row_keys(self):
+		""" Dictionary from row keys to the representative of the indistinguishables (built once) """
+		if self._row_keys is None:
+			self.matrix.sort_indices()
+			self._row_keys = { self._row_key(self.index[word]) : word for word in self.indistinguishables }
+		return self._row_keys
+
+	def _add_indistinguishables(self, words):
+		""" Insert new words into the indistinguishables, without rebuilding them """
+		self.matrix.sort_indices()
+		row_keys = self._get_row_keys()
+		for word in words:
+			key = self._row_key(self.index[word])
+			row_keys[key] = self.indistinguishables.add(word, row_keys.get(key))
+
+	def dimension_permutation(self):
+		"""
+		Permutation of the columns giving the order of dimensions of a fresh computation
+		(sorted characters, then sorted tokens, ...), e.g., self.matrix[:, self.dimension_permutation()].
+		"""
+		kinds = { 'char': 0, 'token': 1, 'morph': 2, 'lemma': 3 }
+		return np.array(sorted(range(len(self.dimension)),
+						key=lambda i: (kinds.get(self.dimension_kind[i], 0), self.dimension[i])), dtype=np.int64)
+
 	# RH modified on 18/08/2021
-	def _build_vector(self, lines, alphabet=None, char_feature=True, token_feature=False, morph_feature=False, lemma_feature=False, token_delimiter=" ", multiprocess=True, verbose=__verbose__, trace=__trace__):
+	def _build_vector(self, lines, alphabet=None, char_feature=True, token_feature=False, morph_feature=False, lemma_feature=False, token_delimiter=" ", multiprocess=True, processes=__processes__, verbose=__verbose__, trace=__trace__):
 		# Defining vector dimension
 		self.dimension = []
+		self.dimension_kind = []
+		self.token_delimiter = token_delimiter
 		
 		if char_feature:	# character occurences feature
-			if alphabet is None: # RH added on 18/08/2021
-				dim_alphabet = self._build_char_dim(lines)
-				self.dimension += dim_alphabet
-				if verbose: print(f"# Alphabet size: {len(dim_alphabet)}", file=sys.stderr)
-				if trace: print(f"# Alphabet computed: {' '.join( '%c' % c for c in dim_alphabet )}", file=sys.stderr)
-			else: # RH added on 18/08/2021
-				dim_alphabet = alphabet # RH added on 18/08/2021
+			# Alphabet and character counts computed in the same pass (RH: alphabet may be given)
+			dim_alphabet, char_counts = char_count_matrix(lines, alphabet)
+			self.dimension += dim_alphabet
+			self.dimension_kind += [ 'char' ] * len(dim_alphabet)
+			if verbose: print(f"# Alphabet size: {len(dim_alphabet)}", file=sys.stderr)
+			if trace: print(f"# Alphabet computed: {' '.join( '%c' % c for c in dim_alphabet )}", file=sys.stderr)
 		else:
 			dim_alphabet = []
+			char_counts = csr_matrix((len(lines), 0), dtype=np.int32)
 		
 		if token_feature:	# token occurences feature
 			dim_token = self._build_dim_by_separator(lines, delimiter=token_delimiter)
 			self.dimension += dim_token
+			self.dimension_kind += [ 'token' ] * len(dim_token)
 			if verbose: print(f"# Token size: {len(dim_token)}", file=sys.stderr)
 			if trace: print(f"# Token computed: {' '.join( '%s' % c for c in dim_token )}", file=sys.stderr)
 		else:
@@ -162,11 +711,13 @@ class Vectors(defaultdict):
 		if morph_feature:	# morphological feature
 			dim_morph = self._build_morph_dim()
 			self.dimension += dim_morph
+			self.dimension_kind += [ 'morph' ] * len(dim_morph)
 			if verbose: print(f"# Morph feature size: {len(dim_morph)}", file=sys.stderr)
 			if trace: print(f"# Morph feature computed: {' '.join( '%s'.encode('utf-8') % s for s in dim_morph )}", file=sys.stderr)
 			if lemma_feature:	# lemma feature
 				dim_lemmas = self._build_lemmas_dim()
 				self.dimension += dim_lemmas
+				self.dimension_kind += [ 'lemma' ] * len(dim_lemmas)
 				if verbose: print(f"# Lemma feature size: {len(dim_lemmas)}",file=sys.stderr)
 				if trace: print(f"# Lemma feature computed: {' '.join( '%s'.encode('utf-8') % s for s in dim_lemmas )}", file=sys.stderr)
 			else:
@@ -175,33 +726,22 @@ class Vectors(defaultdict):
 			dim_morph = []
 			dim_lemmas = []
 
-		# Build vector representation for each line
-		if multiprocess:
-			# Build vector representation for each line utilising multiprocessing
-			if verbose:
-				print('# Multiprocessing pool: {}'.format(mp.cpu_count()), file=sys.stderr)
-			pool = mp.Pool(mp.cpu_count())
-			result = [
-				pool.apply_async(self._assert_dim,
-									args=(line, self.feature_list[line], self.lemma_list[line], dim_alphabet, dim_token, dim_morph, dim_lemmas,
-									char_feature, token_feature, morph_feature, lemma_feature, token_delimiter,))
-				for line in lines
-			]
-			for r in result:
-				self[r.get()[0]] = r.get()[1]
-			pool.close()
-		else:
-			for line in lines:
-				vector = tuple()
-				if char_feature:
-					vector += tuple( line.count(char) for char in dim_alphabet )
-				if token_feature:
-					vector += tuple( line.split(token_delimiter).count(token) for token in dim_token )
-				if morph_feature:
-					vector += tuple( self.feature_list[line].count(feature) for feature in dim_morph )
-					if lemma_feature:
-						vector += tuple( 1 if self.lemma_list[line] == lemma else 0 for lemma in dim_lemmas )
-				self[line] = vector
+		# Build vector representation for each line for the other features
+		if not (token_feature or morph_feature):
+			self._set_matrix(lines, char_counts)
+			return
+		# Columns of the interned morph features and lemmas (after the token dimensions).
+		morph_columns = lemma_columns = None
+		if morph_feature:
+			morph_columns = self._interned_columns(self.feature_names, dim_morph, len(dim_token))
+			if lemma_feature:
+				lemma_columns = self._interned_columns(self.lemma_names, dim_lemmas, len(dim_token) + len(dim_morph))
+		triples = [ (line, self.feature_list.get(line, ()), self.lemma_list.get(line)) for line in lines ]
+		other_counts = featurize_blocks(triples,
+							({ token : j for j, token in enumerate(dim_token) }, token_delimiter, morph_columns, lemma_columns,
+								len(dim_token) + len(dim_morph) + len(dim_lemmas)),
+							multiprocess=multiprocess, processes=processes, verbose=verbose)
+		self._set_matrix(lines, hstack([char_counts, other_counts], format='csr'))
 
 	def _build_char_dim(self, lines):
 		""" Build vector dimension for the alphabet """
@@ -212,31 +752,22 @@ class Vectors(defaultdict):
 		return sorted(list(frozenset( token for line in lines for token in line.split(delimiter) )))
 
 	def _build_morph_dim(self):
-		""" Build the vector dimension for morphological features """
-		return sorted(list(frozenset( f for w in self.feature_list.keys() for f in self.feature_list[w] )))
+		""" Build the vector dimension for morphological features (interned in feature_list) """
+		return sorted(list(frozenset( self.feature_names[f] for features in self.feature_list.values() for f in features )))
 
 	def _build_lemmas_dim(self):
-		""" Build vector dimension for lemmas """
-		return sorted(list(frozenset( lemma for lemma in self.lemma_list.values() )))
-	
-	@staticmethod	
-	def _assert_dim(line, feature_list, lemma_list, dim_alphabet, dim_token, dim_morph, dim_lemmas,
-						char_feature=True, token_feature=False, morph_feature=False, lemma_feature=False, token_delimiter=" "):
-		""" Assert the value for each dimension of the vector representation for a given line """
-		vector = tuple()
-		if char_feature:
-			vector += tuple( line.count(char) for char in dim_alphabet )
-		if token_feature:
-			vector += tuple( line.split(token_delimiter).count(token) for token in dim_token )
-		if morph_feature:
-			vector += tuple( feature_list.count(feature) for feature in dim_morph )
-			if lemma_feature:
-				vector += tuple( 1 if lemma_list == lemma else 0 for lemma in dim_lemmas )
-		return (line, vector)
+		""" Build vector dimension for lemmas (interned in lemma_list) """
+		return sorted(list(frozenset( self.lemma_names[lemma] for lemma in self.lemma_list.values() )))
+
+	@staticmethod
+	def _interned_columns(names, dimension, shift=0):
+		""" Array giving for each interned id the column of its name in dimension (-1 if not a dimension) """
+		columns = { name : shift + j for j, name in enumerate(dimension) }
+		return np.array([ columns.get(name, -1) for name in names ], dtype=np.int64)
 	
 	def get_distinguishables(self):
-		""" Return only strings that are distinguishable """
-		return { line : self[line] for line in self.indistinguishables }
+		""" Return only strings that are distinguishable (as Vectors sharing the same count matrix layout) """
+		return self.subset(self.indistinguishables)
 
 	def __repr__(self):
 		# Old way to get indistinguishables
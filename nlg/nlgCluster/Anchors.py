@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import random
+import collections
+import multiprocessing as mp
+
+import numpy as np
+
+from nlg.Vector import Vectors
+from _fast_distance import init_memo_fast_distance, memo_fast_distance, memo_fast_similitude
+
+#...!....1....!....2....!....3....!....4....!....5....!....6....!....7....!....8
+################################################################################
+
+__author__ = 'Yves Lepage <yves.lepage@waseda.jp>'
+__date__, __version__ = '17/10/2026', '1.0'		# Creation: anchor words as features (option -A of nlgclu.py).
+__description__ = """
+	Describe each word by its similarities to a small number of anchor words
+	instead of its counts of characters.
+	The number of features, i.e., the depth of the feature tree,
+	is the number of anchors, whatever the size of the alphabet.
+"""
+
+__verbose__ = False
+__trace__ = False
+
+__anchor_default_number__ = 100			# Default number of anchor words.
+__anchor_selection__ = 'farthest'		# Choice of the anchor words: 'random', 'frequency' or 'farthest'.
+__sample_size__ = 5000					# Farthest-point selection is done on a sample of the words of this size.
+__seed__ = 0							# Seed of the random choices: same words, same anchors.
+
+__processes__ = None					# Number of worker processes (None: number of CPUs).
+__multiprocess_threshold__ = 1000000	# Below this number of similarities (words x anchors), no worker process.
+
+################################################################################
+
+def select_anchors(words, number=__anchor_default_number__, selection=__anchor_selection__,
+					frequencies=None, sample_size=__sample_size__, seed=__seed__):
+	"""
+	Choose number anchor words among words.
+		random		uniformly at random.
+		frequency	the most frequent words (frequencies: word to count);
+					without frequencies, the words made of the most frequent characters.
+		farthest	farthest-point traversal: each new anchor is the word
+					at the largest edit distance from the anchors already chosen
+					(on a random sample of sample_size words).
+
+	>>> words = ['walk', 'walks', 'walked', 'talk', 'talks', 'talked', 'a']
+	>>> select_anchors(words, 2, 'frequency', frequencies={'talk': 3, 'a': 2})
+	['talk', 'a']
+	>>> anchors = select_anchors(words, 3, 'farthest')
+	>>> len(set(anchors)), set(anchors) <= set(words)
+	(3, True)
+	"""
+	words = list(words)
+	number = min(number, len(words))
+	rng = random.Random(seed)
+	if selection == 'random':
+		return rng.sample(words, number)
+	elif selection == 'frequency':
+		if frequencies is None:
+			char_frequencies = collections.Counter( c for word in words for c in word )
+			score = lambda word: sum( char_frequencies[c] for c in word ) / max(len(word), 1)
+		else:
+			score = lambda word: frequencies.get(word, 0)
+		return sorted(words, key=score, reverse=True)[:number]
+	elif selection == 'farthest':
+		candidates = words if len(words) <= sample_size else rng.sample(words, sample_size)
+		anchors = [ rng.choice(candidates) ] if number > 0 else []
+		distances = np.full(len(candidates), np.iinfo(np.int64).max)
+		while len(anchors) < number:
+			init_memo_fast_distance(anchors[-1])
+			distances = np.minimum(distances, [ memo_fast_distance(word) for word in candidates ])
+			i = int(np.argmax(distances))
+			if distances[i] == 0:
+				# All the candidates are already anchors.
+				break
+			anchors.append(candidates[i])
+		return anchors
+	raise ValueError(f'Unknown anchor selection: {selection}')
+
+_worker_words = None
+
+def _init_worker(words):
+	""" Initializer of the worker processes: the words are received once per worker """
+	global _worker_words
+	_worker_words = words
+
+def _similarities_to_anchor(anchor, words=None):
+	""" Similarities (length of the longest common subsequence) of all words to anchor """
+	if words is None: words = _worker_words
+	init_memo_fast_distance(anchor)
+	return np.fromiter(( memo_fast_similitude(word) for word in words ), dtype=np.int32, count=len(words))
+
+def anchor_similarities(words, anchors, processes=__processes__, threshold=__multiprocess_threshold__, verbose=__verbose__):
+	"""
+	Array of the similarities of the words to the anchors (number of words x number of anchors).
+	Each anchor is a task for a pool of worker processes, which receive the words once.
+	Under the threshold, the similarities are computed in this process.
+
+	>>> anchor_similarities(['walk', 'talks'], ['talk', 'a'])
+	array([[3, 1],
+	       [4, 1]], dtype=int32)
+	"""
+	words = list(words)
+	if len(words) * len(anchors) < threshold or len(anchors) < 2:
+		columns = [ _similarities_to_anchor(anchor, words) for anchor in anchors ]
+	else:
+		processes = min(processes or mp.cpu_count(), len(anchors))
+		if verbose: print(f'# Multiprocessing pool: {processes} processes, {len(anchors)} anchors', file=sys.stderr)
+		pool = mp.Pool(processes, initializer=_init_worker, initargs=(words,))
+		try:
+			columns = pool.map(_similarities_to_anchor, anchors, chunksize=max(1, len(anchors) // (4 * processes)))
+		finally:
+			pool.close()
+			pool.join()
+	if not columns:
+		return np.zeros((len(words), 0), dtype=np.int32)
+	return np.stack(columns, axis=1)
+
+def anchor_vectors(words, number=__anchor_default_number__, selection=__anchor_selection__, frequencies=None,
+					processes=__processes__, verbose=__verbose__):
+	"""
+	Vectors of the similarities of the words to number anchor words chosen among them (see select_anchors).
+	The dimensions are the anchors.
+	The result can be used as any other Vectors, e.g., by NlgClusteringFromVectors.
+
+	>>> vectors = anchor_vectors(['walk', 'walks', 'talk', 'talks'], 2, 'frequency', frequencies={'walk': 2, 'talks': 1})
+	>>> vectors.dimension
+	['walk', 'talks']
+	>>> vectors['talk']
+	(3, 4)
+	"""
+	words = list(words)
+	anchors = select_anchors(words, number, selection, frequencies=frequencies)
+	if verbose: print(f'# Anchors ({selection}): {len(anchors)}', file=sys.stderr)
+	if __trace__: print(f'# Anchors: {" ".join(anchors)}', file=sys.stderr)
+	similarities = anchor_similarities(words, anchors, processes=processes, verbose=verbose)
+	return Vectors.fromArray(words, similarities, anchors, [ 'anchor' ] * len(anchors))
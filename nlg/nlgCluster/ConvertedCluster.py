@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import numpy as np
+
 from nlg.Cluster import Cluster, ListOfClusters
+from nlg.nlgCluster.Indistinguishables import Indistinguishables
 
 ###############################################################################
 
 __author__ = 'Yves Lepage <yves.lepage@waseda.jp>'
 __date__, __version__ = '23/08/2017', '1.0'			# Creation.
+__date__, __version__ = '17/10/2026', '1.1'			# ListOfConvertedClusters.fromArrays: clusters from the arrays of integers output by the C program.
 __description__ = """Convert clusters containing integers to clusters with words
 by using two dictionaries giving the mapping from integers to words.
 One dictionary for the As and another one for the Bs for a cluster A1 : B1 :: A2 : B2 : ....
@@ -73,6 +77,30 @@ class ListOfConvertedClusters(ListOfClusters):
 			clusters.append(ConvertedCluster(cluster, dictA, dictB))
 		ListOfClusters.__init__(self, clusters=clusters, indistinguishables=list_of_clusters.indistinguishables)
 
+	@classmethod
+	def fromArrays(cls, offsets, objectsA, objectsB, dictA, dictB=None):
+		"""
+		Convert clusters given as arrays of integers (no string to parse).
+		The ratios of cluster i are the pairs objectsA[j] : objectsB[j]
+		for j from offsets[i] to offsets[i+1] - 1.
+		The arrays are kept in the attributes offsets, objectsA and objectsB.
+
+		>>> dictA = ['a', 'aa', 'aaa', 'aaaa']
+		>>> for cluster in ListOfConvertedClusters.fromArrays([0, 2, 4], [0, 2, 3, 2], [1, 3, 1, 0], dictA): print(cluster)
+		a : aa :: aaa : aaaa
+		aaaa : aa :: aaa : a
+		"""
+		if dictB == None: dictB = dictA
+		As = [ dictA[i] for i in np.asarray(objectsA).tolist() ]
+		Bs = [ dictB[i] for i in np.asarray(objectsB).tolist() ]
+		offsets = np.asarray(offsets).tolist()
+		clusters = [ Cluster([ [A, B] for A, B in zip(As[begin:end], Bs[begin:end]) ])
+						for begin, end in zip(offsets[:-1], offsets[1:]) ]
+		result = cls.__new__(cls)
+		ListOfClusters.__init__(result, clusters=clusters, indistinguishables=Indistinguishables([]))
+		result.offsets, result.objectsA, result.objectsB = offsets, objectsA, objectsB
+		return result
+
 
 
 	
@@ -2,8 +2,13 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import bisect
 import collections
 
+import numpy as np
+
+from scipy.sparse import csr_matrix
+
 import nlg.NlgSymbols as NlgSymbols
 
 #...!....1....!....2....!....3....!....4....!....5....!....6....!....7....!....8
@@ -11,6 +16,9 @@ import nlg.NlgSymbols as NlgSymbols
 
 __author__ = 'Yves Lepage <yves.lepage@dwaseda.jp>'
 __date__, __version__ = '24/04/2017', '1.0'
+__date__, __version__ = '17/10/2026', '1.1'		# Vectorized grouping of the rows of a count matrix (fromMatrix).
+__date__, __version__ = '17/10/2026', '1.2'		# Index of the members of the groups: all(word) in constant time for any word.
+__date__, __version__ = '17/10/2026', '1.3'		# The index is kept up to date by update, setdefault, pop, popitem and clear.
 __description__ = """
 	Build the list of indistinguishable words
 	for a list of words with their feature vectors.
@@ -26,8 +34,101 @@ class Indistinguishables(dict):
 	Indistinguishables is a dictionary.
 	A key is a word and the values are all words with the same feature vector
 	(including itself)
+	The other members of a group are indexed to the same list (shared, not copied),
+	so that all(word) is found in constant time for any word.
+	The methods of dict which change the groups (item assignment and deletion,
+	update, setdefault, pop, popitem, clear) keep the index up to date.
+
+	>>> indistinguishables = Indistinguishables({'atat': ['atat', 'tata'], 'toto': ['toto']})
+	>>> indistinguishables.all('tata') is indistinguishables['atat']
+	True
+	>>> indistinguishables.add('taat', 'atat')
+	'atat'
+	>>> indistinguishables.add('aatt', 'atat')
+	'aatt'
+	>>> indistinguishables.all('tata'), list(indistinguishables)
+	(['aatt', 'atat', 'taat', 'tata'], ['toto', 'aatt'])
+	>>> indistinguishables.update({'otot': ['otot', 'toot']})
+	>>> indistinguishables.pop('aatt')
+	['aatt', 'atat', 'taat', 'tata']
+	>>> indistinguishables.all('tata'), indistinguishables.all('toot')
+	(['tata'], ['otot', 'toot'])
+	>>> indistinguishables.clear()
+	>>> indistinguishables.all('toot')
+	['toot']
 	"""
 
+	def __init__(self, *args, **kwargs):
+		dict.__init__(self, *args, **kwargs)
+		# Members of the groups which are not the key of their group, to their group.
+		self._groups = { word : group for key, group in self.items() for word in group if word != key }
+
+	def __setitem__(self, key, group):
+		if key in self:
+			del self[key]
+		dict.__setitem__(self, key, group)
+		self._groups.update( (word, group) for word in group if word != key )
+
+	def __delitem__(self, key):
+		self._unindex(key, self[key])
+		dict.__delitem__(self, key)
+
+	def _unindex(self, key, group):
+		""" Remove the members of the group of key from the index """
+		for word in group:
+			if word != key:
+				self._groups.pop(word, None)
+
+	def update(self, *args, **kwargs):
+		for key, group in dict(*args, **kwargs).items():
+			self[key] = group
+
+	def __ior__(self, other):
+		self.update(other)
+		return self
+
+	def setdefault(self, key, group):
+		if key not in self:
+			self[key] = group
+		return self[key]
+
+	def pop(self, key, *default):
+		if key not in self:
+			return dict.pop(self, key, *default)
+		group = self[key]
+		del self[key]
+		return group
+
+	def popitem(self):
+		key, group = dict.popitem(self)
+		self._unindex(key, group)
+		return key, group
+
+	def clear(self):
+		dict.clear(self)
+		self._groups.clear()
+
+	def __reduce__(self):
+		return (self.__class__, (dict(self), ))
+
+	def add(self, word, key=None):
+		"""
+		Add word to the group of key (a new group if key is None).
+		The words of a group are kept sorted and the key of the group is its first word.
+		Return the key of the group of word.
+		"""
+		if key is None:
+			self[word] = [ word ]
+			return word
+		group = self[key]
+		bisect.insort(group, word)
+		if group[0] != key:
+			del self[key]
+			self[group[0]] = group
+		else:
+			self._groups[word] = group
+		return group[0]
+
 	@classmethod
 	def fromFile(cls, file=sys.stdin):
 		"""
@@ -63,7 +164,11 @@ class Indistinguishables(dict):
 		"""
 		Build the list of indistinguishable words
 		from a list of feature vectors.
+		Vectors stored as a count matrix (attributes words and matrix)
+		are grouped without going through the tuples (see fromMatrix).
 		"""
+		if hasattr(words_to_vectors, 'matrix') and hasattr(words_to_vectors, 'words'):
+			return cls.fromMatrix(words_to_vectors.words, words_to_vectors.matrix)
 		# Build an inverse dictionary where the keys are the vectors
 		# and the value is the list of of all
 		vectors_to_words = collections.defaultdict(set)
@@ -74,13 +179,66 @@ class Indistinguishables(dict):
 		# Return a dictionary of first word with all words with same feature vector.
 		return cls({ v[0] : v for v in list(vectors_to_words.values()) })
 		
+	@classmethod
+	def fromMatrix(cls, words, matrix):
+		"""
+		Build the list of indistinguishable words
+		from a matrix (dense or sparse) with one row per word.
+		The rows are grouped by a hash computed in one sparse product,
+		then compared exactly to the first row of their group (hash collisions are regrouped).
+		The groups come in the order of their first word in words, as in fromFeatureVectors.
+
+		>>> indistinguishables = Indistinguishables.fromMatrix(['toto', 'atat', 'tata', 'papa'], np.array([[0, 2, 2], [2, 0, 2], [2, 0, 2], [2, 2, 0]]))
+		>>> list(indistinguishables.items())
+		[('toto', ['toto']), ('atat', ['atat', 'tata']), ('papa', ['papa'])]
+		"""
+		matrix = csr_matrix(matrix)
+		n = matrix.shape[0]
+		if n == 0:
+			return cls()
+		# Hash of each row: random weights, arithmetic modulo 2**64.
+		weights = np.random.default_rng(0).integers(0, np.iinfo(np.uint64).max, size=matrix.shape[1], dtype=np.uint64, endpoint=True)
+		hashes = matrix.astype(np.uint64) @ weights
+		_, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+		inverse = inverse.reshape(-1)
+		# Exact check against the first row with the same hash.
+		difference = matrix - matrix[first[inverse]]
+		difference.eliminate_zeros()
+		collided = np.flatnonzero(np.diff(difference.indptr))
+		if len(collided):
+			if __trace__: print(f'# Hash collisions: {len(collided)} rows', file=sys.stderr)
+			keys = {}
+			for i in collided.tolist():
+				row = matrix.getrow(i)
+				row.sort_indices()
+				inverse[i] = len(first) + keys.setdefault((row.indices.tobytes(), row.data.tobytes()), len(keys))
+		sizes = np.bincount(inverse)
+		first_rows = np.full(len(sizes), n, dtype=np.int64)
+		np.minimum.at(first_rows, inverse, np.arange(n))
+		members = np.argsort(inverse, kind='stable')
+		starts = np.concatenate([[0], np.cumsum(sizes)]).tolist()
+		sizes, first_rows = sizes.tolist(), first_rows.tolist()
+		result = dict()
+		for group in sorted(range(len(sizes)), key=first_rows.__getitem__):
+			if sizes[group] == 1:
+				word = words[first_rows[group]]
+				result[word] = [ word ]
+			else:
+				As = sorted( words[i] for i in members[starts[group]:starts[group+1]].tolist() )
+				result[As[0]] = As
+		return cls(result)
+
 	def all(self, word):
 		"""
 		Return all objects which are indistinguishable from word.
 		If word did not exist in self,
 		then return word itself,
 		as it is trivially indistinguishable from itself.
+		The list returned is shared with self: it should not be modified.
 		"""
+		group = self._groups.get(word)
+		if group is not None:
+			return group
 		return self[word] if word in self else [word]
 
 	def __repr__(self):
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+
+from nlg.Vector import Vectors
+from nlg.Cluster import Cluster, ListOfClusters
+from nlg.nlgCluster.nlgclu import NlgClusteringFromVectors
+
+#...!....1....!....2....!....3....!....4....!....5....!....6....!....7....!....8
+################################################################################
+
+__author__ = 'Yves Lepage <yves.lepage@waseda.jp>'
+__date__, __version__ = '17/10/2026', '1.0'		# Creation: clusters keyed by their difference vector, updated with new words.
+__description__ = """
+	Analogical clusters keyed by the difference vector of their ratios,
+	stored with the vectors of the words and updated when new words are added.
+	A cluster output by nlgclu is the set of all the pairs of words
+	with the same difference vector: the clusters which contain a new word
+	replace the clusters with the same key, the other clusters do not change.
+"""
+
+__verbose__ = False
+__trace__ = False
+
+__minimal_size__ = 2					# Minimal size of clusters kept.
+__maximal_size__ = None					# Maximal size of clusters kept (None: no limit).
+__threads__ = 1							# Number of threads for the clustering in the C program (0: number of CPUs).
+
+__format__ = 'nlg-keyed-clusters'		# Name and version of the format written by KeyedClusters.save.
+__format_version__ = 1
+
+################################################################################
+
+def escape(word):
+	""" Word as in the clusters output by nlgclu (see CFeatureTree.Clines) """
+	return word.replace(':', '\\:')
+
+def unescape(word):
+	return word.replace('\\:', ':')
+
+class KeyedClusters(dict):
+	"""
+	Dictionary from difference vectors to the analogical clusters of the distinguishable words of vectors.
+	The key of a cluster is the difference of the vectors of the two words of any of its ratios,
+	as a tuple of (dimension, value) for the non-zero values,
+	oriented so that its first value is negative (as output by nlgclu).
+	The dimensions are the indices of the dimensions of vectors:
+	they do not change when new words are added (new dimensions are appended, see Vectors.add_words).
+
+	>>> clusters = KeyedClusters.fromVectors(Vectors.fromFile(['toto', 'tata', 'popo', 'papa']))
+	>>> for key, cluster in sorted(clusters.items()): print(key, cluster)
+	((0, -2), (1, 2)) toto : tata :: popo : papa
+	((2, -2), (3, 2)) toto : popo :: tata : papa
+	>>> clusters.add_words(['pipi', 'titi', 'ttii'])
+	[((0, -2), (4, 2)), ((1, -2), (4, 2)), ((2, -2), (3, 2))]
+	>>> for key in clusters.changed: print(key, clusters[key])
+	((0, -2), (4, 2)) titi : tata :: pipi : papa
+	((1, -2), (4, 2)) titi : toto :: pipi : popo
+	((2, -2), (3, 2)) titi : pipi :: toto : popo :: tata : papa
+	>>> fresh = KeyedClusters.fromVectors(clusters.vectors)
+	>>> sorted(fresh) == sorted(clusters) and all( sorted(map(tuple, fresh[key])) == sorted(map(tuple, clusters[key])) for key in fresh )
+	True
+	"""
+
+	def __init__(self, vectors, minimal_size=__minimal_size__, maximal_size=__maximal_size__):
+		dict.__init__(self)
+		self.vectors = vectors
+		self.minimal_size = minimal_size
+		self.maximal_size = maximal_size
+		self.changed = []
+
+	@classmethod
+	def fromVectors(cls, vectors, minimal_size=__minimal_size__, maximal_size=__maximal_size__, threads=__threads__, verbose=__verbose__):
+		"""
+		Cluster all the distinguishable words of vectors (vectors built with fromFile or fromBinary
+		if words are to be added later, see Vectors.add_words).
+		"""
+		result = cls(vectors, minimal_size, maximal_size)
+		result.merge(result.cluster(threads=threads, verbose=verbose))
+		return result
+
+	def cluster(self, focus=None, threads=__threads__, verbose=__verbose__):
+		"""
+		Clusters of the distinguishable words which contain at least one of the focus words (all clusters if None).
+		With focus words, the clusters are complete (all the pairs of their key),
+		and they are not limited to maximal_size, so that the clusters which become too large are known.
+		"""
+		t1 = time.time()
+		clusters = NlgClusteringFromVectors(self.vectors.get_distinguishables(),
+				minimal_size=self.minimal_size,
+				maximal_size=self.maximal_size if focus is None else None,
+				focus=focus,
+				threads=threads)
+		if __verbose__ or verbose: print(f'# {len(clusters)} clusters in {time.time() - t1:.2f}s', file=sys.stderr)
+		return clusters
+
+	def difference_keys(self, clusters):
+		"""
+		Keys of the clusters: difference of the vectors of the first ratio of each cluster,
+		computed in one sparse subtraction.
+		"""
+		index, matrix = self.vectors.index, self.vectors.matrix
+		rowsA = [ index[unescape(cluster[0][0])] for cluster in clusters ]
+		rowsB = [ index[unescape(cluster[0][1])] for cluster in clusters ]
+		differences = (matrix[rowsA] - matrix[rowsB]).tocsr()
+		differences.eliminate_zeros()
+		differences.sort_indices()
+		indptr, indices, data = differences.indptr.tolist(), differences.indices.tolist(), differences.data.tolist()
+		return [ tuple(zip(indices[begin:end], data[begin:end])) for begin, end in zip(indptr[:-1], indptr[1:]) ]
+
+	def merge(self, clusters):
+		"""
+		Put the clusters at their keys, in place of the clusters already there.
+		A cluster out of the size range removes the cluster with its key.
+		The keys changed are kept in the attribute changed and returned.
+		"""
+		self.changed = []
+		for key, cluster in zip(self.difference_keys(clusters), clusters):
+			if key and 0 < key[0][1]:
+				key = tuple( (dimension, -value) for dimension, value in key )
+				cluster = Cluster([ [B, A] for A, B in cluster ])
+			if self.minimal_size <= len(cluster) and (self.maximal_size is None or len(cluster) <= self.maximal_size):
+				self[key] = cluster
+			elif key in self:
+				del self[key]
+			else:
+				continue
+			self.changed.append(key)
+		return self.changed
+
+	def add_words(self, lines, threads=__threads__, verbose=__verbose__):
+		"""
+		Add new words to the vectors and update the clusters, without clustering all the words again.
+		Only the clusters which contain a new word change: they are computed in one traversal
+		with the new words as focus words (complete clusters, with the pairs of old words) and merged by key.
+		A new word with the same vector as an old word adds no cluster;
+		if it becomes the representative of its indistinguishables, it replaces the old word in the clusters.
+		Return the keys changed.
+		"""
+		added = self.vectors.add_words(lines, verbose=__verbose__ or verbose)
+		new_words = set(added)
+		focus, renamed = set(), {}
+		for word in added:
+			group = self.vectors.indistinguishables.all(word)
+			old_words = [ other for other in group if other not in new_words ]
+			if not old_words:
+				focus.add(escape(group[0]))
+			elif group[0] != old_words[0]:
+				renamed[escape(old_words[0])] = escape(group[0])
+		if __verbose__ or verbose: print(f'# {len(focus)} new vectors, {len(renamed)} new representatives', file=sys.stderr)
+		changed = []
+		if renamed:
+			for key, cluster in self.items():
+				if any( A in renamed or B in renamed for A, B in cluster ):
+					self[key] = Cluster([ [renamed.get(A, A), renamed.get(B, B)] for A, B in cluster ])
+					changed.append(key)
+		if focus:
+			changed += self.merge(self.cluster(focus=sorted(focus), threads=threads, verbose=verbose))
+		self.changed = list(dict.fromkeys(changed))
+		return self.changed
+
+	def list_of_clusters(self):
+		""" The clusters as a ListOfClusters, with the indistinguishables of the vectors """
+		return ListOfClusters(list(self.values()), indistinguishables=self.vectors.indistinguishables)
+
+	def save(self, path):
+		"""
+		Write the clusters and the vectors into the directory path (created if needed):
+			vectors/		the vectors in binary format (see Vectors.toBinary)
+			clusters.jsonl	a header line (format, sizes), then one cluster per line:
+							{"key": [[dimension, value], ...], "ratios": [[A, B], ...]}
+		The file of clusters is written under a temporary name, then renamed.
+		"""
+		os.makedirs(path, exist_ok=True)
+		self.vectors.toBinary(os.path.join(path, 'vectors'))
+		filename = os.path.join(path, 'clusters.jsonl')
+		with open(filename + '.tmp', 'w', encoding='utf-8', errors='surrogateescape') as file:
+			header = { 'format': __format__, 'version': __format_version__,
+						'minimal_size': self.minimal_size, 'maximal_size': self.maximal_size }
+			print(json.dumps(header, ensure_ascii=False), file=file)
+			for key, cluster in self.items():
+				print(json.dumps({ 'key': key, 'ratios': cluster }, ensure_ascii=False), file=file)
+		os.replace(filename + '.tmp', filename)
+
+	@classmethod
+	def load(cls, path):
+		""" Read the clusters and the vectors written by save """
+		with open(os.path.join(path, 'clusters.jsonl'), encoding='utf-8', errors='surrogateescape') as file:
+			header = json.loads(next(file))
+			assert header.get('format') == __format__ and header.get('version') == __format_version__, \
+				'{}: not a file of keyed clusters (format {} version {} expected)'.format(path, __format__, __format_version__)
+			# The vectors are read into memory: they are written again by save.
+			result = cls(Vectors.fromBinary(os.path.join(path, 'vectors'), mmap_mode=None), header['minimal_size'], header['maximal_size'])
+			for line in file:
+				cluster = json.loads(line)
+				result[tuple( tuple(item) for item in cluster['key'] )] = Cluster(cluster['ratios'])
+		return result
+
+################################################################################
+
+def read_argv():
+
+	from argparse import ArgumentParser
+	this_version = 'v%s (c) %s %s' % (__version__, __date__.split('/')[2], __author__)
+	this_description = __description__
+	this_usage = """%(prog)s  DIRECTORY  <  FILE_OF_WORDS
+
+	If DIRECTORY does not contain clusters, cluster the words and save the clusters into DIRECTORY.
+	Otherwise, add the words to the clusters in DIRECTORY.
+	The clusters created or changed are output.
+	"""
+
+	parser = ArgumentParser(description=this_description, usage=this_usage, epilog=this_version)
+	parser.add_argument('directory',
+						action='store', type=str,
+						help = 'directory of the clusters')
+	parser.add_argument('-m','--minimal_cluster_size',
+						action='store',dest='minsize', type=int, default=__minimal_size__,
+						help = 'minimal size of clusters (default: %(default)s); only when the clusters are created')
+	parser.add_argument('-M','--maximal_cluster_size',
+						action='store',dest='maxsize', type=int, default=__maximal_size__,
+						help = 'maximal size of clusters (default: %(default)s); only when the clusters are created')
+	parser.add_argument('-j','--threads',
+						action='store',dest='threads', type=int, default=__threads__,
+						help = 'number of threads for the clustering (default: %(default)s, 0 for the number of CPUs)')
+	parser.add_argument('-V', '--verbose',
+						action='store_true', dest='verbose', default=False,
+						help='run in verbose mode')
+	return parser.parse_args()
+
+################################################################################
+
+if __name__ == '__main__':
+	options = read_argv()
+	__verbose__ = options.verbose
+	if 2 > options.minsize:
+		print('Minimal size of clusters should be equal to or greater than 2.', file=sys.stderr)
+		exit(-1)
+	if options.maxsize != None and 2 > options.maxsize:
+		print('Maximal size of clusters should be equal to or greater than 2.', file=sys.stderr)
+		exit(-1)
+	t1 = time.time()
+	lines = [ line.strip() for line in sys.stdin ]
+	if os.path.exists(os.path.join(options.directory, 'clusters.jsonl')):
+		clusters = KeyedClusters.load(options.directory)
+		if __verbose__: print(f'# {len(clusters)} clusters of {len(clusters.vectors)} words read in {time.time() - t1:.2f}s', file=sys.stderr)
+		changed = clusters.add_words(lines, threads=options.threads)
+	else:
+		clusters = KeyedClusters.fromVectors(Vectors.fromFile(lines), options.minsize, options.maxsize, threads=options.threads)
+		changed = list(clusters)
+	clusters.save(options.directory)
+	print('\n'.join( '{}'.format(clusters[key]) for key in changed if key in clusters ))
+	if __verbose__: print(f'# {len(changed)} clusters changed, {len(clusters)} clusters; processing time: {time.time() - t1:.2f}s', file=sys.stderr)
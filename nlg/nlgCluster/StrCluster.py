@@ -20,6 +20,7 @@ __date__, __version__ = '01/09/2014', '2.0'
 __date__, __version__ = '15/05/2015', '2.1'		# Import NlgCluster. Inherit from NlgClu.
 __date__, __version__ = '06/06/2015', '2.2'		# Import SquareMatrix and use it in cluster_to_matrix.
 __date__, __version__ = '26/02/2016', '2.3'		# Improved speed in horizontal splitting.
+__date__, __version__ = '17/10/2026', '2.4'		# Splitting by differences of feature vectors (clusters computed on a selection of features).
 __description__ = 'The clusters output by nlgclu.py do not necessarily meet the distance constraint for analogies between strings of symbols. ' \
 					'This program verifies the distance constraint on analogical clusters output by nlgclu.py. ' \
 					'As a result, some clusters will be further split into smaller clusters to meet the distance constraint.' \
@@ -178,6 +179,19 @@ class StrCluster(Cluster):
 #					print 'VERTICAL %s' % result
 				yield result
 
+	def split_by_vectors(self, vectors):
+		"""
+		Split the cluster so that all ratios have the same difference of feature vectors.
+		Needed when the cluster was computed on a selection of the features only
+		(see Vectors.select_features).
+		"""
+		subclusters = collections.defaultdict(list)
+		for A, B in self:
+			subclusters[tuple( a - b for a, b in zip(vectors[A], vectors[B]) )].append((A, B))
+		for ratios in subclusters.values():
+			if __minimal_size__ <= len(ratios):	# The subcluster should contain at least 2 ratios to make a valid cluster or be bigger than min size.
+				yield StrCluster(ratios)
+
 	def distance_constraint(self, indistinguishables):
 		for hcluster in self.split_by_horizontal_distance(indistinguishables):
 			for vcluster in hcluster.split_by_vertical_distance():
@@ -235,6 +249,20 @@ class ListOfStrClusters(ListOfClusters):
 		list_of_strclusters  = [ strcluster for strcluster in strclusters if strcluster.is_of_length_in_range(minimal_size, maximal_size) ]
 		return cls(list_of_strclusters)
 
+	@classmethod
+	def fromReducedClusters(cls, clusters, vectors, minimal_size=2, maximal_size=None):
+		"""
+		Clusters computed on reduced vectors (a selection of the features or anchor words),
+		with the indistinguishables of the reduced vectors:
+		check the distance constraints, then split the clusters so that all ratios
+		have the same difference of the full vectors (see StrCluster.split_by_vectors).
+		"""
+		list_of_strclusters = cls([ subcluster for strcluster in cls.fromListOfClusters(clusters, minimal_size, maximal_size)
+				for subcluster in strcluster.split_by_vectors(vectors)
+				if subcluster.is_of_length_in_range(minimal_size, maximal_size) ])
+		list_of_strclusters.set_indistinguishables(vectors.indistinguishables)
+		return list_of_strclusters
+
 ###############################################################################
 
 def read_argv():
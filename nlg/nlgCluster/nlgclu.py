@@ -3,18 +3,25 @@
 
 #from __future__ import unicode_literals
 
+import os
 import sys
 import time
+import heapq
 import tempfile
+import multiprocessing as mp
 import numpy as np # RH added on 30/8/2021
 
 import nlg.NlgSymbols as NlgSymbols
 
 from nlg.Cluster import ListOfClusters
 from nlg.nlgCluster.ConvertedCluster import ListOfConvertedClusters
-from _nlgclu import nlgclu_in_C
+from nlg.nlgCluster.StrCluster import ListOfStrClusters
+from _nlgclu import nlgclu_in_C, nlgclu_in_C_from_buffers, nlgclu_clusters_number, nlgclu_clusters_size, nlgclu_clusters_copy, nlgclu_clusters_free
+from _nlgclu import nlgclu_clusters_peak_memory, nlgclu_clusters_stopped, nlgclu_clusters_coverage
+from _nlgclu import nlgclu_in_C_frontier, nlgclu_in_C_from_tasks, nlgclu_clusters_frontier_size, nlgclu_clusters_copy_frontier
 
 from nlg.Vector import Vectors # RH added on 4/8/2021
+from nlg.nlgCluster.Anchors import anchor_vectors
 ###############################################################################
 
 __author__ = 'Yves Lepage <yves.lepage@waseda.jp>'
@@ -65,14 +72,35 @@ __date__, __version__ = '16/09/2021', '2.3'	# Modifications to FeatureMatrix for
 											# +----+-------+--------+———————+
 											# 
 											# The data are lists of words extracted for the Europarl v3 in the German, Finnish and Swedish languages. Three sizes are used: 5k, 10k and 20k.								
+__date__, __version__ = '17/10/2026', '2.4'	# Option -f (feature_number) implemented in NlgClusteringFromVectors by feature selection on the vectors.
+__date__, __version__ = '17/10/2026', '2.5'	# Option -A (anchors) implemented in NlgClusteringFromVectors with the module Anchors.
+__date__, __version__ = '17/10/2026', '2.6'	# FeatureMatrix: one allocation, one lexsort, smallest integer type for the values.
+__date__, __version__ = '17/10/2026', '2.7'	# Vectors2Tree vectorized: flat int32 array of nodes, no list per node.
+__date__, __version__ = '17/10/2026', '2.8'	# Feature trees passed to the C program as int32 buffers (nlgclu_in_C_from_buffers).
+											# The temporary input files are only written with __lineout__ (debugging).
+__date__, __version__ = '17/10/2026', '2.9'	# Clusters returned by the C program as int32 arrays (offsets, objects in A, objects in B):
+											# no temporary cluster file to print, flush and parse, except with __lineout__.
+__date__, __version__ = '17/10/2026', '2.10'	# No global state in the C program (context), GIL released during clustering:
+											# several clusterings can run at the same time on Python threads.
+__date__, __version__ = '17/10/2026', '2.11'	# Add option -j for a parallel traversal in the C program with threads.
+__date__, __version__ = '17/10/2026', '2.12'	# Several focus words in one traversal (option -F repeated); alphagram dictionary in get_index.
+__date__, __version__ = '17/10/2026', '2.13'	# Focus pruning on the pairs of the traversal in the C program; with two files, the focus is looked for in fileA only.
+__date__, __version__ = '17/10/2026', '2.14'	# Add option --memory_limit: limit of the work memory of the C program (MemoryError), peak reported (peak_memory).
+__date__, __version__ = '17/10/2026', '2.15'	# Add option -k (largest): only the K largest clusters, sorted by decreasing size, with pruning in the C program.
+__date__, __version__ = '17/10/2026', '2.16'	# Add options --time_budget and --max_clusters: partial clusters, with complete, stopped_by and coverage.
+__date__, __version__ = '17/10/2026', '2.17'	# Add options --checkpoint and --checkpoint_interval: periodic checkpoints of the C program, resumed when rerun.
+__date__, __version__ = '17/10/2026', '2.18'	# Add options -P (processes) and --split_level: the subproblems at the split level are shared out
+											# to a pool of processes, balanced by surface; the clusters are the same, in the same order.
 
 __description__ = 'Module for analogical clustering.'
 
-__NODESIZE__ = 6
+__NODESIZE__ = 7						# Number of integers per node in the feature tree (NODESIZE in nlgclu.c).
+__TASK_FIELDS__ = 6						# Number of integers before the nodes of a subproblem in a frontier (TASK_FIELDS in nlgclu.c).
 
 __verbose__ = False						# Gives information about timing, etc. to the user.
 __lineout__ = False						# If true, pass text to the C program. This is normally not required.
 										# This option is made available to be able to debug the C program.
+										# The feature trees are then passed through temporary files, not buffers.
 __trace__ = False						# If true, output traces for the developper for debugging.
 
 __word__ = False						# Allows the use of words as units instead of characters.
@@ -81,7 +109,18 @@ __minimal_size__ = 2					# Minimal size of clusters output. Two is the minimal t
 __maximal_size__ = None					# Maximal size of clusters output.
 __anchors__ = False						# If true, use anchor words to compute features (default number: __anchor_default_number__).
 __anchor_default_number__ = 100			# Default number of anchor words.
+__anchor_selection__ = 'farthest'		# Choice of the anchor words: 'random', 'frequency' or 'farthest' (see Anchors.select_anchors).
 __focus__ = None						# Focus word to output only those clusters which contain the focus.
+__threads__ = 1							# Number of threads for the traversal in the C program (0: number of CPUs).
+__split_level__ = 0						# Level of the subproblems solved by the threads or the processes (0: chosen by the C program).
+__processes__ = 1						# Number of processes for the clustering (1: no worker process, 0: number of CPUs).
+__memory_limit__ = None					# Limit of the work memory of the C program in bytes (None: no limit).
+__largest__ = None						# Number of largest clusters output (None: all clusters).
+__time_budget__ = None					# Wall-clock budget of the C program in seconds (None: no limit).
+__max_clusters__ = None					# The C program stops after this number of clusters (None: no limit).
+__checkpoint__ = None					# Checkpoint file of the C program (None: no checkpoint).
+__checkpoint_interval__ = 600			# Seconds between two checkpoints.
+__stopped_by__ = { 1: 'time', 2: 'clusters' }	# Reasons of a stop of the C program before the end (STOPPED_BY_* in nlgclu.c).
 
 ###############################################################################
 # This example is for the following features and strings:
@@ -256,37 +295,31 @@ def bitvectors(line, alphabet_to_rank):
 class FeatureMatrix(list):
 
 	def __init__(self, word_vector_dict={}):
-		vectors = {}
 		if __verbose__: print('# Reading vectors...', file=sys.stderr)
-		# Associate an index to keep trace of the word when sorting several times.
-		for i, (word, vector) in enumerate(word_vector_dict.items()):
-		#	vectors[word] = vector + ( i, ) # RH commented on 6/9/2021
-			vector = np.array(vector) # RH added on 6/9/2021
-			vectors[word] = np.append(vector, i) # RH added on 6/9/2021
+		if isinstance(word_vector_dict, Vectors):
+			# Array-backed vectors: take the count matrix as is, no tuple per word.
+			words = word_vector_dict.words
+			counts = word_vector_dict.matrix
+		else:
+			words = list(word_vector_dict.keys())
+			counts = np.array(list(word_vector_dict.values()), dtype=np.int64).reshape(len(words), -1)
 		if __verbose__: print('# Vectors read.', file=sys.stderr)
-		# Create the dictionary of words (= lines) with their associated index.
-		lines = { vectors[word][-1] : word for word in vectors }
-		
-		# Sort the vectors as this is required to build the feature tree.
-		# fv = sorted(vectors.values()) # RH commented on 02/09/2021
-		fv = np.array([vectors[word] for word in vectors]) # RH added on 13/09/2021
-		# fv = fv[fv[:, 0].argsort()] # RH added on 13/09/2021; FR commented on 15/12/2021 (source of bug)
-		fv = self._sort_array(fv) # FR added on 15/12/2021 (bug fix)
-
-		# Transpose the list of feature vectors.
-		# matrix = list(zip(*fv)) # RH commented on 09/09/2021
-		matrix = np.transpose(fv) # RH added on 09/09/2021
-		# The object indices are the last row in the matrix.
-		# They are in the same order as in the tree.
-		objects = matrix[-1]
-		# Add a first row of 0's for the 0th level (all objects have a value of 0 on this dummy level).
-		# Discard the last line which stands for the object indices.
-		# fm = [ (0,) * len(matrix[0]) ] + matrix[:-1] # RH commented 14/09/2021
-		fm = np.append(np.zeros((1, len(matrix[0])) , dtype=np.int64),matrix[:-1],axis=0) # RH added 14/09/2021
+
+		# Smallest integer type for the values, then one allocation for all levels:
+		# a first row of 0's for the 0th level (all objects have a value of 0 on this dummy level),
+		# then one row per feature.
+		dtype = self._smallest_dtype(counts)
+		counts = counts.toarray() if hasattr(counts, 'toarray') else counts
+		fm = np.zeros((counts.shape[1] + 1, counts.shape[0]), dtype=dtype)
+		fm[1:] = counts.T
+		# Sort the objects as this is required to build the feature tree.
+		# The object indices are in the same order as in the tree.
+		objects = self._sort_order(fm[1:])
+		fm = fm[:, objects]
 		# Create the object as a list.
 		list.__init__(self, fm)
 		self.objects = objects
-		self.lines = [ lines[i] for i in objects ]
+		self.lines = [ words[i] for i in objects.tolist() ]
 		if __verbose__: print('# Number of objects: %d.' % len(self.objects), file=sys.stderr)
 
 	@classmethod
@@ -307,33 +340,64 @@ class FeatureMatrix(list):
 				word_vector_dict[word] = eval(vector)
 		return cls(word_vector_dict)
 	
+	@staticmethod
+	def _smallest_dtype(counts):
+		"""
+		Smallest signed integer type which can hold all values in counts.
+		>>> FeatureMatrix._smallest_dtype(np.array([[0, 3], [127, 2]]))
+		<class 'numpy.int8'>
+		>>> FeatureMatrix._smallest_dtype(np.array([[-200, 3]]))
+		<class 'numpy.int16'>
+		"""
+		if counts.shape[0] == 0 or counts.shape[1] == 0:
+			return np.int8
+		low, high = counts.min(), counts.max()
+		for dtype in (np.int8, np.int16, np.int32):
+			if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+				return dtype
+		return np.int64
+
+	@staticmethod
+	def _sort_order(M):
+		"""
+		Order of the columns of M (one row per feature) sorted lexicographically:
+		the first row is the top level in the tree for nlgclu.
+		Equal columns keep their order.
+		>>> FeatureMatrix._sort_order(np.array([[1, 0, 1, 0], [0, 2, 0, 1]])).tolist()
+		[3, 1, 0, 2]
+		"""
+		if M.shape[0] == 0:
+			return np.arange(M.shape[1])
+		return np.lexsort(M[::-1])
+
 	@staticmethod
 	def _sort_array(M, verbose=False):
 		"""
 		Sort M according to the lines.
 		The leftmost column is the top node in the tree for nlgclu.
-		Note: FR added on 15/12/2021 (from YL)
+		Note: FR added on 15/12/2021 (from YL); one lexsort instead of one mergesort per column.
 		"""
-		if verbose: print(M.shape)
-		if verbose: print(M)
-		if verbose: print('')
-		if verbose: print(M.shape)
-		for i in range(M.shape[1])[::-1]:
-			if verbose: print(i)
-			M = M[M[:,i].argsort(kind='mergesort')]
-			if verbose: print(M)
-			if verbose: print('')
-		return M
+		return M[FeatureMatrix._sort_order(M.T)]
 		
 ###############################################################################
 
-class FeatureTree(list):
+class FeatureTree:
+	"""
+	Feature tree in the format of the C program:
+	a flat array of nodes, one row of __NODESIZE__ integers (int32) per node, level by level.
+	>>> featuretree = FeatureTree.fromVectors({'toto': (0, 0, 0, 2, 2), 'papa': (2, 2, 0, 0, 0), 'tata': (2, 0, 0, 2, 0), 'pipi': (0, 2, 2, 0, 0), 'popo': (0, 2, 0, 0, 2)})
+	>>> featuretree.lines
+	['toto', 'popo', 'pipi', 'tata', 'papa']
+	>>> featuretree.nodes[:3].tolist()
+	[[0, 5, 0, 0, 0, 1, 2], [1, 3, 0, 0, 0, 3, 4], [1, 2, 3, 2, 0, 5, 6]]
+	>>> featuretree.nodes[-1].tolist()
+	[5, 1, 4, 0, 1, -1, -1]
+	"""
 
 	def __init__(self, fm=[]):
 		if __verbose__: print('# Computing feature tree...', file=sys.stderr)
-		ll = self.Vectors2Tree(fm)
-		if __trace__: print('# Feature tree:\n%s' % ll, file=sys.stderr)
-		list.__init__(self,ll)
+		self.nodes = self.Vectors2Tree(fm)
+		if __trace__: print('# Feature tree:\n%s' % self, file=sys.stderr)
 		self.objects = fm.objects
 		self.lines = fm.lines
 		if __verbose__: print('# Computation done.', file=sys.stderr)
@@ -347,72 +411,57 @@ class FeatureTree(list):
 		fm = FeatureMatrix(vectors)
 		return cls(fm)
 	
-	def Vectors2Tree(self, matrix):
-		# Initialize the list of nodes to an empty list and
-		# the first block to a block of the length of a row, i.e., to the number of objects.
-		nodes, sub_blocks  = [], [ slice(0,len(matrix[0])) ]
-		# Split into nodes of same values level by level, i.e., each row after one another.
-		matlen = len(matrix)
-		for i, level in enumerate(range(matlen)):
-			if __verbose__: print('\r %2d %% ' % int((i/float(matlen))*100), end=' ', file=sys.stderr)
-			sub_nodes, sub_blocks = Level2Nodes( level, matrix[level], sub_blocks )
-			nodes += sub_nodes
+	@staticmethod
+	def Vectors2Tree(matrix):
+		"""
+		Compute the nodes of the tree from the sorted feature matrix (one row per level).
+		On each level, a node is a block of consecutive objects with the same values on this level and all levels above:
+		the block starts are where one of these rows changes (np.diff).
+		The children of a node are the blocks of the next level which start inside its block (searchsorted).
+		is_empty_rest is computed from the last level up.
+		Return an int32 array of nodes: level, size, object, value, is_empty_rest, next_level_begin_node, next_level_end_node.
+		"""
+		LEVEL, SIZE, OBJECT, VALUE, IS_EMPTY_REST, NEXT_LEVEL_BEGIN_NODE, NEXT_LEVEL_END_NODE = range(__NODESIZE__)
+		matrix = np.asarray(matrix)
+		levels, n = matrix.shape
+		# Block starts on each level: a block is split as soon as the value changes on one level.
+		changes = np.zeros(max(n - 1, 0), dtype=bool)
+		starts = []
+		for level in range(levels):
+			changes |= np.diff(matrix[level]) != 0
+			starts.append(np.concatenate([[0], np.flatnonzero(changes) + 1]))
+		offsets = np.concatenate([[0], np.cumsum([ len(level_starts) for level_starts in starts ])])
+		nodes = np.empty((offsets[-1], __NODESIZE__), dtype=np.int32)
+		for level, level_starts in enumerate(starts):
+			if __verbose__: print('\r %2d %% ' % int((level/float(levels))*100), end=' ', file=sys.stderr)
+			block = nodes[offsets[level]:offsets[level+1]]
+			block[:, LEVEL] = level
+			block[:, OBJECT] = level_starts
+			block[:, SIZE] = np.diff(np.append(level_starts, n))
+			block[:, VALUE] = matrix[level][level_starts]
+			if level + 1 < levels:
+				# Children: the blocks of the next level starting in [start, stop).
+				block[:, NEXT_LEVEL_BEGIN_NODE] = offsets[level+1] + np.searchsorted(starts[level+1], level_starts)
+				block[:, NEXT_LEVEL_END_NODE] = offsets[level+1] + np.searchsorted(starts[level+1], level_starts + block[:, SIZE]) - 1
+			else:
+				block[:, NEXT_LEVEL_BEGIN_NODE] = block[:, NEXT_LEVEL_END_NODE] = -1
 		if __verbose__: print('\r100 %% ', file=sys.stderr)
-		# Number the nodes.
-		for i, node in enumerate(nodes):
-			nodes[i] = [i] + node
-		# Name the indices.
-		NUMBER, 				\
-		LEVEL, 					\
-		SIZE,					\
-		START_OBJECT, 			\
-		STOP_OBJECT, 			\
-		VALUE,					\
-		IS_EMPTY_REST,			\
-		NEXT_LEVEL_BEGIN_NODE,	\
-		NEXT_LEVEL_END_NODE		= 0, 1, 2, 3, 4, 5, 6, 7, 8
-		# Get length, starting points for levels.
-		nodeslen = len(nodes)
-		level_start = dict()
-		for node in nodes:
-			level = node[LEVEL]
-			if level not in level_start:
-				level_start[level] = node[NUMBER]
-		# Explore the tree.
-		for level in range(len(level_start)-1):
-			if __verbose__: print('\r %2d %%' % int((level/float(len(level_start)))*100), end=' ', file=sys.stderr)
-			n, m = level_start[level], level_start[level+1]
-			while level == nodes[n][LEVEL]:
-				assert nodes[n][START_OBJECT] == nodes[m][START_OBJECT], 'error on start object at levels %d and %d' % (level, level+1)
-				nodes[n][NEXT_LEVEL_BEGIN_NODE] = nodes[m][NUMBER]
-				mm = m
-				while mm < nodeslen:
-					if nodes[n][STOP_OBJECT] == nodes[mm][STOP_OBJECT]:
-						nodes[n][NEXT_LEVEL_END_NODE] = nodes[mm][NUMBER]
-						n, m = n+1, mm+1
-						break
-					mm += 1
-		if __verbose__: print('\r100 %%', file=sys.stderr)
-		# Compute the is_empty_rest values.
-		for node in nodes[::-1]:
-			result = ( 1 == node[SIZE] and 0 == node[VALUE] )
-			nextnode = node[NEXT_LEVEL_BEGIN_NODE]
-			if -1 != nextnode:
-				result &= nodes[nextnode][IS_EMPTY_REST]
-			node[IS_EMPTY_REST] = 1 if result else 0
+		# Compute the is_empty_rest values: singletons with value 0 whose child is also empty.
+		for level in range(levels)[::-1]:
+			block = nodes[offsets[level]:offsets[level+1]]
+			result = (block[:, SIZE] == 1) & (block[:, VALUE] == 0)
+			if level + 1 < levels:
+				result &= nodes[block[:, NEXT_LEVEL_BEGIN_NODE], IS_EMPTY_REST] == 1
+			block[:, IS_EMPTY_REST] = result
 		if __verbose__: print('# Number of nodes: %d.' % len(nodes), file=sys.stderr)
-		for node in nodes:
-			assert nodes[n][SIZE] == nodes[n][STOP_OBJECT] - nodes[n][START_OBJECT], 'start, stop and size incompatible'
-			assert nodes[n][NEXT_LEVEL_BEGIN_NODE] != -1 or nodes[n][SIZE] == 1, 'node %d of size > 1 on last level' % n
-			assert nodes[n][SIZE] == 1 or nodes[n][NEXT_LEVEL_BEGIN_NODE] != -1, 'node %d of size > 1 on last level' % n
 		return nodes
 
 	def node_to_lines(self, node):
 		# This function outputs the lines which are described by a node.
-		return ', '.join( self.lines[i] for i in range(node[3], node[4]) ) # node[START_OBJECT], node[STOP_OBJECT]
+		return ', '.join( self.lines[i] for i in range(node[2], node[2] + node[1]) ) # node[OBJECT], node[OBJECT] + node[SIZE]
 	
 	def __str__(self):
-		return '\n'.join('%s\t%s' % (node, self.node_to_lines(node)) for node in self)
+		return '\n'.join('%d\t%s\t%s' % (i, node, self.node_to_lines(node)) for i, node in enumerate(self.nodes.tolist()))
 
 ###############################################################################
 
@@ -432,10 +481,9 @@ class CFeatureTree:
 		# Builds the three data structures that will be passed to the C program:
 		# Clength, integerlist, Clines (this last one is passed only if __lineout__ is on)
 		if __trace__: print('# Feature tree:\n%s' % featuretree, file=sys.stderr)
-		# Keeping the necessary elements and flattening to a list of integers.
-		if __verbose__: print('# Converting to list of integers...', file=sys.stderr)
-		ft = [ node[1:4] + node[5:] for node in featuretree ]
-		self.integerlist = [i for node in ft for i in node]
+		# The nodes are already a flat array of integers (int32).
+		# It is passed as is to the C program (buffer protocol): it must be contiguous.
+		self.integerlist = np.ascontiguousarray(featuretree.nodes, dtype=np.int32).reshape(-1)
 		self.Clength = len(self.integerlist)
 		if __trace__: print('# self.Clength = %d' % self.Clength, file=sys.stderr)
 		if __trace__: print('# self.integerlist = %s' % self.integerlist, file=sys.stderr)
@@ -444,6 +492,10 @@ class CFeatureTree:
 #		self.Clines = [ line.replace(':','\\:').encode('utf-8') for line in featuretree.lines ]
 		self.Clines = [ line.replace(':','\\:') for line in featuretree.lines ]
 		if __trace__: print('lines = %s' % self.Clines, file=sys.stderr)
+		self.line_index = None
+		self.alphagram_index = None
+		# Features of the objects: only counts of characters if True (see get_index).
+		self.char_features = True
 		if __verbose__: print('# Conversion done in %.2fs.' % (time.time() - t0), file=sys.stderr)
 	
 	@classmethod
@@ -452,55 +504,369 @@ class CFeatureTree:
 	
 	@classmethod
 	def fromVectors(cls, vectors={}):
-		return cls(FeatureTree.fromVectors(vectors))
+		result = cls(FeatureTree.fromVectors(vectors))
+		result.char_features = set(getattr(vectors, 'dimension_kind', [])) == { 'char' }
+		return result
 	
-	def store(self, filename):
+	def store(self, filename, lineout=False):
 		t1 = time.time()
 		cfile = tempfile.NamedTemporaryFile(prefix=filename, suffix=".txt", mode='wt')
 		print('%d' % self.Clength, file=cfile)
 #		for i in self.integerlist:
 #			print >> cfile, '%d' % i
-		print('\n'.join( '%d' % i for i in self.integerlist ), file=cfile)
-		if __lineout__:
+		np.savetxt(cfile, self.integerlist, fmt='%d')
+		if __lineout__ or lineout:
 			print('\n'.join(self.Clines), file=cfile)
 		cfile.seek(0)
 		if __verbose__: print('## [Python] Writing input data: ' + ('%.2f' % (time.time() - t1)) + 's', file=sys.stderr)
 		return cfile
 
+	def store_for_debug(self, filename, lineout=False):
+		"""
+		The temporary file for the C program, only when the lines are output (debugging).
+		Otherwise, None: the tree is passed to the C program in memory.
+		"""
+		return self.store(filename, lineout) if __lineout__ or lineout else None
+
 	def get_index(self, the_line):
-		result = None
-		the_line_alphagram = alphagram(the_line)
-		# Simply scan all the objects to find the line the_line.
-		for index, line in enumerate(self.Clines):
-			if the_line_alphagram == alphagram(line):
-				result = index
-				break
-		if __trace__: print('# get_index(%s) = %d' % (the_line, result), file=sys.stderr)
+		"""
+		Index of the object the_line (None if there is none).
+		If the features are counts of characters, a line which is not an object
+		(e.g., an indistinguishable of an object) gives the first object with the same alphagram,
+		i.e., the same vector; with other features, two anagrams may be different objects.
+		The dictionaries from lines and alphagrams to indices are built at the first call, so that
+		looking up many focus words does not scan all the objects for each of them.
+
+		>>> vectors = Vectors.fromArray(['ab', 'ba', 'abx', 'c', 'cx'], np.array([[1, 0], [0, 1], [1, 1], [2, 0], [2, 1]]), ['x', 'y'], ['anchor'] * 2)
+		>>> featuretree = CFeatureTree.fromVectors(vectors)
+		>>> [ featuretree.Clines[featuretree.get_index(line)] for line in ['ab', 'ba'] ], featuretree.get_index('xba')
+		(['ab', 'ba'], None)
+		>>> featuretree = CFeatureTree.fromVectors(Vectors.fromFile(['ab', 'c']))
+		>>> featuretree.Clines[featuretree.get_index('ba')]
+		'ab'
+		"""
+		if self.line_index == None:
+			self.line_index = { line: index for index, line in enumerate(self.Clines) }
+		result = self.line_index.get(the_line)
+		if result == None and self.char_features:
+			if self.alphagram_index == None:
+				self.alphagram_index = {}
+				for index, line in enumerate(self.Clines):
+					self.alphagram_index.setdefault(alphagram(line), index)
+			result = self.alphagram_index.get(alphagram(the_line))
+		if __trace__: print('# get_index(%s) = %s' % (the_line, result), file=sys.stderr)
 		return result
 
 ###############################################################################
 
-def nlgclu(cfileA, cfileB, featuretreeA, featuretreeB, minimal_size=2, maximal_size=None, verbose=False, lineout=False, feature_number=None, anchors=False, focus=None):
-	# Create the temporary file which will contain the clusters,
-	# but with the lines encoded as line numbers.
-	clufile = tempfile.NamedTemporaryFile(prefix="nlgclu_clufile", suffix=".txt", mode='w+t')
+def nlgclu_in_memory(featuretreeA, featuretreeB, minimal_size, maximal_size, verbose, ifocus, threads=__threads__, memory_limit=__memory_limit__, largest=__largest__,
+		time_budget=__time_budget__, max_clusters=__max_clusters__,
+		checkpoint=__checkpoint__, checkpoint_interval=__checkpoint_interval__, processes=__processes__):
+	"""
+	Call the C program on the feature trees in memory (int32 buffers).
+	ifocus is the list of the indices of the focus objects in A (empty for no focus):
+	only the clusters which contain at least one of them are output, in one traversal.
+	With more than one thread, the subproblems of the traversal are solved in parallel;
+	the clusters are the same, in the same order.
+	The clusters come back as three int32 arrays:
+		offsets (number of clusters + 1), objects in A and objects in B (number of pairs),
+	so that the pairs of cluster i are objectsA[j] : objectsB[j] for offsets[i] <= j < offsets[i+1].
+	If the work memory would exceed memory_limit bytes, the clustering stops and MemoryError is raised.
+	With largest, only the largest clusters are output (at most largest), sorted by decreasing size;
+	the subproblems of the traversal which cannot contain such large clusters are not explored.
+	After time_budget seconds or max_clusters clusters, the clustering stops
+	and the clusters found so far are returned.
+	With a checkpoint file, the state of the traversal is written into it every checkpoint_interval seconds
+	and when a budget is exhausted; if the file exists, the clustering resumes from it.
+	The clusters are the same, in the same order, as without checkpoints.
+	The file is removed when the clustering is complete.
+	A dictionary of the status of the clustering is returned with the clusters:
+		peak_memory		peak of the work memory of the C program in bytes;
+		complete		False if the clustering was stopped by a budget;
+		stopped_by		'time' or 'clusters' (None if complete);
+		coverage		fraction of the traversal done (1.0 if complete).
+	With more than one process, see nlgclu_in_processes (no largest, budgets or checkpoints).
+	"""
+	if processes != 1:
+		return nlgclu_in_processes(featuretreeA, featuretreeB, minimal_size, maximal_size, verbose, ifocus,
+				processes=processes, memory_limit=memory_limit)
+	clusters = nlgclu_in_C_from_buffers(featuretreeA.integerlist, featuretreeB.integerlist, minimal_size, maximal_size,
+				1 if __verbose__ or verbose else 0,
+				np.array(sorted(set(ifocus)), dtype=np.int32),
+				threads if threads else os.cpu_count() or 1,
+				__split_level__,
+				memory_limit or 0,
+				largest or 0,
+				time_budget or 0,
+				max_clusters or 0,
+				checkpoint,
+				checkpoint_interval or 0)
+	try:
+		offsets = np.empty(nlgclu_clusters_number(clusters) + 1, dtype=np.int32)
+		objectsA = np.empty(nlgclu_clusters_size(clusters), dtype=np.int32)
+		objectsB = np.empty_like(objectsA)
+		nlgclu_clusters_copy(clusters, offsets, objectsA, objectsB)
+		stopped_by = __stopped_by__.get(nlgclu_clusters_stopped(clusters))
+		status = { 'peak_memory': nlgclu_clusters_peak_memory(clusters),
+				'complete': stopped_by == None,
+				'stopped_by': stopped_by,
+				'coverage': nlgclu_clusters_coverage(clusters) }
+	finally:
+		nlgclu_clusters_free(clusters)
+	return offsets, objectsA, objectsB, status
+
+_worker_parameters = None
+
+def _init_worker(treeA, treeB, parameters):
+	""" Initializer of the worker processes: the feature trees and the parameters are received once per worker """
+	global _worker_parameters
+	# One tree (treeB is None) for the same feature tree in A and B: the C program checks it by address.
+	_worker_parameters = (treeA, treeA if treeB is None else treeB, parameters)
+
+def _solve_shard(shard):
+	""" Clusters of the subproblems of a shard (serialized, ntasks subproblems), in a worker process """
+	tasks, ntasks = shard
+	treeA, treeB, (minimal_size, maximal_size, verbose, ifocus, memory_limit) = _worker_parameters
+	counts = np.zeros(ntasks, dtype=np.int32)
+	clusters = nlgclu_in_C_from_tasks(treeA, treeB, minimal_size, maximal_size, verbose, ifocus, tasks, memory_limit, counts)
+	if clusters is None:
+		raise ValueError('the subproblems of the shard are not well-formed')
+	try:
+		offsets = np.empty(nlgclu_clusters_number(clusters) + 1, dtype=np.int32)
+		objectsA = np.empty(nlgclu_clusters_size(clusters), dtype=np.int32)
+		objectsB = np.empty_like(objectsA)
+		nlgclu_clusters_copy(clusters, offsets, objectsA, objectsB)
+		peak_memory = nlgclu_clusters_peak_memory(clusters)
+	finally:
+		nlgclu_clusters_free(clusters)
+	return offsets, objectsA, objectsB, counts, peak_memory
+
+def frontier_tasks(frontier):
+	"""
+	Beginnings of the subproblems in a frontier returned by the C program (see serialize_tasks in nlgclu.c).
+	Each subproblem is: __TASK_FIELDS__ integers (length, focus, focusnbr, diffvalue, level, position),
+	then length nodes in A, length nodes in B and, if focus, length focus flags.
+	"""
+	result, i = [], 0
+	while i < len(frontier):
+		result.append(i)
+		i += __TASK_FIELDS__ + int(frontier[i]) * (3 if frontier[i+1] else 2)
+	return result
+
+def balance_shards(surfaces, number):
+	"""
+	Share out the subproblems into at most number shards of about the same total surface:
+	largest surface first, into the shard with the smallest total so far.
+	In each shard, the subproblems are in their order in the frontier.
+
+	>>> balance_shards([5, 1, 4, 3, 3], 2)
+	[[0, 4], [1, 2, 3]]
+	"""
+	heap = [ (0, shard) for shard in range(number) ]
+	shards = [ [] for shard in range(number) ]
+	for task in sorted(range(len(surfaces)), key=lambda task: -surfaces[task]):
+		total, shard = heapq.heappop(heap)
+		shards[shard].append(task)
+		heapq.heappush(heap, (total + surfaces[task], shard))
+	return [ sorted(shard) for shard in shards if shard ]
+
+def nlgclu_in_processes(featuretreeA, featuretreeB, minimal_size, maximal_size, verbose, ifocus, processes=__processes__, memory_limit=__memory_limit__):
+	"""
+	Call the C program on a pool of processes.
+	The traversal down to the split level (__split_level__, 0: chosen by the C program) is done in this process;
+	the subproblems at the split level (the pairs of nodes with the same feature differences so far)
+	are independent: they are shared out into shards of about the same surface
+	(sum of the products of the widths of the pairs of nodes, see surface in nlgclu.c),
+	one per process, and each process solves the subproblems of its shard (in one thread).
+	The clusters are put back in the order of the sequential traversal:
+	they are the same, in the same order, as with one process.
+	memory_limit applies to each process; peak_memory is the largest peak of the processes.
+	"""
+	processes = processes if processes else os.cpu_count() or 1
+	focus = np.array(sorted(set(ifocus)), dtype=np.int32)
+	verbose = 1 if __verbose__ or verbose else 0
+	treeA, treeB = featuretreeA.integerlist, featuretreeB.integerlist
+	clusters = nlgclu_in_C_frontier(treeA, treeB, minimal_size, maximal_size, verbose, focus,
+				processes, __split_level__, memory_limit or 0)
+	try:
+		offsets = np.empty(nlgclu_clusters_number(clusters) + 1, dtype=np.int32)
+		objectsA = np.empty(nlgclu_clusters_size(clusters), dtype=np.int32)
+		objectsB = np.empty_like(objectsA)
+		nlgclu_clusters_copy(clusters, offsets, objectsA, objectsB)
+		frontier = np.empty(nlgclu_clusters_frontier_size(clusters), dtype=np.int32)
+		nlgclu_clusters_copy_frontier(clusters, frontier)
+		peak_memory = nlgclu_clusters_peak_memory(clusters)
+	finally:
+		nlgclu_clusters_free(clusters)
+
+	# Surface of each subproblem, from the widths of its nodes.
+	starts = frontier_tasks(frontier)
+	widthsA = treeA.reshape(-1, __NODESIZE__)[:, 1].astype(np.int64)
+	widthsB = treeB.reshape(-1, __NODESIZE__)[:, 1].astype(np.int64)
+	surfaces = []
+	for i in starts:
+		length = frontier[i]
+		nodes = frontier[i + __TASK_FIELDS__:i + __TASK_FIELDS__ + 2 * length]
+		surfaces.append(int(np.dot(widthsA[nodes[:length]], widthsB[nodes[length:]])))
+	ends = starts[1:] + [ len(frontier) ]
+	shards = balance_shards(surfaces, min(processes, len(starts)))
+	if verbose: print('# Multiprocessing pool: {} processes, {} subproblems, surfaces of the shards: {}'.format(
+		len(shards), len(starts), [ sum( surfaces[task] for task in shard ) for shard in shards ]), file=sys.stderr)
+
+	results = []
+	if shards:
+		pool = mp.Pool(len(shards), initializer=_init_worker,
+				initargs=(treeA, None if treeA is treeB else treeB, (minimal_size, maximal_size, verbose, focus, memory_limit or 0)))
+		try:
+			results = pool.map(_solve_shard,
+				[ (np.concatenate([ frontier[starts[task]:ends[task]] for task in shard ]), len(shard)) for shard in shards ],
+				chunksize=1)
+		finally:
+			pool.close()
+			pool.join()
+
+	# Clusters found above the split level before each subproblem (position), then the clusters of the subproblem.
+	where = {}
+	for shard, tasks in enumerate(shards):
+		for k, task in enumerate(tasks):
+			where[task] = (shard, k)
+	sources = [ (offsets, objectsA, objectsB) ] + [ result[:3] for result in results ]
+	ranges, done = [], 0
+	for task, i in enumerate(starts):
+		position = int(frontier[i + 5])
+		ranges.append((0, done, position))
+		done = position
+		shard, k = where[task]
+		counts = results[shard][3]
+		ranges.append((1 + shard, 0 if k == 0 else int(counts[k-1]), int(counts[k])))
+	ranges.append((0, done, len(offsets) - 1))
+	sizes = [ np.diff(sources[source][0][begin:end+1]) for source, begin, end in ranges ]
+	pairs = [ (sources[source][0][begin], sources[source][0][end]) for source, begin, end in ranges ]
+	merged_offsets = np.concatenate(([ 0 ], np.cumsum(np.concatenate(sizes)))).astype(np.int32)
+	merged_objectsA = np.concatenate([ sources[source][1][first:last] for (source, begin, end), (first, last) in zip(ranges, pairs) ])
+	merged_objectsB = np.concatenate([ sources[source][2][first:last] for (source, begin, end), (first, last) in zip(ranges, pairs) ])
+	status = { 'peak_memory': max([ peak_memory ] + [ result[4] for result in results ]),
+			'complete': True,
+			'stopped_by': None,
+			'coverage': 1.0 }
+	return merged_offsets, merged_objectsA, merged_objectsB, status
+
+def tag_focus(list_of_clusters, offsets, objectsA, objectsB, focus_index, symmetry=True):
+	"""
+	Tag each cluster with the focus words that it contains (attribute focus, sorted list).
+	offsets, objectsA, objectsB are the arrays returned by nlgclu_in_memory
+	for list_of_clusters, in the same order.
+	focus_index maps each focus word to its index in A (None if not found);
+	several focus words may have the same index (same alphagram).
+	If A and B are not the same (symmetry is False), the focus words are looked for in A only.
+	"""
+	words_of_index = {}
+	for word, index in focus_index.items():
+		if index != None: words_of_index.setdefault(index, []).append(word)
+	objects = np.array(sorted(words_of_index), dtype=np.int32)
+	# Index of the cluster of each pair.
+	cluster_of_pair = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+	inA = np.isin(objectsA, objects)
+	inB = np.isin(objectsB, objects) if symmetry else np.zeros(len(objectsB), dtype=bool)
+	found = set(zip(np.concatenate((cluster_of_pair[inA], cluster_of_pair[inB])).tolist(),
+				np.concatenate((objectsA[inA], objectsB[inB])).tolist()))
+	for cluster in list_of_clusters:
+		cluster.focus = []
+	for i, index in sorted(found):
+		list_of_clusters[i].focus.extend(words_of_index[index])
+	for cluster in list_of_clusters:
+		cluster.focus.sort()
+
+def clusters_by_focus(list_of_clusters):
+	"""
+	Dictionary from each focus word to the list of the clusters which contain it,
+	for the clusters output by nlgclu with several focus words.
+	"""
+	result = {}
+	for cluster in list_of_clusters:
+		for word in getattr(cluster, 'focus', []):
+			result.setdefault(word, []).append(cluster)
+	return { word: ListOfClusters(clusters, list_of_clusters.indistinguishables) for word, clusters in result.items() }
+
+def nlgclu(cfileA, cfileB, featuretreeA, featuretreeB, minimal_size=2, maximal_size=None, verbose=False, lineout=False, focus=None, threads=__threads__, memory_limit=__memory_limit__, largest=__largest__,
+		time_budget=__time_budget__, max_clusters=__max_clusters__,
+		checkpoint=__checkpoint__, checkpoint_interval=__checkpoint_interval__, processes=__processes__):
+	# cfileA and cfileB are the temporary files written by CFeatureTree.store.
+	# If they are None, the feature trees are passed to the C program in memory
+	# and the clusters are returned in memory,
+	# with the peak of the work memory of the C program in bytes (attribute peak_memory).
+	# memory_limit (bytes) and largest (the largest clusters only, sorted by decreasing size)
+	# apply only in this case.
+	# So do the budgets, time_budget (seconds) and max_clusters:
+	# when one is exhausted, the clusters found so far are returned
+	# with the attributes complete (False), stopped_by ('time' or 'clusters')
+	# and coverage (fraction of the traversal done, see nlgclu_in_memory).
+	# So do the checkpoints: the clustering resumes from the checkpoint file if it exists.
+	# So do the processes: the subproblems of the traversal are solved by a pool of processes
+	# (not with largest, budgets or checkpoints, see nlgclu_in_processes).
+
+	# The focus is one word or a collection of words:
+	# the clusters output contain at least one of them.
 
 	# Parameter adaptation for the C program (no None in C).
 	if maximal_size == None: maximal_size = -1
-	if focus == None:
-		ifocus = -1
-	else:
-		ifocus = featuretreeA.get_index(focus)
-	if ifocus == None:
-		print('### WARNING: focus word "{}" not found in fileA; no cluster output.'.format(focus), file=sys.stderr)
+	focus_words = [] if focus == None else [ focus ] if isinstance(focus, str) else list(focus)
+	focus_index = { word: featuretreeA.get_index(word) for word in focus_words }
+	ifocus = sorted(set( index for index in focus_index.values() if index != None ))
+	for word in focus_words:
+		if focus_index[word] == None:
+			print('### WARNING: focus word "{}" not found in fileA; no cluster output{}.'.format(word,
+				'' if not ifocus else ' for this word'), file=sys.stderr)
+	if focus_words and not ifocus:
 		return ListOfClusters('')
 
+	if 1 < len(ifocus) and cfileA != None and cfileB != None:
+		# The file interface of the C program takes only one focus object.
+		print('### WARNING: more than one focus word; the lines are not output by the C program.', file=sys.stderr)
+		cfileA = cfileB = None
+	if (largest or time_budget or max_clusters or checkpoint) and cfileA != None and cfileB != None:
+		# The file interface of the C program outputs all the clusters, in one go.
+		print('### WARNING: largest clusters only, budgets or checkpoints; the lines are not output by the C program.', file=sys.stderr)
+		cfileA = cfileB = None
+	if processes != 1 and (largest or time_budget or max_clusters or checkpoint):
+		# The budgets and the checkpoints are for one traversal, in one process.
+		print('### WARNING: largest clusters only, budgets or checkpoints; clustering in one process.', file=sys.stderr)
+		processes = 1
+	if processes != 1 and cfileA != None and cfileB != None:
+		# The file interface of the C program runs in one process.
+		print('### WARNING: more than one process; the lines are not output by the C program.', file=sys.stderr)
+		cfileA = cfileB = None
+
+	if cfileA == None or cfileB == None:
+		# Call the C program for actual clustering.
+		t1 = time.time()
+		offsets, objectsA, objectsB, status = nlgclu_in_memory(featuretreeA, featuretreeB, minimal_size, maximal_size, verbose, ifocus,
+				threads=threads, memory_limit=memory_limit, largest=largest, time_budget=time_budget, max_clusters=max_clusters,
+				checkpoint=checkpoint, checkpoint_interval=checkpoint_interval, processes=processes)
+		if __verbose__: print('## [Python] Clustering time: ' + ('%.2f' % (time.time() - t1)) + 's', file=sys.stderr)
+		if __verbose__: print('## Peak work memory of the C program: %d bytes' % status['peak_memory'], file=sys.stderr)
+		if not status['complete']:
+			print('### WARNING: clustering stopped by the {} budget, {:.1f}% of the traversal done; the clusters are incomplete.'.format(
+				status['stopped_by'], 100 * status['coverage']), file=sys.stderr)
+		# Converting the integers into lines directly from the arrays.
+		t1 = time.time()
+		line_cluster_file = ListOfConvertedClusters.fromArrays(offsets, objectsA, objectsB, featuretreeA.Clines, featuretreeB.Clines)
+		if focus_words: tag_focus(line_cluster_file, offsets, objectsA, objectsB, focus_index, featuretreeA is featuretreeB)
+		for name, value in status.items(): setattr(line_cluster_file, name, value)
+		if __verbose__: print('# Number of clusters transcribed: %d' % len(line_cluster_file), file=sys.stderr)
+		if __verbose__: print('## Transcription time: ' + ('%.2f' % (time.time() - t1)) + 's', file=sys.stderr)
+		return line_cluster_file
+
+	# Create the temporary file which will contain the clusters,
+	# but with the lines encoded as line numbers.
+	clufile = tempfile.NamedTemporaryFile(prefix="nlgclu_clufile", suffix=".txt", mode='w+t')
+
 	# Call the C program for actual clustering.
 	t1 = time.time()
 	nlgclu_in_C(cfileA.name, cfileB.name, clufile.name, minimal_size, maximal_size,
 				1 if __verbose__ or verbose else 0,
 				1 if __lineout__ or lineout else 0,
-				ifocus)
+				ifocus[0] if ifocus else -1)
 	if __verbose__: print('## [Python] Clustering time: ' + ('%.2f' % (time.time() - t1)) + 's', file=sys.stderr)
 	clufile.flush()
 
@@ -527,14 +893,20 @@ def nlgclu(cfileA, cfileB, featuretreeA, featuretreeB, minimal_size=2, maximal_s
 	# Converting the file of integers into a file with lines (the lines correspond to the integers).
 	if __verbose__: print('## [Python] Transcribing clusters: ' + ('%.2f' % (time.time() - t1)) + 's', file=sys.stderr)
 	line_cluster_file = ListOfConvertedClusters(integer_cluster_file, featuretreeA.Clines, featuretreeB.Clines)
+	if focus_words:
+		for cluster in line_cluster_file: cluster.focus = sorted( word for word in focus_words if focus_index[word] != None )
 	if __verbose__: print('# Number of clusters transcribed: %d' % len(line_cluster_file), file=sys.stderr)
 	if __verbose__: print('## Transcription time: ' + ('%.2f' % (time.time() - t1)) + 's', file=sys.stderr)
 	if __verbose__: print('## ListOfClusters: %s' % line_cluster_file, file=sys.stderr)
 	return line_cluster_file
 
-def NlgClustering(fileA=sys.stdin, fileB=None, minimal_size=2, maximal_size=None, verbose=False, lineout=False, feature_number=None, anchors=False, focus=None):
+def NlgClustering(fileA=sys.stdin, fileB=None, minimal_size=2, maximal_size=None, verbose=False, lineout=False, feature_number=None, anchors=False, anchor_selection=__anchor_selection__, focus=None, threads=__threads__, memory_limit=__memory_limit__, largest=__largest__,
+		time_budget=__time_budget__, max_clusters=__max_clusters__,
+		checkpoint=__checkpoint__, checkpoint_interval=__checkpoint_interval__, processes=__processes__):
 	"""
 	This function is the entry point of this module.
+	With feature_number or anchors (one file only), the vectors of the words are reduced
+	before clustering (see NlgClusteringFromVectors).
 	"""
 
 #	FIXED:
@@ -553,6 +925,28 @@ def NlgClustering(fileA=sys.stdin, fileB=None, minimal_size=2, maximal_size=None
 #	toto : popo :: tata : apap
 	
 
+	if anchors or feature_number != None:
+		# The reduction of the features is done on the vectors of the words.
+		if fileB != None:
+			raise ValueError('feature_number and anchors are only implemented for one file')
+		return NlgClusteringFromVectors(Vectors.fromFile([ line.strip() for line in fileA ]).get_distinguishables(),
+			minimal_size=minimal_size,
+			maximal_size=maximal_size,
+			verbose=verbose,
+			lineout=lineout,
+			feature_number=feature_number,
+			anchors=anchors,
+			anchor_selection=anchor_selection,
+			focus=focus,
+			threads=threads,
+			memory_limit=memory_limit,
+			largest=largest,
+			time_budget=time_budget,
+			max_clusters=max_clusters,
+			checkpoint=checkpoint,
+			checkpoint_interval=checkpoint_interval,
+			processes=processes)
+
 	if fileB == None:
 #		vectorsA = "" # RH added on 17/8/2021; RH commented on 19/8/2021
 #		vectorsA+=str(Vectors.fromFile(lines=fileA)) # RH added on 17/8/2021; RH commented on 19/8/2021
@@ -563,7 +957,7 @@ def NlgClustering(fileA=sys.stdin, fileB=None, minimal_size=2, maximal_size=None
 		featuretreeA = featuretreeB = CFeatureTree.fromFile(fileA,alphabet=None) # RH modified on 26/8/2021
 #		featuretreeA = featuretreeB = CFeatureTree.fromFile(vectorsA)
 		# Creating the temporary files associated with the data set.
-		cfileA = cfileB = featuretreeA.store("nlgclu_fileA")
+		cfileA = cfileB = featuretreeA.store_for_debug("nlgclu_fileA", lineout)
 	else:
 #		vectorsA = "" # RH added on 4/8/2021; RH commented on 17/8/2021
 #		vectorsA+=str(Vectors.fromFile(lines=fileA))[3:] # RH added on 4/8/2021; RH commented on 17/8/2021
@@ -607,8 +1001,8 @@ def NlgClustering(fileA=sys.stdin, fileB=None, minimal_size=2, maximal_size=None
 #		featuretreeB = CFeatureTree.fromFile(vectorsAB) # RH added on 4/8/2021; RH commented on 17/8/2021; RH commented on 18/8/2021
 		# Create the temporary files associated with each data set.
 #		cfileA = cfileB = featuretreeA.store("nlgclu_fileA") # RH modified on 17/8/2021; RH commented on 18/8/2021
-		cfileA = featuretreeA.store("nlgclu_fileA")
-		cfileB = featuretreeB.store("nlgclu_fileB") 
+		cfileA = featuretreeA.store_for_debug("nlgclu_fileA", lineout)
+		cfileB = featuretreeB.store_for_debug("nlgclu_fileB", lineout)
 
 	# Call analogical clustering.
 	return nlgclu(cfileA, cfileB, featuretreeA, featuretreeB,
@@ -616,29 +1010,72 @@ def NlgClustering(fileA=sys.stdin, fileB=None, minimal_size=2, maximal_size=None
 		maximal_size=maximal_size,
 		verbose=verbose,
 		lineout=lineout,
-		feature_number=feature_number,
-		anchors=anchors,
-		focus=focus)
-
-def NlgClusteringFromVectors(vectors, minimal_size=2, maximal_size=None, verbose=False, lineout=False, feature_number=None, anchors=False, focus=None):
+		focus=focus,
+		threads=threads,
+		memory_limit=memory_limit,
+		largest=largest,
+		time_budget=time_budget,
+		max_clusters=max_clusters,
+		checkpoint=checkpoint,
+		checkpoint_interval=checkpoint_interval,
+		processes=processes)
+
+def NlgClusteringFromVectors(vectors, minimal_size=2, maximal_size=None, verbose=False, lineout=False, feature_number=None, anchors=False, anchor_selection=__anchor_selection__, focus=None, threads=__threads__, memory_limit=__memory_limit__, largest=__largest__,
+		time_budget=__time_budget__, max_clusters=__max_clusters__,
+		checkpoint=__checkpoint__, checkpoint_interval=__checkpoint_interval__, processes=__processes__):
+	indistinguishables, full_vectors = None, vectors
+	if anchors or feature_number != None:
+		# Either the similarities to anchor words (as many as feature_number)
+		# or only the feature_number most discriminant features: the feature tree is less deep.
+		# Words which become indistinguishable are added to the clusters,
+		# then the clusters are checked and split by the full vectors (see ListOfStrClusters.fromReducedClusters).
+		if anchors:
+			reduced_vectors = anchor_vectors(vectors.words,
+				number=__anchor_default_number__ if feature_number == None else feature_number,
+				selection=anchor_selection, verbose=__verbose__ or verbose)
+		else:
+			reduced_vectors = vectors.select_features(feature_number, verbose=__verbose__ or verbose)
+		vectors, indistinguishables = reduced_vectors.get_distinguishables(), reduced_vectors.indistinguishables
 	featuretreeA = featuretreeB = CFeatureTree.fromVectors(vectors)
-	# Creating the temporary files associated with the data set.
-	cfileA = cfileB = featuretreeA.store("nlgclu_fileA")
+	# Creating the temporary files associated with the data set (only for debugging).
+	cfileA = cfileB = featuretreeA.store_for_debug("nlgclu_fileA", lineout)
 
 	# Call analogical clustering.
-	return nlgclu(cfileA, cfileB, featuretreeA, featuretreeB,
+	result = nlgclu(cfileA, cfileB, featuretreeA, featuretreeB,
 		minimal_size=minimal_size,
 		maximal_size=maximal_size,
 		verbose=verbose,
 		lineout=lineout,
-		feature_number=feature_number,
-		anchors=anchors,
-		focus=focus)
+		focus=focus,
+		threads=threads,
+		memory_limit=memory_limit,
+		largest=largest if indistinguishables == None else None,
+		time_budget=time_budget,
+		max_clusters=max_clusters,
+		checkpoint=checkpoint,
+		checkpoint_interval=checkpoint_interval,
+		processes=processes)
+	if indistinguishables != None:
+		# The ratios agree on the reduced vectors only.
+		# The clusters are replaced in place: the status of the clustering is kept (peak_memory, etc.).
+		result.set_indistinguishables(indistinguishables)
+		result[:] = ListOfStrClusters.fromReducedClusters(result, full_vectors, minimal_size, maximal_size)
+		result.set_indistinguishables(full_vectors.indistinguishables)
+		if largest != None:
+			# A cluster split by the full vectors may be smaller than a cluster which is not
+			# among the largest ones of the reduced vectors: the largest are kept after splitting.
+			result[:] = sorted(result, key=len, reverse=True)[:largest]
+	return result
 
-def VectorNlgClustering(fileA=sys.stdin, fileB=None, minimal_size=2, maximal_size=-1, verbose=False, lineout=False, feature_number=None, anchors=False, focus=None):
+def VectorNlgClustering(fileA=sys.stdin, fileB=None, minimal_size=2, maximal_size=-1, verbose=False, lineout=False, feature_number=None, anchors=False, anchor_selection=__anchor_selection__, focus=None, threads=__threads__, memory_limit=__memory_limit__, largest=__largest__,
+		time_budget=__time_budget__, max_clusters=__max_clusters__,
+		checkpoint=__checkpoint__, checkpoint_interval=__checkpoint_interval__, processes=__processes__):
+	if anchors or feature_number != None:
+		# The vectors are given: they are clustered as they are.
+		raise ValueError('feature_number and anchors are not implemented for vectors given in a file')
 	featuretreeA = CFeatureTree.fromFile(fileA)
-	# Creating the temporary files associated with the data set.
-	cfileA = featuretreeA.store("nlgclu_fileA")
+	# Creating the temporary files associated with the data set (only for debugging).
+	cfileA = featuretreeA.store_for_debug("nlgclu_fileA", lineout)
 	
 	# Call analogical clustering.
 	return nlgclu(cfileA, cfileA, featuretreeA, featuretreeA,
@@ -646,9 +1083,15 @@ def VectorNlgClustering(fileA=sys.stdin, fileB=None, minimal_size=2, maximal_siz
 		maximal_size=maximal_size,
 		verbose=verbose,
 		lineout=lineout,
-		feature_number=feature_number,
-		anchors=anchors,
-		focus=focus)
+		focus=focus,
+		threads=threads,
+		memory_limit=memory_limit,
+		largest=largest,
+		time_budget=time_budget,
+		max_clusters=max_clusters,
+		checkpoint=checkpoint,
+		checkpoint_interval=checkpoint_interval,
+		processes=processes)
 
 ###############################################################################
 
@@ -697,6 +1140,9 @@ def read_argv():
 						help = 'use similarities to anchor words '\
 								'instead of characters in the alphabet as features '\
 								'(number of anchors given by option -f, default: %d)' % __anchor_default_number__)
+	parser.add_argument('-a','--anchor_selection',
+						action='store', dest='anchor_selection', type=str, default=__anchor_selection__, choices=['random', 'frequency', 'farthest'],
+						help = 'choice of the anchor words for option -A (default: %(default)s)')
 	parser.add_argument('-m','--minimal_cluster_size',
 						action='store',dest='minsize', type=int, default=2,
 						help = 'minimal size of clusters output (default: %(default)s, ' \
@@ -706,8 +1152,43 @@ def read_argv():
 						action='store',dest='maxsize', type=int, default=None,
 						help = 'maximal size of clusters output (default: %(default)s)')
 	parser.add_argument('-F','--focus',
-						action='store',dest='focus', type=str, default=None,
-						help = 'only output those clusters which contain FOCUS')
+						action='append',dest='focus', type=str, default=None,
+						help = 'only output those clusters which contain FOCUS '\
+								'(may be repeated: clusters which contain at least one of the FOCUS words)')
+	parser.add_argument('-j','--threads',
+						action='store',dest='threads', type=int, default=__threads__,
+						help = 'number of threads for the clustering (default: %(default)s, 0 for the number of CPUs); ' \
+								'the clusters are the same whatever the number of threads')
+	parser.add_argument('-P','--processes',
+						action='store',dest='processes', type=int, default=__processes__,
+						help = 'number of processes for the clustering (default: %(default)s, 0 for the number of CPUs); ' \
+								'the clusters are the same whatever the number of processes')
+	parser.add_argument('--split_level',
+						action='store',dest='split_level', type=int, default=__split_level__,
+						help = 'level of the feature tree where the clustering is shared out to the threads or the processes ' \
+								'(default: %(default)s, for the first level with enough subproblems)')
+	parser.add_argument('--memory_limit',
+						action='store',dest='memory_limit', type=int, default=None,
+						help = 'limit of the work memory of the clustering in MB (default: %(default)s, for no limit)')
+	parser.add_argument('-k','--largest',
+						action='store',dest='largest', type=int, default=__largest__,
+						help = 'only output the LARGEST largest clusters, by decreasing size ' \
+								'(default: %(default)s, for all clusters)')
+	parser.add_argument('--time_budget',
+						action='store',dest='time_budget', type=float, default=__time_budget__,
+						help = 'stop the clustering after TIME_BUDGET seconds and output the clusters found so far ' \
+								'(default: %(default)s, for no limit)')
+	parser.add_argument('--max_clusters',
+						action='store',dest='max_clusters', type=int, default=__max_clusters__,
+						help = 'stop the clustering after MAX_CLUSTERS clusters ' \
+								'(default: %(default)s, for no limit)')
+	parser.add_argument('--checkpoint',
+						action='store',dest='checkpoint', type=str, default=__checkpoint__,
+						help = 'write the state of the clustering into CHECKPOINT periodically; ' \
+								'if CHECKPOINT exists, resume the clustering from it (default: %(default)s, for no checkpoint)')
+	parser.add_argument('--checkpoint_interval',
+						action='store',dest='checkpoint_interval', type=float, default=__checkpoint_interval__,
+						help = 'seconds between two checkpoints (default: %(default)s)')
 	parser.add_argument('--vectors',
 						action='store_true', dest='vectors', default=False,
                   		help='input file contains vectors')
@@ -739,6 +1220,16 @@ if __name__ == '__main__':
 	__minimal_size__ = options.minsize
 	__focus__ = options.focus
 	__anchors__ = options.anchors
+	__anchor_selection__ = options.anchor_selection
+	__threads__ = options.threads
+	__processes__ = options.processes
+	__split_level__ = options.split_level
+	__memory_limit__ = None if options.memory_limit == None else options.memory_limit * 2**20
+	__largest__ = options.largest
+	__time_budget__ = options.time_budget
+	__max_clusters__ = options.max_clusters
+	__checkpoint__ = options.checkpoint
+	__checkpoint_interval__ = options.checkpoint_interval
 	if __verbose__: print('# Focus: %s' % options.focus, file=sys.stderr)
 	if __verbose__: print('# Minimal size of clusters: %d' % __minimal_size__, file=sys.stderr)
 	__maximal_size__ = -1 if options.maxsize == None else options.maxsize
@@ -746,6 +1237,30 @@ if __name__ == '__main__':
 	if __feature_number__ != None and 1 > __feature_number__:
 		print('Number of features should be equal to or greater than 1.', file=sys.stderr)
 		exit(-1)
+	if 0 > __threads__:
+		print('Number of threads should be equal to or greater than 0.', file=sys.stderr)
+		exit(-1)
+	if 0 > __processes__:
+		print('Number of processes should be equal to or greater than 0.', file=sys.stderr)
+		exit(-1)
+	if 0 > __split_level__:
+		print('Split level should be equal to or greater than 0.', file=sys.stderr)
+		exit(-1)
+	if __memory_limit__ != None and 0 >= __memory_limit__:
+		print('Memory limit should be greater than 0.', file=sys.stderr)
+		exit(-1)
+	if __largest__ != None and 1 > __largest__:
+		print('Number of largest clusters should be equal to or greater than 1.', file=sys.stderr)
+		exit(-1)
+	if __time_budget__ != None and 0 >= __time_budget__:
+		print('Time budget should be greater than 0.', file=sys.stderr)
+		exit(-1)
+	if __max_clusters__ != None and 1 > __max_clusters__:
+		print('Maximal number of clusters should be equal to or greater than 1.', file=sys.stderr)
+		exit(-1)
+	if 0 >= __checkpoint_interval__:
+		print('Interval between checkpoints should be greater than 0.', file=sys.stderr)
+		exit(-1)
 	if 2 > __minimal_size__:
 		print('Minimal size of clusters should be equal to or greater than 2.', file=sys.stderr)
 		exit(-1)
@@ -769,6 +1284,9 @@ if __name__ == '__main__':
 	if options.example:
 		fileA = mytestdata
 		fileB = None
+	if (__feature_number__ != None or __anchors__) and (options.vectors or fileB != None):
+		print('Options -f and -A are only implemented for one file of words.', file=sys.stderr)
+		exit(-1)
 
 	"""
 	TO BE FIXED:
@@ -782,12 +1300,25 @@ if __name__ == '__main__':
 		nlgclustering = NlgClustering
 
 	t1 = time.time()
-	print(nlgclustering(fileA, fileB,
-		minimal_size=options.minsize,
-		maximal_size=options.maxsize,
-		verbose=options.verbose,
-		lineout=options.lineout,
-		feature_number=options.fn,
-		anchors=options.anchors,
-		focus=options.focus))
+	try:
+		print(nlgclustering(fileA, fileB,
+			minimal_size=options.minsize,
+			maximal_size=options.maxsize,
+			verbose=options.verbose,
+			lineout=options.lineout,
+			feature_number=options.fn,
+			anchors=options.anchors,
+			anchor_selection=__anchor_selection__,
+			focus=options.focus,
+			threads=options.threads,
+			memory_limit=__memory_limit__,
+			largest=__largest__,
+			time_budget=__time_budget__,
+			max_clusters=__max_clusters__,
+			checkpoint=__checkpoint__,
+			checkpoint_interval=__checkpoint_interval__,
+			processes=__processes__))
+	except MemoryError as e:
+		print('### ERROR: %s.' % e, file=sys.stderr)
+		exit(-1)
 	if __verbose__: print('# Processing time: %.2fs' % (time.time() - t1), file=sys.stderr)
\ No newline at end of file
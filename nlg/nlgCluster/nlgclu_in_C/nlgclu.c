@@ -9,6 +9,7 @@
 #include <string.h>
 #include <limits.h>
 #include <time.h>
+#include <pthread.h>
 
 #include "nlgclu.h"
 
@@ -32,7 +33,6 @@
 
 const int SHIFT = 4;
 const char *BLANKS = "                                       ";
-int length = 0;
 
 /*
  * Exit on error
@@ -140,35 +140,22 @@ char *li2s(int length, int *list)
 #define FALSE	0
 
 /*
- * The two feature trees are global variables.
- * A feature tree is just a list of integers,
- * more precisely of list of sequences of NODESIZE integers.
- * Each position divided by NODESIZE in a feature tree is the index of a node.
+ * Reasons why the traversal was stopped before the end by a budget (see BUDGET)
  */
 
-int VERBOSE = 0;
-int LINEOUT = 0;
-int FOCUS_WORD = -1; /* focus word when only clusters containing this word are wanted. */
-int symmetry = FALSE;
-int *treeA = NULL; /* The first  feature tree structure */
-int *treeB = NULL; /* The second feature tree structure */
-int last_level = 0;
-char **linetableA = NULL; /* The starting point of each line in the first list of lines */
-char **linetableB = NULL; /* The starting point of each line in the second list of lines */
-int **indexvector = NULL ; /* For each level, contains a vector of all possible values, which contains the number of pairs for that value. */
-int **maxindexvector = NULL ; /* For each level, contains the allocated memory for the number of possible values. */
-int ***nextnodeAmatrix = NULL ; /* Matrix of indices for nodeA on the next level. */
-int	***nextnodeBmatrix = NULL ; /* Matrix of indices for nodeB on the next level. */
+#define STOPPED_BY_TIME		1
+#define STOPPED_BY_CLUSTERS	2
 
-/*
- * A well-formed cluster is considered degenerated if its length is less than the following threshold.
- */
+#define BUDGET_CHECK_INTERVAL	1024		/* number of subproblems between two readings of the clock */
 
-int CLUSTER_MINIMAL_LENGTH = 2;			/* 2 for all theoretically possible clusters */
-int CLUSTER_MAXIMAL_LENGTH = INT_MAX;	/* INT_MAX for all theoretically possible clusters */
+#define CHECKPOINT_MAGIC		0x4e4c4301	/* first bytes of a checkpoint file (see write_checkpoint) */
+#define TASK_FIELDS				6			/* integers before the nodes of a task in a checkpoint file or a shard (see serialize_tasks) */
 
 /*
  * Structure of a node in a feature tree.
+ * A feature tree is just a list of integers,
+ * more precisely of list of sequences of NODESIZE integers.
+ * Each position divided by NODESIZE in a feature tree is the index of a node.
  */
 
 #define NODESIZE						7					/* size of the node in the feature tree structure */
@@ -181,13 +168,6 @@ int CLUSTER_MAXIMAL_LENGTH = INT_MAX;	/* INT_MAX for all theoretically possible
 #define next_level_begin_node(tree,i)	tree[NODESIZE*i+5]	/* beginning of the next level */
 #define next_level_end_node(tree,i)		tree[NODESIZE*i+6]	/* end of the next level */
 
-/*
- * Values for the number of values and the number of pairs.
- */
-
-int _VALMIN = 32;
-int _VALNBR = 32;
-
 /*
  * For trace only
  */
@@ -218,67 +198,675 @@ typedef struct FEATURES_T
 FEATURES ;
 
 /*
- * Temporary file for the clusters.
+ * In memory, growable buffers for the clusters (see nlgclu.h):
+ * 	the pairs of objects of cluster i are at positions
+ *		offsets[i] to offsets[i+1] - 1 in objectsA and objectsB.
  */
 
-FILE *cluout = NULL ;
+struct CLUSTERS_T
+{
+	int number ;		/* number of clusters */
+	int maxnumber ;		/* allocated memory for offsets (minus one) */
+	int *offsets ;
+	int size ;			/* total number of pairs in all clusters */
+	int maxsize ;		/* allocated memory for objectsA and objectsB */
+	int *objectsA ;
+	int *objectsB ;
+	long peak_memory ;	/* peak of the work memory of the clustering, in bytes (see MEMORY) */
+	int out_of_memory ;	/* TRUE if the clustering was stopped by the memory limit: the clusters are incomplete */
+	int stopped ;		/* STOPPED_BY_TIME or STOPPED_BY_CLUSTERS if the clustering was stopped by a budget (0: complete) */
+	double coverage ;	/* fraction of the traversal done (1.0: complete) */
+	/* Top-K mode (see keep_largest_clusters). */
+	int largest ;		/* number of clusters wanted (0: all the clusters) */
+	int *heap ;			/* min-heap of the sizes of the largest clusters appended so far */
+	int heapsize ;		/* number of sizes in the heap (at most largest) */
+	int heapmaxsize ;	/* allocated memory for the heap */
+	int compacted ;		/* number of clusters after the last compaction (see compact_clusters) */
+	/* Sharded traversal (see nlgclu_in_C_frontier). */
+	int *frontier ;		/* tasks at the split level, serialized (see serialize_tasks) */
+	int frontiersize ;	/* number of integers in frontier */
+} ;
 
 /*
- * Compute the minimal possible value
+ * Work memory of the traversal:
+ * the pairs of nodes of each level are allocated in an arena (one per level and per thread).
+ * All the pairs of the next level computed by one call to xrefine_down
+ * are stored contiguously in the arena of the level, sorted by feature difference value.
+ * As there is only one call to xrefine_down on a level at a time (depth-first traversal),
+ * the arena is reset when the call returns and reused by the next call on the same level:
+ * it only grows to the largest number of pairs on its level.
+ */
+
+typedef struct ARENA_T
+{
+	int size ;			/* number of pairs in use (0 when no call to xrefine_down is active on the level) */
+	int maxsize ;		/* allocated number of pairs */
+	int *nodesA ;
+	int *nodesB ;
+	int *focus ;		/* focus flags, only with focus words */
+}
+ARENA ;
+
+/*
+ * Accounting of the work memory (arenas, vectors per level and tasks),
+ * shared by all the threads of one clustering.
+ */
+
+typedef struct MEMORY_T
+{
+	long used ;				/* bytes currently allocated */
+	long peak ;				/* maximum of used */
+	long limit ;			/* no allocation beyond this number of bytes (0: no limit) */
+	int exceeded ;			/* TRUE when an allocation was refused: the traversal stops */
+	pthread_mutex_t mutex ;
+}
+MEMORY ;
+
+/*
+ * Budgets of the traversal, shared by all the threads of one clustering:
+ * when a budget is exhausted, the traversal stops cleanly
+ * and the clusters found so far are returned.
+ * The clock is read only every BUDGET_CHECK_INTERVAL subproblems (see is_stopped).
+ */
+
+typedef struct BUDGET_T
+{
+	double deadline ;		/* wall-clock time at which the traversal stops (0: no time budget) */
+	int max_clusters ;		/* the traversal stops after this number of clusters (0: no limit) */
+	int clusters ;			/* number of clusters output so far */
+	int stopped ;			/* STOPPED_BY_TIME or STOPPED_BY_CLUSTERS when a budget is exhausted */
+	double checkpoint_time ;	/* wall-clock time of the next pause for a checkpoint (0: no checkpoint) */
+	int paused ;			/* TRUE when the traversal pauses for a checkpoint */
+	pthread_mutex_t mutex ;	/* protects clusters */
+}
+BUDGET ;
+
+/*
+ * Parallel traversal:
+ * the subproblems of the traversal at a given level (split level)
+ * are collected as tasks, and solved by several threads.
+ * A task is a list of pairs of nodes with the same feature difference value,
+ * as passed to xrefine_down.
+ * Each task has its own output so that the clusters can be merged
+ * in the same order as in the sequential traversal.
+ */
+
+typedef struct TASK_T
+{
+	int length ;
+	int *nodesA ;
+	int *nodesB ;
+	int *focus ;			/* focus flags of the pairs (see xrefine_down) */
+	int focusnbr ;
+	double weight ;			/* part of the traversal of this task (see CONTEXT) */
+	int diffvalue ;
+	int level ;
+	int position ;			/* number of clusters output before this task while collecting the tasks */
+	CLUSTERS *clusters ;	/* clusters output by this task */
+	struct TASKS_T *frontier ;	/* checkpoints: subproblems of this task not solved when the traversal paused */
+}
+TASK ;
+
+typedef struct TASKS_T
+{
+	int number ;
+	int maxnumber ;
+	TASK *tasks ;
+	int next ;				/* next task to be solved by a thread */
+	pthread_mutex_t mutex ;	/* protects next */
+}
+TASKS ;
+
+/*
+ * The state of one clustering.
+ * There are no global variables:
+ * all the functions below receive the context of the clustering they work for,
+ * so that several clusterings can run at the same time (e.g., on different threads).
+ */
+
+typedef struct CONTEXT_T
+{
+	/* Parameters. */
+	int verbose ;
+	int lineout ;
+	int *focus_words ;				/* focus words when only clusters containing one of these words are wanted (sorted objects), */
+	int focus_number ;				/* 	their number (0: no focus). */
+	int symmetry ;					/* TRUE when the two feature trees are the same. */
+	/* A well-formed cluster is considered degenerated if its length is less than the following threshold. */
+	int cluster_minimal_length ;	/* 2 for all theoretically possible clusters */
+	int cluster_maximal_length ;	/* INT_MAX for all theoretically possible clusters */
+
+	/* The two feature trees. */
+	int *treeA ;					/* The first  feature tree structure */
+	int *treeB ;					/* The second feature tree structure */
+	int last_level ;
+	char **linetableA ;				/* The starting point of each line in the first list of lines */
+	char **linetableB ;				/* The starting point of each line in the second list of lines */
+
+	/* Values for the number of values and the number of pairs. */
+	int valmin ;
+	int valnbr ;
+
+	/* Work memory for refine_down and xrefine_down. */
+	int **indexvector ;				/* For each level, contains a vector of all possible values, which contains the number of pairs for that value. */
+	int **offsetvector ;			/* For each level and each value, the position of the pairs with that value in the arena of the level. */
+	int **focusindexvector ;		/* With focus words: for each level and each value, the number of pairs which may contain one of them. */
+	ARENA *arenas ;					/* For each level, the pairs of nodes on the next level. */
+	MEMORY *memory ;				/* Accounting of the work memory (shared by the threads). */
+	long memory_used ;				/* Bytes of work memory allocated with this context. */
+
+	/* Budgets and coverage of the traversal. */
+	BUDGET *budget ;				/* Budgets of the traversal (shared by the threads). */
+	int budget_countdown ;			/* Number of subproblems before the next reading of the clock. */
+	double weight ;					/* Part of the whole traversal of the current subproblem (1.0 for the root): */
+									/* 	each subproblem of xrefine_down gets a part in proportion to its number of pairs. */
+	double covered ;				/* Sum of the parts of the subproblems done with this context. */
+
+	/* Output: either the temporary file or the clusters in memory. */
+	FILE *cluout ;
+	CLUSTERS *clusters_out ;
+
+	/* Counters for the user and for developper trace purposes. */
+	int clu_nbr ;
+	int rest_n ;
+	int maxpairnbr ;
+
+	/* Parallel traversal. */
+	int threads ;					/* number of threads (1: sequential traversal) */
+	int split_level ;				/* level of the tasks (0: chosen automatically) */
+	TASKS *tasks ;					/* when not NULL, collect the tasks at split_level instead of solving them */
+	int size_bound ;				/* top-K mode: size of the K-th largest cluster found before solving the tasks */
+
+	/* Checkpoints (see checkpointed_refine_down). */
+	char *checkpoint ;				/* checkpoint file (NULL: no checkpoint) */
+	double checkpoint_interval ;	/* seconds between two checkpoints */
+	TASKS *frontier ;				/* when not NULL, record the subproblems not solved when the traversal stops */
+
+	/* Sharded traversal (see nlgclu_in_C_frontier and nlgclu_in_C_from_tasks). */
+	TASKS *collected ;				/* when not NULL, only collect the tasks at split_level */
+	int *shard ;					/* tasks to solve, serialized (see serialize_tasks), */
+	int shardsize ;					/* 	their number of integers, */
+	int *shard_counts ;				/* 	number of clusters output after each task. */
+}
+CONTEXT ;
+
+void init_context(CONTEXT *ctx, int minsize, int maxsize, int verbose, int lineout, int *focus_words, int focus_number, MEMORY *memory, BUDGET *budget)
+{
+	memset(ctx, 0, sizeof(CONTEXT)) ;
+
+	ctx->memory = memory ;
+	ctx->budget = budget ;
+	ctx->weight = 1.0 ;
+
+	ctx->focus_words = focus_words ;
+	ctx->focus_number = focus_number ;
+
+	ctx->cluster_minimal_length = minsize ;
+	ctx->cluster_maximal_length = maxsize ;
+	if ( -1 == ctx->cluster_maximal_length )
+		ctx->cluster_maximal_length = INT_MAX ;
+
+	ctx->verbose = verbose ;
+	ctx->lineout = lineout ;
+
+	ctx->valmin = 32 ;
+	ctx->valnbr = 32 ;
+
+	ctx->threads = 1 ;
+}
+
+void init_memory(MEMORY *memory, long limit)
+{
+	memset(memory, 0, sizeof(MEMORY)) ;
+	memory->limit = ( 0 < limit ) ? limit : 0 ;
+	pthread_mutex_init(&memory->mutex, NULL) ;
+}
+
+double wall_clock(void)
+{
+	struct timespec now ;
+
+	clock_gettime(CLOCK_MONOTONIC, &now) ;
+	return now.tv_sec + now.tv_nsec / 1e9 ;
+}
+
+/*
+ * A time budget of time_budget seconds from now (0: no time budget)
+ * and a budget of max_clusters clusters (0: no limit).
+ */
+
+void init_budget(BUDGET *budget, double time_budget, int max_clusters)
+{
+	memset(budget, 0, sizeof(BUDGET)) ;
+	budget->deadline = ( 0 < time_budget ) ? wall_clock() + time_budget : 0 ;
+	budget->max_clusters = ( 0 < max_clusters ) ? max_clusters : 0 ;
+	pthread_mutex_init(&budget->mutex, NULL) ;
+}
+
+/*
+ * TRUE if the traversal should stop: memory limit exceeded, a budget exhausted or a pause for a checkpoint.
+ */
+
+int is_stopped(CONTEXT *ctx)
+{
+	BUDGET *budget = ctx->budget ;
+
+	if ( ctx->memory->exceeded || budget->stopped || budget->paused )
+		return TRUE ;
+	if ( ( 0 < budget->deadline || 0 < budget->checkpoint_time ) && --ctx->budget_countdown <= 0 )
+	{
+		double now = wall_clock() ;
+
+		ctx->budget_countdown = BUDGET_CHECK_INTERVAL ;
+		if ( 0 < budget->deadline && budget->deadline <= now )
+			budget->stopped = STOPPED_BY_TIME ;
+		else if ( 0 < budget->checkpoint_time && budget->checkpoint_time <= now )
+			budget->paused = TRUE ;
+	} ;
+
+	return budget->stopped || budget->paused ;
+}
+
+/*
+ * Count a cluster to be output against the budget of clusters.
+ * Return FALSE if the budget does not allow it.
+ * The traversal stops as soon as the last cluster allowed is output.
+ */
+
+int count_cluster(CONTEXT *ctx)
+{
+	BUDGET *budget = ctx->budget ;
+	int result = TRUE ;
+
+	if ( 0 == budget->max_clusters )
+		return TRUE ;
+	pthread_mutex_lock(&budget->mutex) ;
+	if ( budget->max_clusters <= budget->clusters )
+		result = FALSE ;
+	else if ( budget->max_clusters == ++budget->clusters )
+		budget->stopped = STOPPED_BY_CLUSTERS ;
+	pthread_mutex_unlock(&budget->mutex) ;
+
+	return result ;
+}
+
+/*
+ * Account for bytes of work memory allocated (bytes > 0) or freed (bytes < 0).
+ * Return FALSE if the allocation would exceed the memory limit:
+ * the allocation should not be done, and the traversal stops (see refine_down).
+ */
+
+int reserve_shared_memory(MEMORY *memory, long bytes)
+{
+	int result = TRUE ;
+
+	pthread_mutex_lock(&memory->mutex) ;
+	if ( 0 < bytes && 0 < memory->limit && memory->limit < memory->used + bytes )
+	{
+		memory->exceeded = TRUE ;
+		result = FALSE ;
+	}
+	else
+	{
+		memory->used += bytes ;
+		if ( memory->peak < memory->used )
+			memory->peak = memory->used ;
+	} ;
+	pthread_mutex_unlock(&memory->mutex) ;
+
+	return result ;
+}
+
+/*
+ * Same as above for the work memory of a context, freed at once by free_work_memory.
+ */
+
+int reserve_memory(CONTEXT *ctx, long bytes)
+{
+	int result = reserve_shared_memory(ctx->memory, bytes) ;
+
+	if ( result )
+		ctx->memory_used += bytes ;
+
+	return result ;
+}
+
+CLUSTERS *newclusters(void)
+{
+	CLUSTERS *result = (CLUSTERS *) calloc(1, sizeof(CLUSTERS)) ;
+
+	if ( result )
+	{
+		result->maxnumber = 256 ;
+		result->maxsize = 1024 ;
+		result->offsets = (int *) calloc(result->maxnumber + 1, sizeof(int)) ;
+		result->objectsA = (int *) calloc(result->maxsize, sizeof(int)) ;
+		result->objectsB = (int *) calloc(result->maxsize, sizeof(int)) ;
+	} ;
+	if ( ! result || ! result->offsets || ! result->objectsA || ! result->objectsB )
+		error(MODULE, "newclusters", "not enough memory for the clusters") ;
+
+	return result ;
+}
+
+void freeclusters(CLUSTERS *clusters)
+{
+	if ( clusters )
+	{
+		free(clusters->offsets) ;
+		free(clusters->objectsA) ;
+		free(clusters->objectsB) ;
+		free(clusters->heap) ;
+		free(clusters->frontier) ;
+		free(clusters) ;
+	} ;
+}
+
+/*
+ * Top-K mode: only the largest clusters are wanted.
+ * The sizes of the largest clusters appended so far are kept in a min-heap:
+ * when the heap is full, its root is the size of the K-th largest cluster so far,
+ * a lower bound of the size of the K-th largest cluster in the end.
+ * Smaller clusters are not appended (see append_cluster),
+ * and the subproblems of the traversal whose surface is smaller are pruned (see refine_down).
+ */
+
+void set_largest(CLUSTERS *clusters, int largest)
+{
+	clusters->largest = ( 0 < largest ) ? largest : 0 ;
+	clusters->heapsize = 0 ;
+}
+
+/*
+ * The size under which a cluster cannot be among the largest ones (0: any cluster may be).
+ */
+
+int largest_bound(CLUSTERS *clusters)
+{
+	return ( clusters->largest && clusters->largest == clusters->heapsize ) ? clusters->heap[0] : 0 ;
+}
+
+void push_size(CLUSTERS *clusters, int size)
+{
+	int *heap = clusters->heap ;
+	int i = 0,
+		child = 0 ;
+
+	if ( clusters->heapsize < clusters->largest )
+	{
+		if ( clusters->heapmaxsize <= clusters->heapsize )
+		{
+			/* The heap grows with the number of clusters, up to largest. */
+			clusters->heapmaxsize = ( 0 == clusters->heapmaxsize ) ? 64 : 2 * clusters->heapmaxsize ;
+			if ( clusters->largest < clusters->heapmaxsize )
+				clusters->heapmaxsize = clusters->largest ;
+			heap = clusters->heap = (int *) realloc(clusters->heap, clusters->heapmaxsize * sizeof(int)) ;
+			if ( ! heap )
+				error(MODULE, "push_size", "not enough memory for the sizes of the largest clusters") ;
+		} ;
+		/* Sift up. */
+		for ( i = clusters->heapsize++ ; 0 < i && size < heap[(i - 1) / 2] ; i = (i - 1) / 2 )
+			heap[i] = heap[(i - 1) / 2] ;
+		heap[i] = size ;
+	}
+	else if ( heap[0] < size )
+	{
+		/* Replace the smallest size and sift down. */
+		for ( i = 0 ; (child = 2 * i + 1) < clusters->heapsize ; i = child )
+		{
+			if ( child + 1 < clusters->heapsize && heap[child + 1] < heap[child] )
+				child += 1 ;
+			if ( size <= heap[child] )
+				break ;
+			heap[i] = heap[child] ;
+		} ;
+		heap[i] = size ;
+	} ;
+}
+
+/*
+ * Forget the clusters appended before the heap was full which are now too small,
+ * keeping the order of the other ones.
+ */
+
+void compact_clusters(CLUSTERS *clusters)
+{
+	int bound = largest_bound(clusters) ;
+	int i = 0,
+		number = 0,
+		size = 0,
+		end = clusters->offsets[0] ;
+
+	for ( i = 0 ; i < clusters->number ; ++i )
+	{
+		int begin = end ;
+
+		end = clusters->offsets[i + 1] ;
+		if ( bound <= end - begin )
+		{
+			memmove(clusters->objectsA + size, clusters->objectsA + begin, (end - begin) * sizeof(int)) ;
+			memmove(clusters->objectsB + size, clusters->objectsB + begin, (end - begin) * sizeof(int)) ;
+			size += end - begin ;
+			clusters->offsets[++number] = size ;
+		} ;
+	} ;
+	clusters->number = clusters->compacted = number ;
+	clusters->size = size ;
+}
+
+/*
+ * Keep the largest clusters only, sorted by decreasing size,
+ * clusters of the same size in the order of the traversal.
+ * This does not depend on the order in which the clusters were found:
+ * the result is the same with any number of threads.
+ */
+
+typedef struct RANKED_T
+{
+	int size ;
+	int index ;
+}
+RANKED ;
+
+int compare_ranked(const void *a, const void *b)
+{
+	const RANKED *ra = (const RANKED *) a,
+				 *rb = (const RANKED *) b ;
+
+	if ( ra->size != rb->size )
+		return ( ra->size < rb->size ) ? 1 : -1 ;
+	return ( ra->index < rb->index ) ? -1 : ( ra->index > rb->index ) ;
+}
+
+void keep_largest_clusters(CLUSTERS *clusters)
+{
+	int i = 0,
+		number = clusters->number ;
+	RANKED *ranked = (RANKED *) calloc(number + 1, sizeof(RANKED)) ;
+	int *offsets = NULL,
+		*objectsA = NULL,
+		*objectsB = NULL ;
+
+	if ( ! ranked )
+		error(MODULE, "keep_largest_clusters", "not enough memory to sort the clusters") ;
+	for ( i = 0 ; i < number ; ++i )
+	{
+		ranked[i].size = clusters->offsets[i + 1] - clusters->offsets[i] ;
+		ranked[i].index = i ;
+	} ;
+	qsort(ranked, number, sizeof(RANKED), compare_ranked) ;
+	if ( clusters->largest < number )
+		number = clusters->largest ;
+
+	offsets = (int *) calloc(clusters->maxnumber + 1, sizeof(int)) ;
+	objectsA = (int *) calloc(clusters->maxsize, sizeof(int)) ;
+	objectsB = (int *) calloc(clusters->maxsize, sizeof(int)) ;
+	if ( ! offsets || ! objectsA || ! objectsB )
+		error(MODULE, "keep_largest_clusters", "not enough memory for the clusters") ;
+	for ( i = 0 ; i < number ; ++i )
+	{
+		int begin = clusters->offsets[ranked[i].index] ;
+
+		memcpy(objectsA + offsets[i], clusters->objectsA + begin, ranked[i].size * sizeof(int)) ;
+		memcpy(objectsB + offsets[i], clusters->objectsB + begin, ranked[i].size * sizeof(int)) ;
+		offsets[i + 1] = offsets[i] + ranked[i].size ;
+	} ;
+	free(ranked) ;
+
+	free(clusters->offsets) ;
+	free(clusters->objectsA) ;
+	free(clusters->objectsB) ;
+	clusters->offsets = offsets ;
+	clusters->objectsA = objectsA ;
+	clusters->objectsB = objectsB ;
+	clusters->number = number ;
+	clusters->size = offsets[number] ;
+}
+
+/*
+ * Append the pairs of objects of a cluster to the buffers,
+ * doubling the allocated memory when necessary.
+ * In top-K mode, the clusters which cannot be among the largest ones are not appended.
+ */
+
+void append_cluster(CONTEXT *ctx, CLUSTERS *clusters, int length, int *nodesA, int *nodesB)
+{
+	int i = 0 ;
+	int *xA = NULL,
+		*xB = NULL ;
+
+	if ( clusters->largest )
+	{
+		if ( length < largest_bound(clusters) )
+			return ;
+		push_size(clusters, length) ;
+	} ;
+
+	if ( clusters->maxnumber <= clusters->number )
+	{
+		clusters->maxnumber *= 2 ;
+		clusters->offsets = (int *) realloc(clusters->offsets, (clusters->maxnumber + 1) * sizeof(int)) ;
+		if ( ! clusters->offsets )
+			error(MODULE, "append_cluster", "not enough memory for the offsets of the clusters") ;
+	} ;
+	if ( clusters->maxsize < clusters->size + length )
+	{
+		while ( clusters->maxsize < clusters->size + length )
+			clusters->maxsize *= 2 ;
+		clusters->objectsA = (int *) realloc(clusters->objectsA, clusters->maxsize * sizeof(int)) ;
+		clusters->objectsB = (int *) realloc(clusters->objectsB, clusters->maxsize * sizeof(int)) ;
+		if ( ! clusters->objectsA || ! clusters->objectsB )
+			error(MODULE, "append_cluster", "not enough memory for the objects of the clusters") ;
+	} ;
+
+	xA = clusters->objectsA + clusters->size ;
+	xB = clusters->objectsB + clusters->size ;
+	for ( i = 0 ; i < length ; ++i )
+	{
+		xA[i] = object(ctx->treeA, nodesA[i]) ;
+		xB[i] = object(ctx->treeB, nodesB[i]) ;
+	} ;
+	clusters->size += length ;
+	clusters->number += 1 ;
+	clusters->offsets[clusters->number] = clusters->size ;
+
+	/* Not while collecting the tasks: their positions refer to the clusters (see add_task). */
+	if ( clusters->largest && ! ctx->tasks
+		&& 2 * ( ( clusters->largest < clusters->compacted ) ? clusters->compacted : clusters->largest ) <= clusters->number )
+		compact_clusters(clusters) ;
+}
+
+/*
+ * Append the clusters of index begin to end - 1 of other clusters.
+ */
+
+void append_clusters(CLUSTERS *clusters, CLUSTERS *from, int begin, int end)
+{
+	int i = 0 ;
+	int length = from->offsets[end] - from->offsets[begin] ;
+
+	while ( clusters->maxnumber < clusters->number + (end - begin) )
+		clusters->maxnumber *= 2 ;
+	clusters->offsets = (int *) realloc(clusters->offsets, (clusters->maxnumber + 1) * sizeof(int)) ;
+	while ( clusters->maxsize < clusters->size + length )
+		clusters->maxsize *= 2 ;
+	clusters->objectsA = (int *) realloc(clusters->objectsA, clusters->maxsize * sizeof(int)) ;
+	clusters->objectsB = (int *) realloc(clusters->objectsB, clusters->maxsize * sizeof(int)) ;
+	if ( ! clusters->offsets || ! clusters->objectsA || ! clusters->objectsB )
+		error(MODULE, "append_clusters", "not enough memory for the clusters") ;
+
+	memcpy(clusters->objectsA + clusters->size, from->objectsA + from->offsets[begin], length * sizeof(int)) ;
+	memcpy(clusters->objectsB + clusters->size, from->objectsB + from->offsets[begin], length * sizeof(int)) ;
+	for ( i = begin ; i < end ; ++i )
+	{
+		clusters->number += 1 ;
+		clusters->offsets[clusters->number] = clusters->size + from->offsets[i + 1] - from->offsets[begin] ;
+	} ;
+	clusters->size += length ;
+}
+
+/*
+ * Forget the clusters after the first number ones.
  */
 
-int minvalueA = 0;
-int maxvalueA = 0;
-int maxsizeA = 0;
+void truncate_clusters(CLUSTERS *clusters, int number)
+{
+	clusters->number = number ;
+	clusters->size = clusters->offsets[number] ;
+}
 
-int minvalueB = 0;
-int maxvalueB = 0;
-int maxsizeB = 0;
+/*
+ * Compute the minimal possible value
+ */
 
-void gettreeparams(int lengthA, int *treeA)
+void gettreeparams(int length, int *tree, int *minvalue, int *maxvalue, int *maxsize)
 {
     int i = 0;
-    int sizeA = 1;
+    int size = 1;
 
-trace(("in  gettreeparams(lengthA = %d)\n", lengthA))
+trace(("in  gettreeparams(length = %d)\n", length))
 
-    minvalueA = maxvalueA = value(treeA, 0);
-    maxsizeA = next_level_end_node(treeA, 0) - next_level_begin_node(treeA, 0) + 1;
+    *minvalue = *maxvalue = value(tree, 0);
+    *maxsize = next_level_end_node(tree, 0) - next_level_begin_node(tree, 0) + 1;
 
-    for (i = 0; i < (lengthA / NODESIZE) - 1; ++i)
+    for (i = 0; i < (length / NODESIZE) - 1; ++i)
 	{
-        int valueA = value(treeA, i);
-        int nextbeginA = next_level_begin_node(treeA, i),
-			nextendA = next_level_end_node(treeA, i);
+        int thevalue = value(tree, i);
+        int nextbegin = next_level_begin_node(tree, i),
+			nextend = next_level_end_node(tree, i);
 
-        if (valueA < minvalueA)
-            minvalueA = valueA;
-        if (maxvalueA < valueA)
-            maxvalueA = valueA;
+        if (thevalue < *minvalue)
+            *minvalue = thevalue;
+        if (*maxvalue < thevalue)
+            *maxvalue = thevalue;
 
-        sizeA = nextendA - nextbeginA + 1;
+        size = nextend - nextbegin + 1;
 
-        if (maxsizeA < sizeA)
-            maxsizeA = sizeA;
+        if (*maxsize < size)
+            *maxsize = size;
     };
 
-trace(("out gettreeparams(lengthA = %d) minvalueA = %d, maxvalueA = %d, maxziseA = %d\n", lengthA, minvalueA, maxvalueA, maxsizeA))
+trace(("out gettreeparams(length = %d) minvalue = %d, maxvalue = %d, maxzise = %d\n", length, *minvalue, *maxvalue, *maxsize))
 }
 
-void getmatrixparams(int lengthA, int lengthB, int *treeA, int *treeB)
+void getmatrixparams(CONTEXT *ctx, int lengthA, int lengthB)
 {
+	int minvalueA = 0,
+		maxvalueA = 0,
+		maxsizeA = 0 ;
+	int minvalueB = 0,
+		maxvalueB = 0,
+		maxsizeB = 0 ;
+
 trace(("in  getmatrixparams(lengthA = %d, lengthB = %d)\n", lengthA, lengthB))
 
-    gettreeparams(lengthB, treeB);
-    minvalueB = minvalueA;
-    maxvalueB = maxvalueA;
-    maxsizeB = maxsizeA;
-    gettreeparams(lengthA, treeA);
+    gettreeparams(lengthB, ctx->treeB, &minvalueB, &maxvalueB, &maxsizeB);
+    gettreeparams(lengthA, ctx->treeA, &minvalueA, &maxvalueA, &maxsizeA);
 
-    _VALMIN = minvalueA - maxvalueB;
-    _VALNBR = maxvalueA - minvalueB - _VALMIN + 1;
+    ctx->valmin = minvalueA - maxvalueB;
+    ctx->valnbr = maxvalueA - minvalueB - ctx->valmin + 1;
 
-trace(("out getmatrixparams(lengthA = %d, lengthB = %d) _VALMIN = %d, _VALNBR = %d\n", lengthA, lengthB, _VALMIN, _VALNBR))
+trace(("out getmatrixparams(lengthA = %d, lengthB = %d) valmin = %d, valnbr = %d\n", lengthA, lengthB, ctx->valmin, ctx->valnbr))
 }
 
 /*
@@ -301,7 +889,7 @@ ntrace(("out newmatrix(%d) done\n", length))
 }
 
 /*
- * Free matrix of integers.
+ * Free matrix of integers (length + 1 rows, see newmatrix).
  */
 
 void freematrix(int **matrix, int length)
@@ -310,8 +898,8 @@ void freematrix(int **matrix, int length)
 
 ntrace(("in  freematrix(%d)\n", length))
 
-    for (i = 0; i < length; ++i)
-		if (! matrix[i])
+    for (i = 0; i < length + 1; ++i)
+		if (matrix[i])
         	free(matrix[i]);
     free(matrix);
 
@@ -322,8 +910,9 @@ ntrace(("out freematrix(%d) done\n", length))
  * Creating table of pointers to line.
  */
 
-void newlinetable(char *s)
+char **newlinetable(char *s)
 {
+    char **result = NULL;
     char *ss = NULL;
     int size = 0;
     int i = 0;
@@ -339,20 +928,22 @@ ntrace(("in  newlinetable(%s)\n", s))
 
 ntrace(("out newlinetable() size = %d\n", size))
 
-	/* Creating linetableA. */
-	linetableA = (char **) calloc(size + 2, sizeof (char *));
-	/* Filling in linetableA and cutting linesA into lines at the same time. */
-	linetableA[0] = s;
+	/* Creating the table. */
+	result = (char **) calloc(size + 2, sizeof (char *));
+	/* Filling in the table and cutting the lines into lines at the same time. */
+	result[0] = s;
 	for (ss = s, i = 0; *ss; ++ss) {
 		if ('\n' == *ss) {
 			i += 1;
-			linetableA[i] = ss + 1;
+			result[i] = ss + 1;
 		};
 	};
 	i += 1;
-	linetableA[i] = ss;
-	
+	result[i] = ss;
+
 ntrace(("out newlinetable(%s)\n", s))
+
+	return result;
 }
 
 /*
@@ -372,16 +963,25 @@ ntrace(("out freelinetable()\n"))
  * Print a cluster.
  */
 
-void print_cluster(int length, int *nodesA, int *nodesB)
+void print_cluster(CONTEXT *ctx, int length, int *nodesA, int *nodesB)
 {
-    static int clu_nbr = 0;
     int i = 0;
     char cA = ' ',
 		 cB = ' ';
+	int *treeA = ctx->treeA,
+		*treeB = ctx->treeB ;
+	char **linetableA = ctx->linetableA,
+		 **linetableB = ctx->linetableB ;
 
 ntrace(("in  print_cluster(%d, %s, %s)\n", length, li2s(length, nodesA), li2s(length, nodesB)))
 
-	if (VERBOSE) fprintf(stderr, "\r# %d clusters... ", ++clu_nbr);
+	if (ctx->verbose) fprintf(stderr, "\r# %d clusters... ", ++ctx->clu_nbr);
+	if ( ctx->clusters_out )
+	{
+		/* In memory: no formatting, no flushing. */
+		append_cluster(ctx, ctx->clusters_out, length, nodesA, nodesB) ;
+		return ;
+	} ;
 	for (i = 0; i < length; ++i)
 	{
 		int iA = 0,
@@ -391,18 +991,18 @@ ntrace(("mid print_cluster(%d, %d)\n", object(treeA, nodesA[i]), object(treeB, n
 
 		if (0 != i)
 		{
-			fprintf(cluout, " :: ");
-			if ( LINEOUT )
+			fprintf(ctx->cluout, " :: ");
+			if ( ctx->lineout )
 				fprintf(stderr, " :: ");
 		} ;
-		
+
 		iA = object(treeA, nodesA[i]);
 		iB = object(treeB, nodesB[i]);
-		fprintf(cluout, "%d : %d", iA, iB);
-		
+		fprintf(ctx->cluout, "%d : %d", iA, iB);
+
 ntrace(("mid print_cluster() 1 iA = %d, iB = %d\n", iA, iB))
 
-		if ( LINEOUT )
+		if ( ctx->lineout )
 		{
 			cA = *(linetableA[iA + 1] - 1); /* Should be '\n' */
 			cB = *(linetableB[iB + 1] - 1); /* Should be '\n' */
@@ -414,9 +1014,9 @@ ntrace(("mid print_cluster() 1 iA = %d, iB = %d\n", iA, iB))
 		} ;
 	};
 
-	fprintf(cluout, "\n");
-	fflush(cluout);
-	if ( LINEOUT )
+	fprintf(ctx->cluout, "\n");
+	fflush(ctx->cluout);
+	if ( ctx->lineout )
 	{
 		fprintf(stderr, "\n");
 		fflush(stderr);
@@ -426,48 +1026,48 @@ ntrace(("out print_cluster(%d, %s, %s)\n", length, li2s(length, nodesA), li2s(le
 }
 
 /*
- * Test whether a word is contained in the list of pairs of intervals.
+ * Test whether one of the focus words is an object in the interval [begin:end[.
+ * The focus words are sorted: binary search.
  */
 
-int word_not_in_pair(int length, int nodeAi, int nodeBi, int focus)
+int focus_in_interval(CONTEXT *ctx, int begin, int end)
 {
-    int result = FALSE;
-	int iA = 0,
-		iB = 0,
-		jA = 0,
-		jB = 0;
-	
-ntrace(("in  word_not_in_pair(%d, %d, %d,  focus=%d)\n", length, nodeAi, nodeBi, focus))
-
-	iA = object(treeA, nodeAi) ;
-	iB = object(treeB, nodeBi) ;
-	jA = iA + width(treeA, nodeAi) ;
-	jB = iB + width(treeB, nodeBi) ;
-    result = ( ! ( iA <= focus && focus < jA ) )
-	      && ( ! ( iB <= focus && focus < jB ) ) ;
-
-ntrace(("out word_not_in_pair(%d, %d, %d, focus=%d) = %s\n", length, nodeAi, nodeBi, focus, result ? "TRUE" : "FALSE"))
+	int low = 0,
+		high = ctx->focus_number ;
 
-    return result;
+	/* First focus word not smaller than begin. */
+	while ( low < high )
+	{
+		int middle = (low + high) / 2 ;
+
+		if ( ctx->focus_words[middle] < begin )
+			low = middle + 1 ;
+		else
+			high = middle ;
+	} ;
+
+	return ( low < ctx->focus_number ) && ( ctx->focus_words[low] < end ) ;
 }
 
-int word_not_in_cluster(int length, int *nodesA, int *nodesB, int focus)
+/*
+ * Test whether a pair of nodes may contain a focus word,
+ * i.e., whether one of the focus words is an object in the interval of nodeA,
+ * or in the interval of nodeB when the two feature trees are the same
+ * (the focus words are objects of A).
+ */
+
+int focus_in_pair(CONTEXT *ctx, int nodeA, int nodeB)
 {
-    int result = FALSE;
+	int result = FALSE ;
 
-trace(("in  word_not_in_cluster(%d, %s, %s, focus=%d)\n", length, li2s(length, nodesA), li2s(length, nodesB), focus))
+ntrace(("in  focus_in_pair(%d, %d)\n", nodeA, nodeB))
 
-	if ( symmetry )
-	{
-        int i = 0;
-		
-        for ( i = 0 ; i < length && word_not_in_pair(length, nodesA[i], nodesB[i], focus) ; ++i ) ;
-		result = (i == length) ;
-	} ;
+	result = focus_in_interval(ctx, object(ctx->treeA, nodeA), object(ctx->treeA, nodeA) + width(ctx->treeA, nodeA))
+		|| ( ctx->symmetry && focus_in_interval(ctx, object(ctx->treeB, nodeB), object(ctx->treeB, nodeB) + width(ctx->treeB, nodeB)) ) ;
 
-trace(("out word_not_in_cluster(%d, %s, %s, focus=%d) = %s\n", length, li2s(length, nodesA), li2s(length, nodesB), focus, result ? "TRUE" : "FALSE"))
+ntrace(("out focus_in_pair(%d, %d) = %s\n", nodeA, nodeB, result ? "TRUE" : "FALSE"))
 
-    return result;
+	return result ;
 }
 
 /*
@@ -480,13 +1080,13 @@ trace(("out word_not_in_cluster(%d, %s, %s, focus=%d) = %s\n", length, li2s(leng
  * so as to speed up the computation.
  */
 
-int is_degenerated(int length, int *nodesA, int *nodesB)
+int is_degenerated(CONTEXT *ctx, int length, int *nodesA, int *nodesB)
 {
     int result = FALSE;
 
 ntrace(("in  is_degenerated(%d, %s, %s)\n", length, li2s(length, nodesA), li2s(length, nodesB)))
 
-    result = (1 == length) && ((1 == width(treeA, nodesA[0])) || (1 == width(treeB, nodesB[0]))) ;
+    result = (1 == length) && ((1 == width(ctx->treeA, nodesA[0])) || (1 == width(ctx->treeB, nodesB[0]))) ;
 
 ntrace(("out is_degenerated(%d, %s, %s) = %s\n", length, li2s(length, nodesA), li2s(length, nodesB), result ? "TRUE" : "FALSE"))
 
@@ -497,31 +1097,31 @@ ntrace(("out is_degenerated(%d, %s, %s) = %s\n", length, li2s(length, nodesA), l
  * Recognize the trivial cluster A : A :: B : B :: C : C :: ...
  */
 
-int is_singleton_pair(int length, int nodeAi, int nodeBi)
+int is_singleton_pair(CONTEXT *ctx, int length, int nodeAi, int nodeBi)
 {
 	int result = FALSE ;
-	
+
 trace(("in  is_singleton_pair(%d, %d, %d)\n", length, nodeAi, nodeBi))
 
-	result = (1 == width(treeA, nodeAi)) && (1 == width(treeB, nodeBi))
-				&& object(treeA, nodeAi) == object(treeB, nodeBi) ;
+	result = (1 == width(ctx->treeA, nodeAi)) && (1 == width(ctx->treeB, nodeBi))
+				&& object(ctx->treeA, nodeAi) == object(ctx->treeB, nodeBi) ;
 
 trace(("out is_singleton_pair(%d, %d, %d) = %s\n", length, nodeAi, nodeBi, result ? "TRUE" : "FALSE"))
 
 	return result ;
 }
 
-int is_trivial(int length, int *nodesA, int *nodesB)
+int is_trivial(CONTEXT *ctx, int length, int *nodesA, int *nodesB)
 {
     int result = FALSE;
 
 trace(("in  is_trivial(%d, %s, %s)\n", length, li2s(length, nodesA), li2s(length, nodesB)))
 
-	if ( symmetry )
+	if ( ctx->symmetry )
 	{
         int i = 0;
-		
-        for ( i = 0 ; i < length && is_singleton_pair(length, nodesA[i], nodesB[i]) ; ++i ) ;
+
+        for ( i = 0 ; i < length && is_singleton_pair(ctx, length, nodesA[i], nodesB[i]) ; ++i ) ;
 		result = (i == length) ;
 	} ;
 
@@ -537,40 +1137,38 @@ trace(("out is_trivial(%d, %s, %s) = %s\n", length, li2s(length, nodesA), li2s(l
  * In that case, this is a cluster and we can output it.
  */
 
-int is_finished_singleton_pair(int length, int nodeAi, int nodeBi)
+int is_finished_singleton_pair(CONTEXT *ctx, int length, int nodeAi, int nodeBi)
 {
 	int result = FALSE ;
-	
+
 trace(("in  is_finished_singleton_pair(%d, %d, %d)\n", length, nodeAi, nodeBi))
 
-	result = (1 == width(treeA, nodeAi)) && (1 == width(treeB, nodeBi))
-				&& is_empty_rest(treeA, nodeAi)  && is_empty_rest(treeB, nodeBi) ;
+	result = (1 == width(ctx->treeA, nodeAi)) && (1 == width(ctx->treeB, nodeBi))
+				&& is_empty_rest(ctx->treeA, nodeAi)  && is_empty_rest(ctx->treeB, nodeBi) ;
 
 trace(("out is_finished_singleton_pair(%d, %d, %d) = %s\n", length, nodeAi, nodeBi, result ? "TRUE" : "FALSE"))
 
 	return result ;
 }
 
-static int rest_n = 0 ;
-
-int is_empty_rest_cluster(int length, int *nodesA, int *nodesB)
+int is_empty_rest_cluster(CONTEXT *ctx, int length, int *nodesA, int *nodesB)
 {
     int result = FALSE;
 
 trace(("in  is_empty_rest_cluster(%d, %s, %s)\n", length, li2s(length, nodesA), li2s(length, nodesB)))
 
-	if ( symmetry )
+	if ( ctx->symmetry )
 	{
         int i = 0;
-		
-        for ( i = 0 ; i < length && is_finished_singleton_pair(length, nodesA[i], nodesB[i]) ; ++i ) ;
+
+        for ( i = 0 ; i < length && is_finished_singleton_pair(ctx, length, nodesA[i], nodesB[i]) ; ++i ) ;
 		result = (i == length) ;
 	} ;
 
 trace(("out is_empty_rest_cluster(%d, %s, %s) = %s\n", length, li2s(length, nodesA), li2s(length, nodesB), result ? "TRUE" : "FALSE"))
 
 	if (result)
-		rest_n += 1 ;
+		ctx->rest_n += 1 ;
     return result;
 }
 
@@ -580,15 +1178,15 @@ trace(("out is_empty_rest_cluster(%d, %s, %s) = %s\n", length, li2s(length, node
  * of widths along A and B.
  */
 
-int surface(int length, int *nodesA, int *nodesB)
+int surface(CONTEXT *ctx, int length, int *nodesA, int *nodesB)
 {
 	int result = 0 ;
 	int i = 0;
-	
+
 trace(("in  surface(%d, %s, %s)\n", length, li2s(length, nodesA), li2s(length, nodesB)))
-	
+
 	for ( i = 0 ; i < length ; ++i )
-		result += width(treeA, nodesA[i]) * width(treeB, nodesB[i]) ;
+		result += width(ctx->treeA, nodesA[i]) * width(ctx->treeB, nodesB[i]) ;
 
 trace(("out surface(%d, %s, %s) = %d\n", length, li2s(length, nodesA), li2s(length, nodesB), result))
 
@@ -596,31 +1194,160 @@ trace(("out surface(%d, %s, %s) = %d\n", length, li2s(length, nodesA), li2s(leng
 }
 
 /*
- * Analogical clustering proper.
- * NodesA and nodesB have the same length, length.
- * The two nodes of same index in nodesA and nodesB correspond one to each other.
- * Precondition:
- *    All nodeA x nodeB have the same feature difference value on level n.
- * The purpose of this function is to split further each node and compute their differences on the next level.
- * In this function, we go from level n to level n+1.
- * Postcondition:
- *    The matrix contains the feature difference value for each subnode in A corresponding to each subnode in B.
+ * Top-K mode: TRUE if no cluster under the pairs can be among the largest ones,
+ * i.e., if their surface is less than the size of the K-th largest cluster so far.
  */
 
-/* For developper trace purposes. */
-static int MAXPAIRNBR = 0 ;
-
-void xrefine_down(int length, int *nodesA, int *nodesB, int diffvalue, int level)
+int is_below_largest(CONTEXT *ctx, int length, int *nodesA, int *nodesB)
 {
-    int i = 0; /* indices in nodesA and nodesB on the current level */
-    int v = 0 ;
+	int bound = largest_bound(ctx->clusters_out) ;
 
-    void refine_down(int length, int *nodesA, int *nodesB, int diffvalue, int level) ;
+	if ( bound < ctx->size_bound )
+		bound = ctx->size_bound ;
 
-trace(("%.*sin  xrefine_down(level=%d, diffvalue=%d, length=%d, %s, %s)\n", SHIFT*level, BLANKS, level, diffvalue, length, li2s(length, nodesA), li2s(length, nodesB)))
-
-trace(("mid xrefine_down() Filling matrices...\n"))
+	return ( 0 < bound ) && ( surface(ctx, length, nodesA, nodesB) < bound ) ;
+}
 
+/*
+ * Record a subproblem of the traversal as a task in a list of tasks:
+ *	the tasks at the split level (parallel traversal)
+ *	or the subproblems not solved when the traversal pauses (checkpoints, see refine_down).
+ * The nodes are copied: the matrices they come from are reused by the traversal.
+ * The memory of the tasks belongs to the list, not to the context (see free_tasks).
+ */
+
+void add_task(CONTEXT *ctx, TASKS *tasks, int length, int *nodesA, int *nodesB, int *focus, int focusnbr, int diffvalue, int level)
+{
+	TASK *task = NULL ;
+
+	if ( ! reserve_shared_memory(ctx->memory, (long) length * ( focus ? 3 : 2 ) * sizeof(int)) )
+		return ;
+	if ( tasks->maxnumber <= tasks->number )
+	{
+		tasks->maxnumber = ( 0 == tasks->maxnumber ) ? 256 : 2 * tasks->maxnumber ;
+		tasks->tasks = (TASK *) realloc(tasks->tasks, tasks->maxnumber * sizeof(TASK)) ;
+		if ( ! tasks->tasks )
+			error(MODULE, "add_task", "not enough memory for the tasks") ;
+	} ;
+	task = tasks->tasks + tasks->number ;
+	task->length = length ;
+	task->nodesA = (int *) malloc(length * sizeof(int)) ;
+	task->nodesB = (int *) malloc(length * sizeof(int)) ;
+	if ( ! task->nodesA || ! task->nodesB )
+		error(MODULE, "add_task", "not enough memory for the tasks") ;
+	memcpy(task->nodesA, nodesA, length * sizeof(int)) ;
+	memcpy(task->nodesB, nodesB, length * sizeof(int)) ;
+	task->focus = NULL ;
+	if ( focus )
+	{
+		task->focus = (int *) malloc(length * sizeof(int)) ;
+		if ( ! task->focus )
+			error(MODULE, "add_task", "not enough memory for the tasks") ;
+		memcpy(task->focus, focus, length * sizeof(int)) ;
+	} ;
+	task->focusnbr = focusnbr ;
+	task->weight = ctx->weight ;
+	task->diffvalue = diffvalue ;
+	task->level = level ;
+	task->position = ctx->clusters_out->number ;
+	task->clusters = NULL ;
+	task->frontier = NULL ;
+	tasks->number += 1 ;
+}
+
+/*
+ * Move a task not solved to another list of tasks, at a new position (see merge_tasks).
+ * The task left in its list is empty.
+ */
+
+void move_task(TASKS *tasks, TASK *task, int position)
+{
+	if ( tasks->maxnumber <= tasks->number )
+	{
+		tasks->maxnumber = ( 0 == tasks->maxnumber ) ? 256 : 2 * tasks->maxnumber ;
+		tasks->tasks = (TASK *) realloc(tasks->tasks, tasks->maxnumber * sizeof(TASK)) ;
+		if ( ! tasks->tasks )
+			error(MODULE, "move_task", "not enough memory for the tasks") ;
+	} ;
+	tasks->tasks[tasks->number] = *task ;
+	tasks->tasks[tasks->number].position = position ;
+	tasks->tasks[tasks->number].clusters = NULL ;
+	tasks->tasks[tasks->number].frontier = NULL ;
+	tasks->number += 1 ;
+	task->length = 0 ;
+	task->nodesA = task->nodesB = task->focus = NULL ;
+}
+
+/*
+ * Free the tasks (but not the list of tasks itself).
+ */
+
+void free_tasks(CONTEXT *ctx, TASKS *tasks)
+{
+	int i = 0 ;
+
+	for ( i = 0 ; i < tasks->number ; ++i )
+	{
+		reserve_shared_memory(ctx->memory, - (long) tasks->tasks[i].length * ( tasks->tasks[i].focus ? 3 : 2 ) * sizeof(int)) ;
+		free(tasks->tasks[i].nodesA) ;
+		free(tasks->tasks[i].nodesB) ;
+		free(tasks->tasks[i].focus) ;
+		freeclusters(tasks->tasks[i].clusters) ;
+		if ( tasks->tasks[i].frontier )
+		{
+			free_tasks(ctx, tasks->tasks[i].frontier) ;
+			free(tasks->tasks[i].frontier) ;
+		} ;
+	} ;
+	free(tasks->tasks) ;
+	tasks->tasks = NULL ;
+	tasks->number = tasks->maxnumber = tasks->next = 0 ;
+}
+
+/*
+ * Analogical clustering proper.
+ * NodesA and nodesB have the same length, length.
+ * The two nodes of same index in nodesA and nodesB correspond one to each other.
+ * Precondition:
+ *    All nodeA x nodeB have the same feature difference value on level n.
+ * The purpose of this function is to split further each node and compute their differences on the next level.
+ * In this function, we go from level n to level n+1.
+ * Postcondition:
+ *    The arena of the level contains the pairs of subnodes in A and B, grouped by feature difference value.
+ * With focus words, focus flags the pairs which may contain one of them (see focus_in_pair)
+ * and focusnbr is the number of such pairs (otherwise, focus is NULL).
+ * The subnodes of a pair which cannot contain a focus word cannot contain one either:
+ * only the subnodes of the flagged pairs are tested.
+ */
+
+void xrefine_down(CONTEXT *ctx, int length, int *nodesA, int *nodesB, int *focus, int focusnbr, int diffvalue, int level)
+{
+    int i = 0; /* indices in nodesA and nodesB on the current level */
+    int v = 0 ;
+	int vmin = 0, /* range of the values of the pairs on the next level */
+		vmax = -1 ;
+	int number = 0 ; /* number of pairs on the next level */
+	int *treeA = ctx->treeA,
+		*treeB = ctx->treeB ;
+	int symmetry = ctx->symmetry,
+		valmin = ctx->valmin ;
+	int *indexvector = ctx->indexvector[level],
+		*offsetvector = ctx->offsetvector[level],
+		*focusindexvector = focus ? ctx->focusindexvector[level] : NULL ;
+	ARENA *arena = ctx->arenas + level ;
+	int *nextnodesA = NULL, /* the pairs on the next level in the arena */
+		*nextnodesB = NULL,
+		*nextfocus = NULL ;
+	double weight = ctx->weight ;
+
+    void refine_down(CONTEXT *ctx, int length, int *nodesA, int *nodesB, int *focus, int focusnbr, int diffvalue, int level) ;
+
+trace(("%.*sin  xrefine_down(level=%d, diffvalue=%d, length=%d, %s, %s, focus=%d)\n", SHIFT*level, BLANKS, level, diffvalue, length, li2s(length, nodesA), li2s(length, nodesB), focusnbr))
+
+trace(("mid xrefine_down() Counting pairs...\n"))
+
+	/* 1/ Count the pairs on the next level for each feature difference value. */
+	vmin = ctx->valnbr ;
     for (i = 0 ; i < length ; ++i)
 	{
         int nodeA = nodesA[i],
@@ -636,44 +1363,114 @@ trace(("mid xrefine_down() Filling matrices...\n"))
             for ( nextnodeB = nextbeginB ; nextnodeB <= nextendB ; ++nextnodeB )
                 if ( ! ( symmetry && object(treeA, nextnodeA) > object(treeB, nextnodeB) ) )
 				{
-                    int v = value(treeA, nextnodeA) - value(treeB, nextnodeB) - _VALMIN ;
+                    int v = value(treeA, nextnodeA) - value(treeB, nextnodeB) - valmin ;
 
-					if ( _VALNBR <= v )
+					if ( ctx->valnbr <= v )
 					{
                         fprintf(stderr, "*** Too big value: %d...\n", v) ;
                         fflush(stderr) ;
                     };
-					if ( maxindexvector[level][v] <= indexvector[level][v] )
+                    indexvector[v] += 1 ;
+					if ( v < vmin ) vmin = v ;
+					if ( vmax < v ) vmax = v ;
+                } ;
+    } ;
+
+	/* 2/ Position of the pairs of each value in the arena of the level. */
+    for (v = vmin; v <= vmax; ++v)
+	{
+		offsetvector[v] = number ;
+		number += indexvector[v] ;
+
+		/* For developper trace purposes. */
+		if ( ctx->maxpairnbr < indexvector[v] )
+			ctx->maxpairnbr = indexvector[v] ;
+	} ;
+	if ( arena->maxsize < number )
+	{
+		int maxsize = ( number < arena->maxsize + arena->maxsize / 2 ) ? arena->maxsize + arena->maxsize / 2 : number ;
+
+trace(("mid xrefine_down() arena[%d] extended to size %d.\n", level, maxsize))
+
+		if ( ! reserve_memory(ctx, (long) (maxsize - arena->maxsize) * ( focus ? 3 : 2 ) * sizeof(int)) )
+		{
+			/* Memory limit exceeded: the traversal stops. */
+			for (v = vmin; v <= vmax; ++v)
+				indexvector[v] = 0 ;
+			return ;
+		} ;
+		arena->nodesA = (int *) realloc(arena->nodesA, maxsize * sizeof(int)) ;
+		arena->nodesB = (int *) realloc(arena->nodesB, maxsize * sizeof(int)) ;
+		if ( focus )
+			arena->focus = (int *) realloc(arena->focus, maxsize * sizeof(int)) ;
+		if ( ! arena->nodesA || ! arena->nodesB || ( focus && ! arena->focus ) )
+			error(MODULE, "xrefine_down", "not enough memory for the pairs of nodes") ;
+		arena->maxsize = maxsize ;
+	} ;
+	arena->size = number ;
+	nextnodesA = arena->nodesA ;
+	nextnodesB = arena->nodesB ;
+	nextfocus = arena->focus ;
+
+trace(("mid xrefine_down() Filling arena...\n"))
+
+	/* 3/ Fill the arena: for each value, the pairs are in the order of the counting loop. */
+    for (i = 0 ; i < length ; ++i)
+	{
+        int nodeA = nodesA[i],
+			nodeB = nodesB[i] ;
+        int nextbeginA = next_level_begin_node(treeA, nodeA),
+			nextendA = next_level_end_node(treeA, nodeA) ;
+        int nextbeginB = next_level_begin_node(treeB, nodeB),
+			nextendB = next_level_end_node(treeB, nodeB) ;
+        int nextnodeA = 0, /* nodes on the next level */
+			nextnodeB = 0 ;
+		int infocus = focus && focus[i] ;
+
+        for ( nextnodeA = nextbeginA ; nextnodeA <= nextendA ; ++nextnodeA )
+            for ( nextnodeB = nextbeginB ; nextnodeB <= nextendB ; ++nextnodeB )
+                if ( ! ( symmetry && object(treeA, nextnodeA) > object(treeB, nextnodeB) ) )
+				{
+                    int v = value(treeA, nextnodeA) - value(treeB, nextnodeB) - valmin ;
+					int j = offsetvector[v]++ ;
+
+                    nextnodesA[j] = nextnodeA ;
+                    nextnodesB[j] = nextnodeB ;
+					if ( focus )
 					{
-						maxindexvector[level][v] = 2 * indexvector[level][v] ;
-trace(("mid xrefine_down() nextnodeAmatrix[%d][%d] extended to size %d.\n",level,v,maxindexvector[level][v]))
-						nextnodeAmatrix[level][v] = (int *) realloc(nextnodeAmatrix[level][v], maxindexvector[level][v] * sizeof (int));
-						nextnodeBmatrix[level][v] = (int *) realloc(nextnodeBmatrix[level][v], maxindexvector[level][v] * sizeof (int));
-					} ;
-                    nextnodeAmatrix[level][v][indexvector[level][v]] = nextnodeA ;
-                    nextnodeBmatrix[level][v][indexvector[level][v]] = nextnodeB ;
-                    indexvector[level][v] += 1 ;
-					
-					/* For developper trace purposes. */
-					if ( MAXPAIRNBR < indexvector[level][v] )
-						MAXPAIRNBR = indexvector[level][v] ;
+						int flag = infocus && focus_in_pair(ctx, nextnodeA, nextnodeB) ;
 
+						nextfocus[j] = flag ;
+						focusindexvector[v] += flag ;
+					} ;
                 } ;
     } ;
 
-trace(("mid xrefine_down() Matrices and index vector filled.\n"))
+trace(("mid xrefine_down() Arena filled.\n"))
 trace(("mid xrefine_down() Processing by feature difference value...\n"))
 
-    for (v = 0; v < _VALNBR; ++v)
+    for (v = vmin; v <= vmax; ++v)
 	{
-trace(("mid xrefine_down() %d pairs with value = %d\n", indexvector[level][v], v))
+trace(("mid xrefine_down() %d pairs with value = %d\n", indexvector[v], v))
 
-        if (0 < indexvector[level][v])
+        if (0 < indexvector[v])
 		{
-            refine_down(indexvector[level][v], nextnodeAmatrix[level][v], nextnodeBmatrix[level][v], v, level + 1);
-			indexvector[level][v] = 0 ;
+			/* After filling, offsetvector[v] is the end of the pairs with value v. */
+			int begin = offsetvector[v] - indexvector[v] ;
+
+			ctx->weight = weight * indexvector[v] / number ;
+            refine_down(ctx, indexvector[v], nextnodesA + begin, nextnodesB + begin,
+				focus ? nextfocus + begin : NULL, focus ? focusindexvector[v] : 0, v, level + 1);
+			indexvector[v] = 0 ;
+			if ( focus )
+				focusindexvector[v] = 0 ;
 		};
     };
+	/* Reset on return: the arena is free for the next call on this level. */
+	arena->size = 0 ;
+	ctx->weight = weight ;
+	if ( 0 == number )
+		ctx->covered += weight ;
 
 trace(("mid xrefine_down() Processing by feature difference value done.\n"))
 
@@ -683,160 +1480,789 @@ trace(("%.*sout xrefine_down(level=%d, diffvalue=%d, length=%d, %s, %s)\n", SHIF
 /*
  * The following function wraps the previous function xrefine_down.
  * It prevents exploring possibly degenerated clusters,
- * or too small well-formed clusters.
+ * or too small well-formed clusters,
+ * or clusters where no pair may contain a focus word (focusnbr is 0),
+ * or, in top-K mode, clusters smaller than the largest ones found so far.
  */
 
-void refine_down(int length, int *nodesA, int *nodesB, int diffvalue, int level)
+void refine_down(CONTEXT *ctx, int length, int *nodesA, int *nodesB, int *focus, int focusnbr, int diffvalue, int level)
 {
+	int covered = TRUE ;	/* whether this subproblem is done when returning (see CONTEXT) */
+
 trace(("%.*sin  refine_down(length=%d, diffvalue=%d, level=%d, %s, %s)\n", SHIFT*level, BLANKS, length, diffvalue, level, li2s(length, nodesA), li2s(length, nodesB)))
 
-	if ( (-1 != FOCUS_WORD) && word_not_in_cluster(length, nodesA, nodesB, FOCUS_WORD) )
+	if ( is_stopped(ctx) )
+	{
+trace(("%.*smid refine_down(level=%d) MEMORY LIMIT EXCEEDED, BUDGET EXHAUSTED OR PAUSE: DO NOT CONTINUE\n", SHIFT*level, BLANKS, level))
+		/* Checkpoints: the subproblem will be solved after the pause, or on resume. */
+		if ( ctx->frontier && ! ctx->memory->exceeded )
+			add_task(ctx, ctx->frontier, length, nodesA, nodesB, focus, focusnbr, diffvalue, level) ;
+		covered = FALSE ;
+	}
+	else if ( (0 < ctx->focus_number) && (0 == focusnbr) )
 	{
-trace(("%.*smid refine_down(level=%d) FOCUS WORD %d NOT IN CLUSTER: DO NOT CONTINUE\n", SHIFT*level, BLANKS, level, focus_word))
+trace(("%.*smid refine_down(level=%d) NO FOCUS WORD IN CLUSTER: DO NOT CONTINUE\n", SHIFT*level, BLANKS, level))
 	}
-	else if ((3*last_level < 4*level) && (surface(length, nodesA, nodesB) < CLUSTER_MINIMAL_LENGTH))
+	else if ((3*ctx->last_level < 4*level) && (surface(ctx, length, nodesA, nodesB) < ctx->cluster_minimal_length))
 	{
 trace(("%.*smid refine_down(level=%d) CLUSTER TOO SMALL: DO NOT CONTINUE\n", SHIFT*level, BLANKS, level))
 	}
-    else if (is_degenerated(length, nodesA, nodesB))
+	else if ( ctx->clusters_out && ctx->clusters_out->largest && is_below_largest(ctx, length, nodesA, nodesB) )
+	{
+trace(("%.*smid refine_down(level=%d) SMALLER THAN THE LARGEST CLUSTERS: DO NOT CONTINUE\n", SHIFT*level, BLANKS, level))
+	}
+    else if (is_degenerated(ctx, length, nodesA, nodesB))
 	{
 trace(("%.*smid refine_down(level=%d) DEGENERATED CLUSTER: DO NOT CONTINUE\n", SHIFT*level, BLANKS, level))
     }
-	else if (is_empty_rest_cluster(length, nodesA, nodesB) || last_level == level)
+	else if (is_empty_rest_cluster(ctx, length, nodesA, nodesB) || ctx->last_level == level)
 /*	else if (last_level == level) */
 	{
-		if ( surface(length, nodesA, nodesB) > CLUSTER_MAXIMAL_LENGTH )
+		if ( surface(ctx, length, nodesA, nodesB) > ctx->cluster_maximal_length )
 		{
 trace(("%.*smid refine_down(level=%d) CLUSTER TOO BIG: DO NOT PRINT\n", SHIFT*level, BLANKS, level))
 		}
-		else if (is_trivial(length, nodesA, nodesB))
+		else if (is_trivial(ctx, length, nodesA, nodesB))
 		{
 trace(("%.*smid refine_down(level=%d) TRIVIAL CLUSTER: DO NOT PRINT\n", SHIFT*level, BLANKS, level))
 		}
+		else if ( ! count_cluster(ctx) )
+		{
+trace(("%.*smid refine_down(level=%d) BUDGET OF CLUSTERS EXHAUSTED: DO NOT PRINT\n", SHIFT*level, BLANKS, level))
+			if ( ctx->frontier )
+				add_task(ctx, ctx->frontier, length, nodesA, nodesB, focus, focusnbr, diffvalue, level) ;
+			covered = FALSE ;
+		}
 		else
 		{
-trace(("%.*smid refine_down(level=%d, last_level=%d) OUTPUT CLUSTER\n", SHIFT*level, BLANKS, level, last_level))
-			print_cluster(length, nodesA, nodesB);
+trace(("%.*smid refine_down(level=%d, last_level=%d) OUTPUT CLUSTER\n", SHIFT*level, BLANKS, level, ctx->last_level))
+			print_cluster(ctx, length, nodesA, nodesB);
 		} ;
     }
+	else if ( ctx->tasks && ctx->split_level == level )
+	{
+trace(("%.*smid refine_down(level=%d) SPLIT LEVEL: COLLECT AS A TASK\n", SHIFT*level, BLANKS, level))
+		add_task(ctx, ctx->tasks, length, nodesA, nodesB, focus, focusnbr, diffvalue, level) ;
+		covered = FALSE ;
+	}
 	else
 	{
-        xrefine_down(length, nodesA, nodesB, diffvalue, level);
+        xrefine_down(ctx, length, nodesA, nodesB, focus, focusnbr, diffvalue, level);
+		covered = FALSE ;
     };
+	if ( covered )
+		ctx->covered += ctx->weight ;
 
 trace(("%.*sout refine_down(level=%d, diffvalue=%d, %d, %s, %s)\n", SHIFT*level, BLANKS, level, diffvalue, length, li2s(length, nodesA), li2s(length, nodesB)))
 }
 
+/*
+ * Work memory for refine_down and xrefine_down:
+ * for each level, the number and the position of the pairs for each feature difference value,
+ * and the arena of the pairs of nodes on the next level (allocated by xrefine_down).
+ * Return FALSE if the memory limit does not allow it.
+ */
+
+int new_work_memory(CONTEXT *ctx)
+{
+	int i = 0 ;
+	int vectors = ( 0 < ctx->focus_number ) ? 3 : 2 ;
+
+	if ( ! reserve_memory(ctx, (long) (ctx->last_level + 1) * ( vectors * (ctx->valnbr + 1) * sizeof(int) + sizeof(ARENA) )) )
+		return FALSE ;
+
+    /* Create the indexvectors and the offsetvectors. */
+	ctx->indexvector = newmatrix(ctx->last_level) ;
+	ctx->offsetvector = newmatrix(ctx->last_level) ;
+	for ( i = 0 ; i < ctx->last_level + 1 ; ++i )
+	{
+		ctx->indexvector[i] = (int *) calloc(ctx->valnbr + 1, sizeof(int)) ;
+		ctx->offsetvector[i] = (int *) calloc(ctx->valnbr + 1, sizeof(int)) ;
+	} ;
+	/* The number of pairs with focus words, only with focus words. */
+	if ( 0 < ctx->focus_number )
+	{
+		ctx->focusindexvector = newmatrix(ctx->last_level) ;
+		for ( i = 0 ; i < ctx->last_level + 1 ; ++i )
+			ctx->focusindexvector[i] = (int *) calloc(ctx->valnbr + 1, sizeof(int)) ;
+	} ;
+	/* The arenas are empty: they grow when needed. */
+	ctx->arenas = (ARENA *) calloc(ctx->last_level + 1, sizeof(ARENA)) ;
+
+	return TRUE ;
+}
+
+void free_work_memory(CONTEXT *ctx)
+{
+	int i = 0 ;
+
+	if ( ! ctx->arenas )
+		return ;
+	/* Free the indexvectors and the offsetvectors. */
+	freematrix(ctx->indexvector, ctx->last_level) ;
+	freematrix(ctx->offsetvector, ctx->last_level) ;
+	if ( ctx->focusindexvector )
+		freematrix(ctx->focusindexvector, ctx->last_level) ;
+	/* Free the arenas. */
+	for ( i = 0 ; i < ctx->last_level + 1 ; ++i )
+	{
+		free(ctx->arenas[i].nodesA) ;
+		free(ctx->arenas[i].nodesB) ;
+		free(ctx->arenas[i].focus) ;
+	} ;
+	free(ctx->arenas) ;
+	ctx->indexvector = ctx->offsetvector = ctx->focusindexvector = NULL ;
+	ctx->arenas = NULL ;
+	reserve_memory(ctx, - ctx->memory_used) ;
+}
+
+/*
+ * A thread of the parallel traversal:
+ * solve the tasks not yet solved, in any order, with its own context.
+ * With checkpoints, the subproblems of a task not solved when the traversal pauses
+ * are recorded in the frontier of the task (see refine_down).
+ */
+
+typedef struct WORKER_T
+{
+	CONTEXT context ;
+	pthread_t thread ;
+	int started ;
+}
+WORKER ;
+
+void *solve_tasks(void *arg)
+{
+	CONTEXT *ctx = &((WORKER *) arg)->context ;
+	TASKS *tasks = ctx->tasks ;
+	int largest = ctx->clusters_out->largest ;
+
+	ctx->tasks = NULL ;
+	if ( ! new_work_memory(ctx) )
+		return NULL ;
+	for ( ; ; )
+	{
+		TASK *task = NULL ;
+
+		pthread_mutex_lock(&tasks->mutex) ;
+		if ( tasks->next < tasks->number && ! is_stopped(ctx) )
+			task = tasks->tasks + tasks->next++ ;
+		pthread_mutex_unlock(&tasks->mutex) ;
+		if ( ! task )
+			break ;
+
+		task->clusters = newclusters() ;
+		set_largest(task->clusters, largest) ;
+		if ( ctx->checkpoint )
+		{
+			task->frontier = (TASKS *) calloc(1, sizeof(TASKS)) ;
+			if ( ! task->frontier )
+				error(MODULE, "solve_tasks", "not enough memory for the frontier of a task") ;
+		} ;
+		ctx->clusters_out = task->clusters ;
+		ctx->frontier = task->frontier ;
+		ctx->weight = task->weight ;
+		refine_down(ctx, task->length, task->nodesA, task->nodesB, task->focus, task->focusnbr, task->diffvalue, task->level) ;
+	} ;
+	ctx->clusters_out = NULL ;
+	ctx->frontier = NULL ;
+	free_work_memory(ctx) ;
+
+	return NULL ;
+}
+
+/*
+ * Collect the subproblems at the split level as tasks
+ * (the clusters found above the split level are output at the same time).
+ * If the split level is not given, it is the first level with enough tasks for the threads.
+ */
+
+void collect_tasks(CONTEXT *ctx, TASKS *tasks)
+{
+	int nodesA = 0,
+		nodesB = 0,
+		focus = TRUE ;
+	int clu_nbr = ctx->clu_nbr,
+		rest_n = ctx->rest_n ;
+	CLUSTERS *collected = ctx->clusters_out ;
+
+	ctx->tasks = tasks ;
+	if ( ctx->split_level <= 0 )
+	{
+		for ( ctx->split_level = 1 ; ; ctx->split_level += 1 )
+		{
+			refine_down(ctx, 1, &nodesA, &nodesB, ( 0 < ctx->focus_number ) ? &focus : NULL, 1, 0, 0) ;
+			if ( 4 * ctx->threads <= tasks->number || ctx->last_level <= ctx->split_level + 1 || is_stopped(ctx) )
+				break ;
+			/* Not enough tasks: try again one level deeper. */
+			free_tasks(ctx, tasks) ;
+			truncate_clusters(collected, 0) ;
+			collected->heapsize = 0 ;
+			ctx->clu_nbr = clu_nbr ;
+			ctx->rest_n = rest_n ;
+			ctx->covered = 0 ;
+			ctx->budget->clusters = 0 ;
+		} ;
+	}
+	else
+		refine_down(ctx, 1, &nodesA, &nodesB, ( 0 < ctx->focus_number ) ? &focus : NULL, 1, 0, 0) ;
+	ctx->tasks = NULL ;
+
+	if ( ctx->verbose )
+		fprintf(stderr, "\n## [C] %d tasks at level %d for %d threads\n", tasks->number, ctx->split_level, ctx->threads) ;
+}
+
+/*
+ * Solve the tasks with ctx->threads threads (this thread is one of them).
+ */
+
+void run_threads(CONTEXT *ctx, TASKS *tasks)
+{
+	int i = 0 ;
+	WORKER *workers = (WORKER *) calloc(ctx->threads, sizeof(WORKER)) ;
+
+	if ( ! workers )
+		error(MODULE, "run_threads", "not enough memory for the threads") ;
+	tasks->next = 0 ;
+	for ( i = 0 ; i < ctx->threads ; ++i )
+	{
+		workers[i].context = *ctx ;
+		workers[i].context.verbose = FALSE ;
+		workers[i].context.clu_nbr = workers[i].context.rest_n = workers[i].context.maxpairnbr = 0 ;
+		workers[i].context.covered = 0 ;
+		workers[i].context.memory_used = 0 ;
+		workers[i].context.arenas = NULL ;
+		workers[i].context.tasks = tasks ;
+		/* Top-K mode: the clusters found before the tasks are among the clusters of the result. */
+		workers[i].context.size_bound = largest_bound(ctx->clusters_out) ;
+	} ;
+	/* If a thread cannot be created, the other threads take its tasks. */
+	for ( i = 1 ; i < ctx->threads ; ++i )
+		workers[i].started = ( 0 == pthread_create(&workers[i].thread, NULL, solve_tasks, workers + i) ) ;
+	solve_tasks(workers) ;
+	for ( i = 1 ; i < ctx->threads ; ++i )
+		if ( workers[i].started )
+			pthread_join(workers[i].thread, NULL) ;
+	for ( i = 0 ; i < ctx->threads ; ++i )
+	{
+		ctx->clu_nbr += workers[i].context.clu_nbr ;
+		ctx->rest_n += workers[i].context.rest_n ;
+		ctx->covered += workers[i].context.covered ;
+		if ( ctx->maxpairnbr < workers[i].context.maxpairnbr )
+			ctx->maxpairnbr = workers[i].context.maxpairnbr ;
+	} ;
+	free(workers) ;
+}
+
+/*
+ * Replace the clusters of to by those of from (the heap of to is kept), and free from.
+ */
+
+void move_clusters(CLUSTERS *to, CLUSTERS *from)
+{
+	free(to->offsets) ;
+	free(to->objectsA) ;
+	free(to->objectsB) ;
+	to->number = from->number ;
+	to->maxnumber = from->maxnumber ;
+	to->offsets = from->offsets ;
+	to->size = from->size ;
+	to->maxsize = from->maxsize ;
+	to->objectsA = from->objectsA ;
+	to->objectsB = from->objectsB ;
+	from->offsets = from->objectsA = from->objectsB = NULL ;
+	freeclusters(from) ;
+}
+
+/*
+ * Merge the clusters output before the tasks (done) and the clusters of the tasks
+ * in the order of the sequential traversal (see TASK position): the result replaces done.
+ * The subproblems not solved, tasks not started and frontiers of the tasks,
+ * are moved to pending with their positions in the merged clusters (checkpoints),
+ * or forgotten if pending is NULL (the clusters are incomplete anyway).
+ */
+
+void merge_tasks(CLUSTERS *done, TASKS *tasks, TASKS *pending)
+{
+	int i = 0,
+		j = 0,
+		from = 0 ;
+	CLUSTERS *merged = newclusters() ;
+
+	for ( i = 0 ; i < tasks->number ; ++i )
+	{
+		TASK *task = tasks->tasks + i ;
+
+		append_clusters(merged, done, from, task->position) ;
+		from = task->position ;
+		if ( ! task->clusters )
+		{
+			if ( pending )
+				move_task(pending, task, merged->number) ;
+		}
+		else
+		{
+			int begin = 0 ;
+
+			for ( j = 0 ; task->frontier && j < task->frontier->number ; ++j )
+			{
+				TASK *subtask = task->frontier->tasks + j ;
+
+				append_clusters(merged, task->clusters, begin, subtask->position) ;
+				begin = subtask->position ;
+				if ( pending )
+					move_task(pending, subtask, merged->number) ;
+			} ;
+			append_clusters(merged, task->clusters, begin, task->clusters->number) ;
+		} ;
+	} ;
+	append_clusters(merged, done, from, done->number) ;
+	move_clusters(done, merged) ;
+}
+
+/*
+ * Parallel traversal.
+ * 	1/ Collect the subproblems at the split level as tasks (see collect_tasks).
+ *	2/ Solve the tasks with ctx->threads threads.
+ *	3/ Merge the clusters in the order of the sequential traversal.
+ */
+
+void parallel_refine_down(CONTEXT *ctx)
+{
+	TASKS tasks ;
+
+	memset(&tasks, 0, sizeof(TASKS)) ;
+	pthread_mutex_init(&tasks.mutex, NULL) ;
+
+	collect_tasks(ctx, &tasks) ;
+	run_threads(ctx, &tasks) ;
+	/* 	When the memory limit was exceeded or a budget exhausted, some tasks are not solved: the clusters are incomplete anyway. */
+	merge_tasks(ctx->clusters_out, &tasks, NULL) ;
+
+	free_tasks(ctx, &tasks) ;
+	pthread_mutex_destroy(&tasks.mutex) ;
+}
+
+/*
+ * Checkpoint file (binary, native sizes and byte order: to be read on the same machine):
+ *	CHECKPOINT_MAGIC and the fingerprint of the clustering (see fingerprint),
+ *	the part of the traversal done (double),
+ *	the clusters output so far: number, size, offsets, objects in A, objects in B,
+ *	the subproblems not solved: number, then for each one
+ *		length, focus (TRUE or FALSE), focusnbr, diffvalue, level, position, weight,
+ *		the nodes in A, the nodes in B and the focus flags (only if focus).
+ */
+
+/*
+ * Fingerprint (FNV-1a) of the feature trees and of the parameters which change the clusters:
+ * a checkpoint is only resumed by the same clustering.
+ */
+
+unsigned long fingerprint(CONTEXT *ctx, int lengthA, int lengthB)
+{
+	unsigned long result = 14695981039346656037UL ;
+	int i = 0 ;
+	int parameters[6] = { lengthA, lengthB, ctx->symmetry, ctx->cluster_minimal_length, ctx->cluster_maximal_length,
+						  ctx->clusters_out->largest } ;
+
+	for ( i = 0 ; i < 6 ; ++i )
+		result = (result ^ (unsigned int) parameters[i]) * 1099511628211UL ;
+	for ( i = 0 ; i < lengthA ; ++i )
+		result = (result ^ (unsigned int) ctx->treeA[i]) * 1099511628211UL ;
+	for ( i = 0 ; i < lengthB ; ++i )
+		result = (result ^ (unsigned int) ctx->treeB[i]) * 1099511628211UL ;
+	for ( i = 0 ; i < ctx->focus_number ; ++i )
+		result = (result ^ (unsigned int) ctx->focus_words[i]) * 1099511628211UL ;
+
+	return result ;
+}
+
+int write_ints(FILE *file, int *x, int n)
+{
+	return ( n == (int) fwrite(x, sizeof(int), n, file) ) ;
+}
+
+int read_ints(FILE *file, int *x, int n)
+{
+	return ( n == (int) fread(x, sizeof(int), n, file) ) ;
+}
+
+/*
+ * Write the state of the traversal into the checkpoint file.
+ * The file is written under another name, then renamed:
+ * the previous checkpoint is kept if the writing fails.
+ */
+
+void write_checkpoint(CONTEXT *ctx, unsigned long print, CLUSTERS *done, TASKS *pending)
+{
+	int i = 0 ;
+	unsigned int magic = CHECKPOINT_MAGIC ;
+	char *temporary = (char *) malloc(strlen(ctx->checkpoint) + 5) ;
+	FILE *file = NULL ;
+	int ok = FALSE ;
+
+	if ( ! temporary )
+		error(MODULE, "write_checkpoint", "not enough memory for the name of the checkpoint file") ;
+	sprintf(temporary, "%s.tmp", ctx->checkpoint) ;
+	file = fopen(temporary, "wb") ;
+	if ( file )
+	{
+		ok = 1 == fwrite(&magic, sizeof(magic), 1, file)
+			&& 1 == fwrite(&print, sizeof(print), 1, file)
+			&& 1 == fwrite(&ctx->covered, sizeof(double), 1, file)
+			&& write_ints(file, &done->number, 1) && write_ints(file, &done->size, 1)
+			&& write_ints(file, done->offsets, done->number + 1)
+			&& write_ints(file, done->objectsA, done->size) && write_ints(file, done->objectsB, done->size)
+			&& write_ints(file, &pending->number, 1) ;
+		for ( i = 0 ; ok && i < pending->number ; ++i )
+		{
+			TASK *task = pending->tasks + i ;
+			int fields[TASK_FIELDS] = { task->length, NULL != task->focus, task->focusnbr, task->diffvalue, task->level, task->position } ;
+
+			ok = write_ints(file, fields, TASK_FIELDS)
+				&& 1 == fwrite(&task->weight, sizeof(double), 1, file)
+				&& write_ints(file, task->nodesA, task->length) && write_ints(file, task->nodesB, task->length)
+				&& ( ! task->focus || write_ints(file, task->focus, task->length) ) ;
+		} ;
+		ok = ( 0 == fclose(file) ) && ok ;
+	} ;
+	if ( ok )
+		ok = ( 0 == rename(temporary, ctx->checkpoint) ) ;
+	if ( ! ok )
+	{
+		warning(MODULE, "write_checkpoint", "cannot write the checkpoint file (the previous one is kept)") ;
+		remove(temporary) ;
+	}
+	else if ( ctx->verbose )
+		fprintf(stderr, "\n## [C] Checkpoint %s: %d clusters, %d subproblems pending, %.1f%% of the traversal done\n",
+			ctx->checkpoint, done->number, pending->number, 100 * ctx->covered) ;
+	free(temporary) ;
+}
+
+/*
+ * Read the state of the traversal from the checkpoint file, if it exists.
+ * Return FALSE if there is no checkpoint file,
+ * or if it is not a checkpoint of the same clustering or is truncated (the clustering starts from scratch).
+ */
+
+int read_checkpoint(CONTEXT *ctx, unsigned long print, CLUSTERS *done, TASKS *pending)
+{
+	int i = 0 ;
+	unsigned int magic = 0 ;
+	unsigned long fileprint = 0 ;
+	int number = 0,
+		size = 0 ;
+	double covered = 0 ;
+	FILE *file = fopen(ctx->checkpoint, "rb") ;
+	int ok = FALSE ;
+
+	if ( ! file )
+		return FALSE ;
+	if ( 1 != fread(&magic, sizeof(magic), 1, file) || CHECKPOINT_MAGIC != magic
+		|| 1 != fread(&fileprint, sizeof(fileprint), 1, file) || print != fileprint )
+	{
+		warning(MODULE, "read_checkpoint", "not a checkpoint of this clustering: ignored") ;
+		fclose(file) ;
+		return FALSE ;
+	} ;
+	ok = 1 == fread(&covered, sizeof(double), 1, file)
+		&& read_ints(file, &number, 1) && read_ints(file, &size, 1)
+		&& 0 <= number && 0 <= size ;
+	if ( ok )
+	{
+		/* The clusters are read into the buffers of done (which are empty). */
+		while ( done->maxnumber < number )
+			done->maxnumber *= 2 ;
+		while ( done->maxsize < size )
+			done->maxsize *= 2 ;
+		done->offsets = (int *) realloc(done->offsets, (done->maxnumber + 1) * sizeof(int)) ;
+		done->objectsA = (int *) realloc(done->objectsA, done->maxsize * sizeof(int)) ;
+		done->objectsB = (int *) realloc(done->objectsB, done->maxsize * sizeof(int)) ;
+		if ( ! done->offsets || ! done->objectsA || ! done->objectsB )
+			error(MODULE, "read_checkpoint", "not enough memory for the clusters") ;
+		done->number = number ;
+		done->size = size ;
+		ok = read_ints(file, done->offsets, number + 1)
+			&& read_ints(file, done->objectsA, size) && read_ints(file, done->objectsB, size)
+			&& read_ints(file, &number, 1) ;
+	} ;
+	for ( i = 0 ; ok && i < number ; ++i )
+	{
+		int fields[TASK_FIELDS] ;
+		double weight = 0 ;
+		int *nodes = NULL ;
+
+		ok = read_ints(file, fields, TASK_FIELDS) && 1 == fread(&weight, sizeof(double), 1, file) && 0 < fields[0] ;
+		if ( ok )
+		{
+			int length = fields[0] ;
+
+			nodes = (int *) malloc(3 * length * sizeof(int)) ;
+			if ( ! nodes )
+				error(MODULE, "read_checkpoint", "not enough memory for the subproblems") ;
+			ok = read_ints(file, nodes, length) && read_ints(file, nodes + length, length)
+				&& ( ! fields[1] || read_ints(file, nodes + 2 * length, length) ) ;
+			if ( ok )
+			{
+				TASK *task = NULL ;
+
+				add_task(ctx, pending, length, nodes, nodes + length, fields[1] ? nodes + 2 * length : NULL, fields[2], fields[3], fields[4]) ;
+				task = pending->tasks + pending->number - 1 ;
+				task->position = fields[5] ;
+				task->weight = weight ;
+			} ;
+			free(nodes) ;
+		} ;
+	} ;
+	fclose(file) ;
+	if ( ! ok )
+	{
+		warning(MODULE, "read_checkpoint", "truncated checkpoint file: ignored") ;
+		truncate_clusters(done, 0) ;
+		free_tasks(ctx, pending) ;
+		return FALSE ;
+	} ;
+	ctx->covered = covered ;
+
+	return TRUE ;
+}
+
+/*
+ * Top-K mode: the heap of the sizes of all the clusters (after a merge or a resume).
+ */
+
+void rebuild_largest(CLUSTERS *clusters)
+{
+	int i = 0 ;
+
+	clusters->heapsize = 0 ;
+	for ( i = 0 ; clusters->largest && i < clusters->number ; ++i )
+		push_size(clusters, clusters->offsets[i + 1] - clusters->offsets[i]) ;
+}
+
+/*
+ * Traversal with checkpoints.
+ * The state of the traversal is the clusters output so far
+ * and the subproblems not solved yet, each with the number of clusters output before it
+ * in the order of the sequential traversal (as the tasks of the parallel traversal).
+ * Every checkpoint_interval seconds, the traversal pauses:
+ * the subproblems not solved are recorded (see refine_down), the clusters are merged (see merge_tasks),
+ * the state is written into the checkpoint file, and the traversal goes on from this state.
+ * The same is done when a budget is exhausted.
+ * If the checkpoint file exists at the start, the traversal resumes from the state it contains.
+ * The clusters are the same, in the same order, as without checkpoints.
+ * The checkpoint file is removed at the end of a complete traversal.
+ */
+
+void checkpointed_refine_down(CONTEXT *ctx, int lengthA, int lengthB)
+{
+	int nodesA = 0,
+		nodesB = 0,
+		focus = TRUE ;
+	unsigned long print = fingerprint(ctx, lengthA, lengthB) ;
+	CLUSTERS *done = ctx->clusters_out ;
+	TASKS pending,
+		  tasks ;
+
+	memset(&pending, 0, sizeof(TASKS)) ;
+	memset(&tasks, 0, sizeof(TASKS)) ;
+	pthread_mutex_init(&tasks.mutex, NULL) ;
+
+	if ( read_checkpoint(ctx, print, done, &pending) )
+	{
+		if ( ctx->verbose )
+			fprintf(stderr, "## [C] Resuming from checkpoint %s: %d clusters, %d subproblems pending, %.1f%% of the traversal done\n",
+				ctx->checkpoint, done->number, pending.number, 100 * ctx->covered) ;
+	}
+	else if ( 1 < ctx->threads )
+	{
+		/* A budget may stop the traversal while collecting the tasks. */
+		ctx->frontier = &pending ;
+		collect_tasks(ctx, &pending) ;
+		ctx->frontier = NULL ;
+	}
+	else
+		add_task(ctx, &pending, 1, &nodesA, &nodesB, ( 0 < ctx->focus_number ) ? &focus : NULL, 1, 0, 0) ;
+	rebuild_largest(done) ;
+
+	while ( 0 < pending.number && ! ctx->memory->exceeded )
+	{
+		if ( ! ctx->budget->stopped )
+		{
+			/* The subproblems pending are the tasks of this round. */
+			tasks.number = pending.number ;
+			tasks.maxnumber = pending.maxnumber ;
+			tasks.tasks = pending.tasks ;
+			pending.number = pending.maxnumber = 0 ;
+			pending.tasks = NULL ;
+
+			ctx->budget->paused = FALSE ;
+			ctx->budget->checkpoint_time = ( 0 < ctx->checkpoint_interval ) ? wall_clock() + ctx->checkpoint_interval : 0 ;
+			run_threads(ctx, &tasks) ;
+			merge_tasks(done, &tasks, &pending) ;
+			free_tasks(ctx, &tasks) ;
+			rebuild_largest(done) ;
+		} ;
+		if ( 0 < pending.number && ! ctx->memory->exceeded )
+			write_checkpoint(ctx, print, done, &pending) ;
+		if ( ctx->budget->stopped )
+			break ;
+	} ;
+	ctx->budget->paused = FALSE ;
+	ctx->budget->checkpoint_time = 0 ;
+	if ( 0 == pending.number && ! ctx->memory->exceeded )
+		remove(ctx->checkpoint) ;
+
+	free_tasks(ctx, &pending) ;
+	pthread_mutex_destroy(&tasks.mutex) ;
+}
+
+/*
+ * Sharded traversal, over several processes (see nlgclu_in_C_frontier and nlgclu_in_C_from_tasks):
+ * the tasks at the split level are collected by one process, and solved by other processes.
+ * The tasks are passed between the processes as one buffer of integers, for each task:
+ *	length, focus (TRUE or FALSE), focusnbr, diffvalue, level, position,
+ *	the nodes in A, the nodes in B and the focus flags (only if focus),
+ * as in the checkpoint file (see write_checkpoint).
+ */
+
+void serialize_tasks(CLUSTERS *clusters, TASKS *tasks)
+{
+	int i = 0 ;
+	int *p = NULL ;
+
+	clusters->frontiersize = 0 ;
+	for ( i = 0 ; i < tasks->number ; ++i )
+		clusters->frontiersize += TASK_FIELDS + tasks->tasks[i].length * ( tasks->tasks[i].focus ? 3 : 2 ) ;
+	clusters->frontier = (int *) malloc(( clusters->frontiersize + 1 ) * sizeof(int)) ;
+	if ( ! clusters->frontier )
+		error(MODULE, "serialize_tasks", "not enough memory for the tasks") ;
+	for ( i = 0, p = clusters->frontier ; i < tasks->number ; ++i )
+	{
+		TASK *task = tasks->tasks + i ;
+
+		p[0] = task->length ;
+		p[1] = NULL != task->focus ;
+		p[2] = task->focusnbr ;
+		p[3] = task->diffvalue ;
+		p[4] = task->level ;
+		p[5] = task->position ;
+		p += TASK_FIELDS ;
+		memcpy(p, task->nodesA, task->length * sizeof(int)) ;
+		memcpy(p + task->length, task->nodesB, task->length * sizeof(int)) ;
+		p += 2 * task->length ;
+		if ( task->focus )
+		{
+			memcpy(p, task->focus, task->length * sizeof(int)) ;
+			p += task->length ;
+		} ;
+	} ;
+}
+
+/*
+ * Solve the tasks of a shard one after the other, in the order of the shard,
+ * and record the number of clusters output after each one.
+ * The nodes are read in the shard: they are not copied.
+ */
+
+void solve_shard(CONTEXT *ctx)
+{
+	int i = 0,
+		n = 0 ;
+
+	for ( i = 0, n = 0 ; i < ctx->shardsize && ! is_stopped(ctx) ; ++n )
+	{
+		int *fields = ctx->shard + i ;
+		int length = fields[0] ;
+		int *nodesA = fields + TASK_FIELDS,
+			*nodesB = nodesA + length ;
+
+		refine_down(ctx, length, nodesA, nodesB, fields[1] ? nodesB + length : NULL, fields[2], fields[3], fields[4]) ;
+		ctx->shard_counts[n] = ctx->clusters_out->number ;
+		i += TASK_FIELDS + length * ( fields[1] ? 3 : 2 ) ;
+	} ;
+}
+
 /*
  * Analogical clustering
  * The list of integers should be a list of NODESIZE-tuples of integers (see above).
  * 		n is the number of integers in the list of integers representing the tree.
+ * The parameters and the output are those of the context ctx (see init_context).
  */
 
-void analogical_clustering(int verbose, int lengthA, int lengthB, int *thetreeA, int *thetreeB, char *thelinesA, char *thelinesB)
+void analogical_clustering(CONTEXT *ctx, int lengthA, int lengthB, int *thetreeA, int *thetreeB, char *thelinesA, char *thelinesB)
 {
     int nodesA = 0,
-		nodesB = 0 ;
+		nodesB = 0,
+		focus = TRUE ;	/* the root pair contains all the objects, hence the focus words */
     int last_node = 0 ;
-	int i = 0 ;
 
 trace(("in  analogical_clustering(%d, %d, %s, %s)\n", lengthA, lengthB, li2s(lengthA, thetreeA), li2s(lengthB, thetreeB)))
 
-    /* Initialize the global variables VERBOSE and symmetry. */
-    VERBOSE = verbose;
 /*
     if (thetreeA == thetreeB)
-        symmetry = TRUE;
+        ctx->symmetry = TRUE;
 */
-    /* Initialize the global variables treeA and treeB. */
-	treeA = thetreeA ;
-	treeB = thetreeB ;
+    /* Initialize the feature trees of the context. */
+	ctx->treeA = thetreeA ;
+	ctx->treeB = thetreeB ;
 
-	if ( LINEOUT )
+	if ( ctx->lineout )
 	{
 		/* Creating the table of lines. */
-		/* CAUTION: lines and linetable are global variables */
-		newlinetable(thelinesB);
-		linetableB = linetableA;
-		if (!symmetry)
-			newlinetable(thelinesA);
+		ctx->linetableB = newlinetable(thelinesB);
+		ctx->linetableA = ctx->symmetry ? ctx->linetableB : newlinetable(thelinesA);
 	} ;
 
-trace(("mid analogical_clustering() symmetry = %s\n", symmetry ? "true" : "false"))
+trace(("mid analogical_clustering() symmetry = %s\n", ctx->symmetry ? "true" : "false"))
 
     /* n = NODESIZE * number of nodes and we start with 0, thus last node has the number (n/NODESIZE)-1 */
     last_node = (lengthA / NODESIZE) - 1;
-    /* CAUTION: last_level is a global variable */
-    last_level = level(treeA, last_node);
+    ctx->last_level = level(ctx->treeA, last_node);
 
 	/* Compute the possible minimal value. */
-    getmatrixparams(lengthA, lengthB, treeA, treeB);
-
-    /* Create the indexvectors. */
-	indexvector = newmatrix(last_level) ;
-	maxindexvector = newmatrix(last_level) ;
-	for ( i = 0 ; i < last_level + 1 ; ++i )
-	{
-		int j = 0 ;
-		
-		indexvector[i] = (int *) calloc(_VALNBR + 1, sizeof(int)) ;
-		maxindexvector[i] = (int *) calloc(_VALNBR + 1, sizeof(int)) ;
-		for ( j = 0 ; j < _VALNBR + 1 ; ++j )
-			maxindexvector[i][j] = 256 ;
-	} ;
-	/* Initialize the nextnodeAmatrix and nextnodeBmatrix. */
-	nextnodeAmatrix = (int ***) calloc(last_level + 1, sizeof(int **)) ;
-	nextnodeBmatrix = (int ***) calloc(last_level + 1, sizeof(int **)) ;
-	for ( i = 0 ; i < last_level + 1 ; ++i )
-	{
-		int j = 0 ;
-		
-		nextnodeAmatrix[i] = newmatrix(_VALNBR) ;
-		nextnodeBmatrix[i] = newmatrix(_VALNBR) ;
-		for ( j = 0 ; j < _VALNBR + 1 ; ++j )
-		{
-			nextnodeAmatrix[i][j] = (int *) calloc(maxindexvector[i][j], sizeof (int)); ;
-			nextnodeBmatrix[i][j] = (int *) calloc(maxindexvector[i][j], sizeof (int)); ;
-		} ;
-	} ;
+    getmatrixparams(ctx, lengthA, lengthB);
 
-trace(("mid analogical_clustering() last_level = %d\n", last_level))
+trace(("mid analogical_clustering() last_level = %d\n", ctx->last_level))
 
     /* Call the analogical clustering function. */
-    refine_down(1, &nodesA, &nodesB, 0, 0);
+	if ( ! new_work_memory(ctx) )
+	{
+trace(("mid analogical_clustering() MEMORY LIMIT EXCEEDED\n"))
+	}
+	else if ( ctx->shard )
+		solve_shard(ctx) ;
+	else if ( ctx->collected )
+		collect_tasks(ctx, ctx->collected) ;
+	else if ( ctx->checkpoint && ctx->clusters_out )
+		checkpointed_refine_down(ctx, lengthA, lengthB) ;
+	else if ( 1 < ctx->threads && ctx->clusters_out )
+		parallel_refine_down(ctx) ;
+	else
+		refine_down(ctx, 1, &nodesA, &nodesB, ( 0 < ctx->focus_number ) ? &focus : NULL, 1, 0, 0);
 
-    if (VERBOSE)
+    if (ctx->verbose)
         fprintf(stderr, "\n");
-	
-	/* Free the indexvectors. */
-	freematrix(indexvector, last_level) ;
-	freematrix(maxindexvector, last_level) ;
-	/* Free the nextnodeAmatrix and nextnodeBmatrix. */
-	for ( i = 0 ; i < last_level + 1 ; ++i )
+
+	free_work_memory(ctx) ;
+
+    /* Freeing the lines. */
+	if ( ctx->lineout )
 	{
-		freematrix(nextnodeAmatrix[i], _VALNBR) ;
-		freematrix(nextnodeBmatrix[i], _VALNBR) ;
+		freelinetable(ctx->linetableB) ;
+		if ( ! ctx->symmetry )
+			freelinetable(ctx->linetableA) ;
+		ctx->linetableA = ctx->linetableB = NULL ;
 	} ;
-	free(nextnodeAmatrix) ;
-	free(nextnodeBmatrix) ;
 
-    /* Freeing the lines. */
-    /*
-		if ( LINEOUT )
-		{
-            freelinetable(linetableB) ;
-            if ( ! symmetry )
-                    freelinetable(linetableA) ;
-		} ;
-     */
-trace(("out analogical_clustering(%d, %d, %s, %s)\n", lengthA, lengthB, li2s(lengthA, treeA), li2s(lengthB, treeB)))
+trace(("out analogical_clustering(%d, %d, %s, %s)\n", lengthA, lengthB, li2s(lengthA, ctx->treeA), li2s(lengthB, ctx->treeB)))
 }
 
 /*
  * Reading the data from the temporary file.
  */
 
-FEATURES *read_features(char *fileA)
+FEATURES *read_features(char *fileA, int lineout)
 {
 	FEATURES *result = (FEATURES *) calloc(1, sizeof(FEATURES)) ;
 	FILE *fA = NULL ;
@@ -849,14 +2275,14 @@ trace(("in  read_features(%s)\n", fileA))
     fA = fopen(fileA, "r");
 
     fscanf(fA, "%d", &(result->length));
-	
+
     result->thetree = (int *) calloc(result->length+1, sizeof(int)) ;
     for (i = 0; i < result->length; ++i)
 	{
         fscanf(fA, "%d", &(result->thetree[i]));
     } ;
-	
-	if ( LINEOUT )
+
+	if ( lineout )
 	{
 		result->thelines = (char *) calloc(1000000, sizeof(char));
 		i = 0;
@@ -868,15 +2294,59 @@ trace(("in  read_features(%s)\n", fileA))
 		}
 		*(result->thelines + i) = '\0';
 	} ;
-	
+
 	/* Close the temporary file. */
     fclose(fA);
-	
+
 trace(("out read_features(%s) = (%d, %s)\n", fileA, result->length, li2s(result->length, result->thetree)))
-	
+
 	return result ;
 }
 
+/*
+ * Freeing the data read from the temporary file.
+ */
+
+void free_features(FEATURES *features)
+{
+	free(features->thetree) ;
+	free(features->thelines) ;
+	free(features) ;
+}
+
+/*
+ * Clustering proper, once the feature trees are in memory.
+ * The clusters are output onto ctx->cluout or ctx->clusters_out (see print_cluster).
+ */
+
+void cluster_features(CONTEXT *ctx, FEATURES *featuresA, FEATURES *featuresB)
+{
+    clock_t t2 ;
+
+	t2 = clock() ;
+	analogical_clustering(ctx,
+		featuresA->length, featuresB->length,
+		featuresA->thetree, featuresB->thetree,
+		featuresA->thelines, featuresB->thelines) ;
+
+	if (ctx->verbose)
+		fprintf(stderr, "## Max number of pairs: %d\n",
+			ctx->maxpairnbr) ;
+
+	if (ctx->verbose)
+		fprintf(stderr, "## _VALNBR: %d\n",
+			ctx->valnbr) ;
+
+	if (ctx->verbose)
+		fprintf(stderr, "## Number of early outputs of clusters: %d\n",
+			ctx->rest_n) ;
+
+	if (ctx->verbose )
+    	fprintf(stderr, "## [C] Clustering time: %.2fs\n",
+			(double) (clock() - t2) / CLOCKS_PER_SEC) ;
+	fflush(stderr) ;
+}
+
 /*
  * Interface with the Python program.
  * 	First, read the data contained in the input temporary file(s).
@@ -888,64 +2358,278 @@ trace(("out read_features(%s) = (%d, %s)\n", fileA, result->length, li2s(result-
 
 extern void nlgclu_in_C(char *fileA, char *fileB, char *clufile, int minsize, int maxsize, int verbose, int lineout, int focus)
 {
+	CONTEXT context ;
+	MEMORY memory ;
+	BUDGET budget ;
 	FEATURES *featuresA = NULL,
 			 *featuresB = NULL ;
-    clock_t t1, t2 ;
+    clock_t t1 ;
 
 trace(("in  nlgclu_in_C(%s, %s, %s, min=%d, max=%d, %s, %s, focus=%d)\n", fileA, fileB, clufile, minsize, maxsize, verbose?"VERBOSE":"NOT verbose", lineout?"LINEOUT":"NOT lineout", focus))
 
+	init_memory(&memory, 0) ;
+	init_budget(&budget, 0, 0) ;
+	init_context(&context, minsize, maxsize, verbose, lineout, &focus, ( -1 == focus ) ? 0 : 1, &memory, &budget) ;
 
-	FOCUS_WORD = focus ;
-
-	CLUSTER_MINIMAL_LENGTH = minsize;
-	CLUSTER_MAXIMAL_LENGTH = maxsize;
-	if ( -1 == CLUSTER_MAXIMAL_LENGTH )
-		CLUSTER_MAXIMAL_LENGTH = INT_MAX ;
-
-	VERBOSE = verbose;
-	LINEOUT = lineout;
-	
 	t1 = clock() ;
-	featuresA = read_features(fileA);
+	featuresA = read_features(fileA, lineout);
 	if ( 0 == strcmp(fileA,fileB) )
 	{
 		featuresB = featuresA ;
-		symmetry = TRUE ;
+		context.symmetry = TRUE ;
 	}
 	else
-		featuresB = read_features(fileB);
-	cluout = fopen(clufile, "w") ;
+		featuresB = read_features(fileB, lineout);
 
-	if (VERBOSE )
+	if (verbose )
     	fprintf(stderr, "## [C new version] Reading time: %.2fs\n",
 			(double) (clock() - t1) / CLOCKS_PER_SEC) ;
 
 trace(("mid nlgclu_in_C(%s, %s, %s, min=%d, max=%d, %s, %s, focus=%d)\n", fileA, fileB, clufile, minsize, maxsize, verbose?"VERBOSE":"NOT verbose", lineout?"LINEOUT":"NOT lineout", focus))
 
-	t2 = clock() ;
-	analogical_clustering(VERBOSE,
-		featuresA->length, featuresB->length,
-		featuresA->thetree, featuresB->thetree,
-		featuresA->thelines, featuresB->thelines) ;
+	context.cluout = fopen(clufile, "w") ;
+	cluster_features(&context, featuresA, featuresB) ;
+	fclose(context.cluout) ;
 
-	if (VERBOSE)
-		fprintf(stderr, "## Max number of pairs: %d\n",
-			MAXPAIRNBR) ;
+	free_features(featuresA) ;
+	if ( featuresB != featuresA )
+		free_features(featuresB) ;
+	pthread_mutex_destroy(&memory.mutex) ;
+	pthread_mutex_destroy(&budget.mutex) ;
 
-	if (VERBOSE)
-		fprintf(stderr, "## _VALNBR: %d\n",
-			_VALNBR) ;
+trace(("out nlgclu_in_C(%s, %s, %s, min=%d, max=%d, %s, %s, focus=%d)\n", fileA, fileB, clufile, minsize, maxsize, verbose?"VERBOSE":"NOT verbose", lineout?"LINEOUT":"NOT lineout", focus))
+}
 
-	if (VERBOSE)
-		fprintf(stderr, "## Number of early outputs of clusters: %d\n",
-			rest_n) ;
+/*
+ * Interface with the Python program without temporary files.
+ * 	The feature trees are passed as contiguous buffers of int (int32)
+ *		of lengthA and lengthB integers (see nlgclu.i).
+ * 	The buffers belong to the caller: they are neither copied nor freed.
+ * 	The same buffer for A and B means clustering of one set of objects with itself.
+ * 	The clusters are returned in memory, with the objects encoded as integers:
+ *		the caller gets them with nlgclu_clusters_copy and frees them with nlgclu_clusters_free.
+ * 	There are no lines in this case: lineout is not possible
+ * 		(use nlgclu_in_C for debugging).
+ * 	There is no global variable: this function can be called from several threads at the same time
+ * 		(the Python interface releases the GIL during the call).
+ * 	The focus words are a buffer of nfocus sorted objects (none: all clusters):
+ *		only the clusters which contain at least one of them are output.
+ * 	With more than one thread, the traversal itself is parallel (see parallel_refine_down):
+ *		the subproblems at split_level (0: chosen automatically) are solved by threads threads.
+ *		The clusters are the same and in the same order as with one thread.
+ * 	The work memory of the traversal is limited to memory_limit bytes (0: no limit).
+ *		If the limit is exceeded, the traversal stops and the clusters are marked as incomplete
+ *		(see nlgclu_clusters_out_of_memory).
+ *		In any case, the peak of the work memory is returned with the clusters (see nlgclu_clusters_peak_memory).
+ * 	With largest > 0 (top-K mode), only the largest clusters are returned, sorted by decreasing size
+ *		(clusters of the same size in the order of the traversal, see keep_largest_clusters).
+ *		The subproblems which cannot contain clusters as large are not explored.
+ * 	The traversal stops cleanly after time_budget seconds (0: no time budget)
+ *		or after max_clusters clusters (0: no limit).
+ *		The clusters found so far are returned, marked as stopped (see nlgclu_clusters_stopped)
+ *		with the fraction of the traversal done (see nlgclu_clusters_coverage).
+ * 	With a checkpoint file (NULL or "": none), the state of the traversal is written into it
+ *		every checkpoint_interval seconds (0: only when a budget is exhausted),
+ *		and the traversal resumes from it if it exists (see checkpointed_refine_down).
+ */
 
-	if (VERBOSE )
-    	fprintf(stderr, "## [C] Clustering time: %.2fs\n",
-			(double) (clock() - t2) / CLOCKS_PER_SEC) ;
-	fflush(stderr) ;
+extern CLUSTERS *nlgclu_in_C_from_buffers(int *treeA, int lengthA, int *treeB, int lengthB, int minsize, int maxsize, int verbose, int *focus, int nfocus, int threads, int split_level, long memory_limit, int largest, double time_budget, int max_clusters, char *checkpoint, double checkpoint_interval)
+{
+	CONTEXT context ;
+	MEMORY memory ;
+	BUDGET budget ;
+	FEATURES featuresA = { lengthA, treeA, NULL },
+			 featuresB = { lengthB, treeB, NULL } ;
+	CLUSTERS *result = newclusters() ;
+
+trace(("in  nlgclu_in_C_from_buffers(%d, %d, min=%d, max=%d, %s, focus=%s)\n", lengthA, lengthB, minsize, maxsize, verbose?"VERBOSE":"NOT verbose", li2s(nfocus, focus)))
+
+	init_memory(&memory, memory_limit) ;
+	init_budget(&budget, time_budget, max_clusters) ;
+	init_context(&context, minsize, maxsize, verbose, FALSE, focus, nfocus, &memory, &budget) ;
+	context.symmetry = ( treeA == treeB && lengthA == lengthB ) ;
+	context.clusters_out = result ;
+	context.threads = ( 1 < threads ) ? threads : 1 ;
+	context.split_level = split_level ;
+	context.checkpoint = ( checkpoint && *checkpoint ) ? checkpoint : NULL ;
+	context.checkpoint_interval = checkpoint_interval ;
+	set_largest(result, largest) ;
+
+	cluster_features(&context, &featuresA, &featuresB) ;
+	if ( result->largest )
+		keep_largest_clusters(result) ;
+	result->peak_memory = memory.peak ;
+	result->out_of_memory = memory.exceeded ;
+	result->stopped = budget.stopped ;
+	/* Rounding errors aside, the whole traversal is covered when it was not stopped. */
+	result->coverage = ( memory.exceeded || budget.stopped ) ? ( ( context.covered < 1.0 ) ? context.covered : 1.0 ) : 1.0 ;
+	pthread_mutex_destroy(&memory.mutex) ;
+	pthread_mutex_destroy(&budget.mutex) ;
+
+	if ( verbose )
+		fprintf(stderr, "## [C] Peak work memory: %ld bytes%s\n",
+			memory.peak, memory.exceeded ? " (memory limit exceeded: clustering stopped)" : "") ;
+	if ( verbose && budget.stopped )
+		fprintf(stderr, "## [C] Clustering stopped by the %s budget: %.1f%% of the traversal done\n",
+			( STOPPED_BY_TIME == budget.stopped ) ? "time" : "clusters", 100 * result->coverage) ;
+
+trace(("out nlgclu_in_C_from_buffers(%d, %d, min=%d, max=%d, %s, focus=%s) = %d clusters\n", lengthA, lengthB, minsize, maxsize, verbose?"VERBOSE":"NOT verbose", li2s(nfocus, focus), result->number))
 
-trace(("out nlgclu_in_C(%s, %s, %s, min=%d, max=%d, %s, %s, focus=%d)\n", fileA, fileB, clufile, minsize, maxsize, verbose?"VERBOSE":"NOT verbose", lineout?"LINEOUT":"NOT lineout", focus))
+	return result ;
+}
+
+/*
+ * Sharded traversal (see serialize_tasks), first step, in the calling process:
+ * 	the traversal down to split_level (0: the first level with enough tasks for threads processes, see collect_tasks).
+ * 	The clusters found above the split level are returned with the tasks at the split level, serialized
+ *		(see nlgclu_clusters_frontier_size and nlgclu_clusters_copy_frontier).
+ *	The position of a task is the number of these clusters output before it in the sequential traversal.
+ * 	The other parameters are those of nlgclu_in_C_from_buffers.
+ */
+
+extern CLUSTERS *nlgclu_in_C_frontier(int *treeA, int lengthA, int *treeB, int lengthB, int minsize, int maxsize, int verbose, int *focus, int nfocus, int threads, int split_level, long memory_limit)
+{
+	CONTEXT context ;
+	MEMORY memory ;
+	BUDGET budget ;
+	TASKS tasks ;
+	FEATURES featuresA = { lengthA, treeA, NULL },
+			 featuresB = { lengthB, treeB, NULL } ;
+	CLUSTERS *result = newclusters() ;
+
+	init_memory(&memory, memory_limit) ;
+	init_budget(&budget, 0, 0) ;
+	init_context(&context, minsize, maxsize, verbose, FALSE, focus, nfocus, &memory, &budget) ;
+	context.symmetry = ( treeA == treeB && lengthA == lengthB ) ;
+	context.clusters_out = result ;
+	context.threads = ( 1 < threads ) ? threads : 1 ;
+	context.split_level = split_level ;
+	memset(&tasks, 0, sizeof(TASKS)) ;
+	context.collected = &tasks ;
+
+	cluster_features(&context, &featuresA, &featuresB) ;
+	serialize_tasks(result, &tasks) ;
+	free_tasks(&context, &tasks) ;
+	result->peak_memory = memory.peak ;
+	result->out_of_memory = memory.exceeded ;
+	result->coverage = 1.0 ;
+	pthread_mutex_destroy(&memory.mutex) ;
+	pthread_mutex_destroy(&budget.mutex) ;
+
+	return result ;
+}
+
+/*
+ * Sharded traversal, second step, in each process:
+ * 	solve the tasks of a shard (ntasks integers in tasks, a part of a frontier, see nlgclu_in_C_frontier),
+ * 	in the order of the shard, from the same feature trees and with the same parameters.
+ * 	The number of clusters output after each task is written into counts (one integer per task),
+ *	so that the caller can merge the clusters of the shards in the order of the sequential traversal.
+ * 	Return NULL if the tasks are not well-formed.
+ */
+
+extern CLUSTERS *nlgclu_in_C_from_tasks(int *treeA, int lengthA, int *treeB, int lengthB, int minsize, int maxsize, int verbose, int *focus, int nfocus, int *tasks, int ntasks, long memory_limit, int *counts, int ncounts)
+{
+	CONTEXT context ;
+	MEMORY memory ;
+	BUDGET budget ;
+	FEATURES featuresA = { lengthA, treeA, NULL },
+			 featuresB = { lengthB, treeB, NULL } ;
+	CLUSTERS *result = NULL ;
+	int i = 0,
+		n = 0 ;
+
+	/* Check the shard: ncounts tasks in exactly ntasks integers. */
+	for ( i = 0, n = 0 ; i + TASK_FIELDS <= ntasks && 0 < tasks[i] ; ++n )
+		i += TASK_FIELDS + tasks[i] * ( tasks[i+1] ? 3 : 2 ) ;
+	if ( i != ntasks || n != ncounts )
+	{
+		warning(MODULE, "nlgclu_in_C_from_tasks", "the tasks do not match the counts") ;
+		return NULL ;
+	} ;
+
+	result = newclusters() ;
+	init_memory(&memory, memory_limit) ;
+	init_budget(&budget, 0, 0) ;
+	init_context(&context, minsize, maxsize, verbose, FALSE, focus, nfocus, &memory, &budget) ;
+	context.symmetry = ( treeA == treeB && lengthA == lengthB ) ;
+	context.clusters_out = result ;
+	context.shard = tasks ;
+	context.shardsize = ntasks ;
+	context.shard_counts = counts ;
+
+	memset(counts, 0, ncounts * sizeof(int)) ;
+	if ( 0 < ntasks )
+		cluster_features(&context, &featuresA, &featuresB) ;
+	result->peak_memory = memory.peak ;
+	result->out_of_memory = memory.exceeded ;
+	result->coverage = 1.0 ;
+	pthread_mutex_destroy(&memory.mutex) ;
+	pthread_mutex_destroy(&budget.mutex) ;
+
+	return result ;
+}
+
+/*
+ * Access to the clusters in memory from the Python program:
+ * 	first get the sizes, then copy into arrays of these sizes allocated by the caller.
+ */
+
+extern int nlgclu_clusters_number(CLUSTERS *clusters)
+{
+	return clusters->number ;
+}
+
+extern int nlgclu_clusters_size(CLUSTERS *clusters)
+{
+	return clusters->size ;
+}
+
+extern long nlgclu_clusters_peak_memory(CLUSTERS *clusters)
+{
+	return clusters->peak_memory ;
+}
+
+extern int nlgclu_clusters_out_of_memory(CLUSTERS *clusters)
+{
+	return clusters->out_of_memory ;
+}
+
+extern int nlgclu_clusters_stopped(CLUSTERS *clusters)
+{
+	return clusters->stopped ;
+}
+
+extern double nlgclu_clusters_coverage(CLUSTERS *clusters)
+{
+	return clusters->coverage ;
+}
+
+extern int nlgclu_clusters_copy(CLUSTERS *clusters, int *offsets, int noffsets, int *objectsA, int nobjectsA, int *objectsB, int nobjectsB)
+{
+	if ( noffsets != clusters->number + 1 || nobjectsA != clusters->size || nobjectsB != clusters->size )
+		return FALSE ;
+	memcpy(offsets, clusters->offsets, noffsets * sizeof(int)) ;
+	memcpy(objectsA, clusters->objectsA, nobjectsA * sizeof(int)) ;
+	memcpy(objectsB, clusters->objectsB, nobjectsB * sizeof(int)) ;
+	return TRUE ;
+}
+
+extern int nlgclu_clusters_frontier_size(CLUSTERS *clusters)
+{
+	return clusters->frontiersize ;
 }
 
+extern int nlgclu_clusters_copy_frontier(CLUSTERS *clusters, int *frontier, int nfrontier)
+{
+	if ( nfrontier != clusters->frontiersize )
+		return FALSE ;
+	if ( 0 < nfrontier )
+		memcpy(frontier, clusters->frontier, nfrontier * sizeof(int)) ;
+	return TRUE ;
+}
 
+extern void nlgclu_clusters_free(CLUSTERS *clusters)
+{
+	freeclusters(clusters) ;
+}
@@ -1,5 +1,20 @@
 /* File : nlgclu.h */
 /* Copyright (c) 2015, Yves Lepage */
 
-extern void nlgclu_in_C(char *fileA, char *fileB, char *clufile, int minsize, int maxsize, int verbose, int lineout, int focus) ;
+/* Clusters output in memory (see nlgclu.c). */
+typedef struct CLUSTERS_T CLUSTERS ;
 
+extern void nlgclu_in_C(char *fileA, char *fileB, char *clufile, int minsize, int maxsize, int verbose, int lineout, int focus) ;
+extern CLUSTERS *nlgclu_in_C_from_buffers(int *treeA, int lengthA, int *treeB, int lengthB, int minsize, int maxsize, int verbose, int *focus, int nfocus, int threads, int split_level, long memory_limit, int largest, double time_budget, int max_clusters, char *checkpoint, double checkpoint_interval) ;
+extern CLUSTERS *nlgclu_in_C_frontier(int *treeA, int lengthA, int *treeB, int lengthB, int minsize, int maxsize, int verbose, int *focus, int nfocus, int threads, int split_level, long memory_limit) ;
+extern CLUSTERS *nlgclu_in_C_from_tasks(int *treeA, int lengthA, int *treeB, int lengthB, int minsize, int maxsize, int verbose, int *focus, int nfocus, int *tasks, int ntasks, long memory_limit, int *counts, int ncounts) ;
+extern int nlgclu_clusters_number(CLUSTERS *clusters) ;
+extern int nlgclu_clusters_size(CLUSTERS *clusters) ;
+extern long nlgclu_clusters_peak_memory(CLUSTERS *clusters) ;
+extern int nlgclu_clusters_out_of_memory(CLUSTERS *clusters) ;
+extern int nlgclu_clusters_stopped(CLUSTERS *clusters) ;
+extern double nlgclu_clusters_coverage(CLUSTERS *clusters) ;
+extern int nlgclu_clusters_copy(CLUSTERS *clusters, int *offsets, int noffsets, int *objectsA, int nobjectsA, int *objectsB, int nobjectsB) ;
+extern int nlgclu_clusters_frontier_size(CLUSTERS *clusters) ;
+extern int nlgclu_clusters_copy_frontier(CLUSTERS *clusters, int *frontier, int nfrontier) ;
+extern void nlgclu_clusters_free(CLUSTERS *clusters) ;
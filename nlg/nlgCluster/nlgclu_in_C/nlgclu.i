@@ -3,6 +3,92 @@
 
 %{
 #include "nlgclu.h"
-extern void nlgclu_in_C(char *fileA, char *fileB, char *clufile, int minsize, int maxsize, int verbose, int lineout, int focus) ;
 %}
+
+/*
+ * Arrays passed as Python objects supporting the buffer protocol
+ * (e.g., contiguous numpy arrays of int32) instead of temporary files.
+ * No copy: the C program reads (tree) or writes (array) the memory of the Python object.
+ */
+
+%define INT32_BUFFER(NAME, FLAGS)
+%typemap(in) (int *NAME, int length) (Py_buffer view = { NULL }) {
+	const char *format = NULL ;
+
+	if ( -1 == PyObject_GetBuffer($input, &view, FLAGS) )
+		SWIG_fail ;
+	format = view.format ? view.format : "B" ;
+	if ( '@' == *format || '=' == *format || '<' == *format )
+		format += 1 ;
+	if ( sizeof(int) != view.itemsize || ! ( 0 == strcmp(format, "i") || ( sizeof(long) == sizeof(int) && 0 == strcmp(format, "l") ) ) )
+	{
+		PyErr_SetString(PyExc_TypeError, "a contiguous buffer of int32 is expected") ;
+		SWIG_fail ;
+	} ;
+	$1 = (int *) view.buf ;
+	$2 = (int) ( view.len / view.itemsize ) ;
+}
+
+%typemap(freearg) (int *NAME, int length) {
+	if ( view$argnum.obj )
+		PyBuffer_Release(&view$argnum) ;
+}
+%enddef
+
+INT32_BUFFER(tree, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT)
+INT32_BUFFER(objects, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT)
+INT32_BUFFER(array, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | PyBUF_WRITABLE)
+
+/*
+ * The C program has no global state (see CONTEXT in nlgclu.c):
+ * the GIL is released during the clustering so that other Python threads,
+ * possibly clustering other data, can run at the same time.
+ */
+
+%exception nlgclu_in_C {
+	Py_BEGIN_ALLOW_THREADS
+	$action
+	Py_END_ALLOW_THREADS
+}
+
+/*
+ * When the memory limit is exceeded, the clusters are incomplete:
+ * they are freed and MemoryError is raised instead of returning them.
+ * The memory limit is the 12th argument of all these functions.
+ */
+
+%define MEMORY_LIMIT_EXCEPTION(FUNCTION)
+%exception FUNCTION {
+	Py_BEGIN_ALLOW_THREADS
+	$action
+	Py_END_ALLOW_THREADS
+	if ( result && nlgclu_clusters_out_of_memory(result) )
+	{
+		PyErr_Format(PyExc_MemoryError, "memory limit of the clustering exceeded (%ld bytes, peak: %ld bytes)",
+			arg12, nlgclu_clusters_peak_memory(result)) ;
+		nlgclu_clusters_free(result) ;
+		SWIG_fail ;
+	} ;
+}
+%enddef
+
+MEMORY_LIMIT_EXCEPTION(nlgclu_in_C_from_buffers)
+MEMORY_LIMIT_EXCEPTION(nlgclu_in_C_frontier)
+MEMORY_LIMIT_EXCEPTION(nlgclu_in_C_from_tasks)
+
+typedef struct CLUSTERS_T CLUSTERS ;
+
 extern void nlgclu_in_C(char *fileA, char *fileB, char *clufile, int minsize, int maxsize, int verbose, int lineout, int focus) ;
+extern CLUSTERS *nlgclu_in_C_from_buffers(int *tree, int length, int *tree, int length, int minsize, int maxsize, int verbose, int *objects, int length, int threads, int split_level, long memory_limit, int largest, double time_budget, int max_clusters, char *checkpoint, double checkpoint_interval) ;
+extern CLUSTERS *nlgclu_in_C_frontier(int *tree, int length, int *tree, int length, int minsize, int maxsize, int verbose, int *objects, int length, int threads, int split_level, long memory_limit) ;
+extern CLUSTERS *nlgclu_in_C_from_tasks(int *tree, int length, int *tree, int length, int minsize, int maxsize, int verbose, int *objects, int length, int *objects, int length, long memory_limit, int *array, int length) ;
+extern int nlgclu_clusters_number(CLUSTERS *clusters) ;
+extern int nlgclu_clusters_size(CLUSTERS *clusters) ;
+extern long nlgclu_clusters_peak_memory(CLUSTERS *clusters) ;
+extern int nlgclu_clusters_out_of_memory(CLUSTERS *clusters) ;
+extern int nlgclu_clusters_stopped(CLUSTERS *clusters) ;
+extern double nlgclu_clusters_coverage(CLUSTERS *clusters) ;
+extern int nlgclu_clusters_copy(CLUSTERS *clusters, int *array, int length, int *array, int length, int *array, int length) ;
+extern int nlgclu_clusters_frontier_size(CLUSTERS *clusters) ;
+extern int nlgclu_clusters_copy_frontier(CLUSTERS *clusters, int *array, int length) ;
+extern void nlgclu_clusters_free(CLUSTERS *clusters) ;
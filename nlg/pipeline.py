@@ -6,6 +6,7 @@ import sys
 from nlg.Vector import Vectors
 from nlg.Cluster import ListOfClusters
 from nlg.nlgCluster.StrCluster import ListOfStrClusters
+from nlg.nlgCluster.Anchors import anchor_vectors, __anchor_default_number__
 from nlg.Grid import ListOfGrids
 
 ###############################################################################
@@ -13,6 +14,11 @@ from nlg.Grid import ListOfGrids
 __author__ = 'Fam Rashel <fam.rashel@fuji.waseda.jp>'
 
 __date__, __version__ = '20/12/2021', '1.0' # Creation
+__date__, __version__ = '17/10/2026', '1.1' # Feature selection before clustering (feature_number, feature_criterion)
+__date__, __version__ = '17/10/2026', '1.2' # Anchor words as features for clustering (anchors, anchor_selection)
+__date__, __version__ = '17/10/2026', '1.3' # Parallel clustering in the C program (threads)
+__date__, __version__ = '17/10/2026', '1.4' # Several focus words (focus: a word or a collection of words)
+__date__, __version__ = '17/10/2026', '1.5' # Largest clusters only (largest), sorted by decreasing size
 
 __description__ = """Functions which provide easy interface for pipeline process to:
 					- construct vector representation,
@@ -38,6 +44,12 @@ __lemma_dim__ = True
 __min_clu_size__ = 2
 __max_clu_size__ = None
 __focus__ = None
+__feature_number__ = None		# Number of features kept for clustering. None means that all features are used.
+__feature_criterion__ = 'variance'
+__anchors__ = False				# If true, cluster with the similarities to anchor words (number: feature_number) as features.
+__anchor_selection__ = 'farthest'
+__threads__ = 1					# Number of threads for the clustering (0: number of CPUs).
+__largest__ = None				# Number of largest clusters output (None: all clusters).
 
 # grids
 __saturation_threshold = float(0.0)
@@ -76,8 +88,28 @@ def strings2vectors(lines,
 
 def vectors2clusters(vectors,
 						min_cluster_size=__min_clu_size__, max_cluster_size=__max_clu_size__, focus=__focus__,
+						feature_number=__feature_number__, feature_criterion=__feature_criterion__,
+						anchors=__anchors__, anchor_selection=__anchor_selection__,
+						threads=__threads__, largest=__largest__,
 						verbose=__verbose__):
+	full_vectors = vectors
+	if anchors:
+		# The features are the similarities to anchor words (as many anchors as feature_number).
+		# As for a selection of features, words with the same similarities become indistinguishable.
+		if verbose: print('# Computing the similarities to anchor words...', file=sys.stderr)
+		vectors = anchor_vectors(vectors.words,
+				number=__anchor_default_number__ if feature_number is None else feature_number,
+				selection=anchor_selection, verbose=verbose)
+	elif feature_number is not None:
+		# Words which differ only on the dropped features become indistinguishable:
+		# they are added back to the clusters and checked by the distance constraints below.
+		if verbose: print(f'# Selecting {feature_number} features by {feature_criterion}...', file=sys.stderr)
+		vectors = vectors.select_features(feature_number, criterion=feature_criterion, verbose=verbose)
 	distinguishable_vectors = vectors.get_distinguishables()
+	if focus is not None:
+		# A focus word is represented by the first word of its indistinguishables (itself if unknown).
+		representative = lambda focus: vectors.indistinguishables.all(focus)[0]
+		focus = representative(focus) if isinstance(focus, str) else sorted(set( representative(word) for word in focus ))
 	if verbose:
 		print('# Clustering the words according to their feature vectors...', file=sys.stderr)
 		print(f'#\t- min cluster size: {min_cluster_size}', file=sys.stderr)
@@ -85,13 +117,27 @@ def vectors2clusters(vectors,
 	list_of_clusters = ListOfClusters.fromVectors(distinguishable_vectors,
 			minimal_size=min_cluster_size,
 			maximal_size=max_cluster_size,
-			focus=focus)
+			focus=focus,
+			threads=threads,
+			largest=largest if vectors is full_vectors else None)
 	if verbose: print('# Adding the indistinguishables...', file=sys.stderr)
 	list_of_clusters.set_indistinguishables(vectors.indistinguishables)
 	if verbose: print('# Checking distance constraints...', file=sys.stderr)
-	list_of_strclusters = ListOfStrClusters.fromListOfClusters(clusters=list_of_clusters,
-			minimal_size=min_cluster_size,
-			maximal_size=max_cluster_size)
+	if vectors is not full_vectors:
+		# The ratios agree on the selected features only: split by the differences of the full vectors.
+		list_of_strclusters = ListOfStrClusters.fromReducedClusters(list_of_clusters, full_vectors,
+				minimal_size=min_cluster_size,
+				maximal_size=max_cluster_size)
+	else:
+		list_of_strclusters = ListOfStrClusters.fromListOfClusters(clusters=list_of_clusters,
+				minimal_size=min_cluster_size,
+				maximal_size=max_cluster_size)
+	if largest is not None:
+		# The clusters of vectors may grow (indistinguishables) or be split (distance constraints):
+		# sort again and keep the largest ones among them.
+		# With reduced vectors, a cluster split by the full vectors may be smaller than a cluster
+		# which is not among the largest ones of the reduced vectors: all the clusters are computed.
+		list_of_strclusters[:] = sorted(list_of_strclusters, key=len, reverse=True)[:largest]
 	return list_of_strclusters
 
 def clusters2grids(clusters, min_cluster_size=__min_clu_size__, saturation=__saturation_threshold, verbose=__verbose__):
@@ -115,6 +161,9 @@ def strings2clusters(lines,
 					morph_feature=__morph_feature__, morph_delimiter=__morph_delimiter__,
 					lemma_feature=__lemma_feature__, lemma_dim=__lemma_dim__,
 					min_cluster_size=__min_clu_size__, max_cluster_size=__max_clu_size__, focus=__focus__,
+					feature_number=__feature_number__, feature_criterion=__feature_criterion__,
+					anchors=__anchors__, anchor_selection=__anchor_selection__,
+					threads=__threads__, largest=__largest__,
 					verbose=__verbose__):
 	vectors = strings2vectors(lines,
 			sigmorphon=sigmorphon,
@@ -125,6 +174,9 @@ def strings2clusters(lines,
 			verbose=verbose)
 	list_of_strclusters = vectors2clusters(vectors,
 			min_cluster_size=min_cluster_size, max_cluster_size=max_cluster_size, focus=focus,
+			feature_number=feature_number, feature_criterion=feature_criterion,
+			anchors=anchors, anchor_selection=anchor_selection,
+			threads=threads, largest=largest,
 			verbose=verbose)
 	return list_of_strclusters
 
@@ -135,6 +187,9 @@ def strings2grids(lines,
 				morph_feature=__morph_feature__, morph_delimiter=__morph_delimiter__,
 				lemma_feature=__lemma_feature__, lemma_dim=__lemma_dim__,
 				min_cluster_size=__min_clu_size__, max_cluster_size=__max_clu_size__, focus=__focus__,
+				feature_number=__feature_number__, feature_criterion=__feature_criterion__,
+				anchors=__anchors__, anchor_selection=__anchor_selection__,
+				threads=__threads__,
 				saturation=__saturation_threshold,
 				verbose=__verbose__):
 	vectors = strings2vectors(lines,
@@ -146,15 +201,24 @@ def strings2grids(lines,
 			verbose=verbose)
 	list_of_grids = vectors2grids(vectors,
 			min_cluster_size=min_cluster_size, max_cluster_size=max_cluster_size, focus=focus,
+			feature_number=feature_number, feature_criterion=feature_criterion,
+			anchors=anchors, anchor_selection=anchor_selection,
+			threads=threads,
 			saturation=saturation,
 			verbose=verbose)
 	return list_of_grids
 
 def vectors2grids(vectors,
 					min_cluster_size=__min_clu_size__, max_cluster_size=__max_clu_size__, focus=__focus__,
+					feature_number=__feature_number__, feature_criterion=__feature_criterion__,
+					anchors=__anchors__, anchor_selection=__anchor_selection__,
+					threads=__threads__,
 					saturation=__saturation_threshold, verbose=__verbose__):
 	list_of_strclusters = vectors2clusters(vectors,
 			min_cluster_size=min_cluster_size, max_cluster_size=max_cluster_size, focus=focus,
+			feature_number=feature_number, feature_criterion=feature_criterion,
+			anchors=anchors, anchor_selection=anchor_selection,
+			threads=threads,
 			verbose=verbose)
 	list_of_grids = clusters2grids(list_of_strclusters,
 			min_cluster_size=min_cluster_size, saturation=saturation,
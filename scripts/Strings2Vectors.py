@@ -14,6 +14,7 @@ from nlg.Vector import Vectors
 
 __author__ = 'Fam Rashel <fam.rashel@fuji.waseda.jp>'
 __date__, __version__ = '03/09/2020', '1.00' # Creation
+__date__, __version__ = '17/10/2026', '1.10' # Option -b to write the vectors in binary format
 __description__ = 'Produce vectors from list of strings'
 
 ###############################################################################
@@ -52,6 +53,9 @@ def read_argv():
 	parser.add_argument('-l', '--lemma_dim',
                   action='store_true', dest='lemma_dim', default=True,
                   help='generate separated vectors for lemmas (SIGMORPHON data)')
+	parser.add_argument('-b', '--binary',
+                  action='store', dest='binary', type=str, default=None, metavar='DIR',
+                  help='write the vectors in binary format into directory DIR instead of printing them')
 	parser.add_argument('-V', '--verbose',
                   action='store_true', dest='verbose', default=False,
                   help='runs in verbose mode')
@@ -87,14 +91,18 @@ if __name__ == '__main__':
 		print(f"#\t- lemma: {options.lemma_feature}", file=sys.stderr)
 	
 	if options.sigmorphon:
-		print(Vectors.fromSigmorphonFile(lines=lines,
+		vectors = Vectors.fromSigmorphonFile(lines=lines,
 									char_feature=options.char_feature,
 									morph_feature=options.morph_feature,
 									lemma_feature=options.lemma_feature,
-									lemma_dim=options.lemma_dim))
+									lemma_dim=options.lemma_dim)
 	else:
-		print(Vectors.fromFile(lines=lines,
+		vectors = Vectors.fromFile(lines=lines,
 					char_feature=options.char_feature,
 					token_feature=options.token_feature,
-					token_delimiter=options.token_delimiter))
+					token_delimiter=options.token_delimiter)
+	if options.binary is not None:
+		vectors.toBinary(options.binary)
+	else:
+		print(vectors)
 	if options.verbose: print(f'# {os.path.basename(__file__)} - Processing time: {(datetime.now() - t_start)}', file=sys.stderr)
\ No newline at end of file
@@ -14,6 +14,11 @@ from nlg.pipeline import vectors2grids
 
 __author__ = 'Fam Rashel <fam.rashel@fuji.waseda.jp>'
 __date__, __version__ = '03/09/2020', '0.10' # Creation
+__date__, __version__ = '17/10/2026', '0.20' # Option -b to read the vectors in binary format (memory-mapped)
+__date__, __version__ = '17/10/2026', '0.30' # Options -f and -c for feature selection before clustering
+__date__, __version__ = '17/10/2026', '0.40' # Options -A and -a for anchor words as features
+__date__, __version__ = '17/10/2026', '0.50' # Option -j for the number of threads of the clustering
+__date__, __version__ = '17/10/2026', '0.60' # Option -F may be repeated for several focus words
 __description__ = 'Produce analogical grids from a list of vectors.'
 
 ###############################################################################
@@ -23,12 +28,13 @@ def read_argv():
 	this_description = __description__
 	this_usage = """
 	%(prog)s  <  FILE_OF_VECTORS
+	%(prog)s  -b DIR_OF_BINARY_VECTORS
 	"""
 
 	parser = ArgumentParser(description=this_description, usage=this_usage, epilog=this_version)
 	parser.add_argument('-F','--focus',
-					action='store', type=str, default=None,
-					help = 'only output those clusters which contain the word FOCUS')
+					action='append', type=str, default=None,
+					help = 'only output those clusters which contain the word FOCUS (may be repeated: clusters which contain at least one of the words)')
 	parser.add_argument('-m','--minimal_cluster_size',
 					action='store', type=int, default=2,
 					help = 'minimal size in clusters (default: %(default)s, ' \
@@ -36,12 +42,32 @@ def read_argv():
 	parser.add_argument('-M','--maximal_cluster_size',
 					action='store', type=int, default=None,
 					help = 'maximal size of clusters output (default: no limit)')
+	parser.add_argument('-f','--feature_number',
+					action='store', type=int, default=None,
+					help = 'number of features kept for clustering, those with the highest scores ' \
+								'(default: %(default)s, to use all features)')
+	parser.add_argument('-c','--feature_criterion',
+					action='store', type=str, default='variance', choices=['variance', 'entropy'],
+					help = 'score of the features for option -f: variance or entropy of the counts (default: %(default)s)')
+	parser.add_argument('-A','--anchors',
+					action='store_true', default=False,
+					help = 'use similarities to anchor words instead of the features of the vectors ' \
+								'(number of anchors given by option -f, default: 100)')
+	parser.add_argument('-a','--anchor_selection',
+					action='store', type=str, default='farthest', choices=['random', 'frequency', 'farthest'],
+					help = 'choice of the anchor words for option -A (default: %(default)s)')
 	parser.add_argument('-d', '--saturation',
 						action='store', dest='saturation', type=float, default=0,
 						help='min saturation (0 - 1.0) to keep when building grids (default = %(default)s)')
 	parser.add_argument('--pretty-print',
 						action='store', dest='pretty_print', type=str, default=None,
 						help='print the grids in the representation for HUMAN instead of SCRIPT format')
+	parser.add_argument('-j','--threads',
+					action='store', type=int, default=1,
+					help = 'number of threads for the clustering (default: %(default)s, 0 for the number of CPUs)')
+	parser.add_argument('-b', '--binary',
+					action='store', type=str, default=None, metavar='DIR',
+					help = 'read the vectors in binary format from directory DIR (output of Strings2Vectors.py -b) instead of the standard input')
 	parser.add_argument('-V', '--verbose',
                   action='store_true', dest='verbose', default=False,
                   help='runs in verbose mode')
@@ -52,13 +78,27 @@ def read_argv():
 
 if __name__ == '__main__':
 	options = read_argv()
+	if options.feature_number is not None and 1 > options.feature_number:
+		print('Number of features should be equal to or greater than 1.', file=sys.stderr)
+		exit(-1)
+	if 0 > options.threads:
+		print('Number of threads should be equal to or greater than 0.', file=sys.stderr)
+		exit(-1)
 	t_start = datetime.now()
 	if options.verbose: print('# Reading words and their vector representations...', file=sys.stderr)
-	vectors = Vectors.fromListOfVectors(lines=sys.stdin)
+	if options.binary is not None:
+		vectors = Vectors.fromBinary(options.binary, mmap_mode='r')
+	else:
+		vectors = Vectors.fromListOfVectors(lines=sys.stdin)
 	list_of_grids = vectors2grids(vectors,
 			min_cluster_size=options.minimal_cluster_size,
 			max_cluster_size=options.maximal_cluster_size,
 			focus=options.focus,
+			feature_number=options.feature_number,
+			feature_criterion=options.feature_criterion,
+			anchors=options.anchors,
+			anchor_selection=options.anchor_selection,
+			threads=options.threads,
 			saturation=options.saturation,
 			verbose=options.verbose)
 	
@@ -15,13 +15,16 @@ setup(name = 'nlg',
 						extra_compile_args = ['-std=c99']),
 					 Extension('_nlgclu',
 						sources = ['nlg/nlgCluster/nlgclu_in_C/nlgclu.i', 'nlg/nlgCluster/nlgclu_in_C/nlgclu.c'],
-						# swig_opts=['-modern', '-new_repr'] # Comment this line if you have newer version of swig
+						# swig_opts=['-modern', '-new_repr'], # Comment this line if you have newer version of swig
+						extra_compile_args = ['-pthread'],		# Parallel traversal (threads).
+						extra_link_args = ['-pthread']
 					)],
 	# packages=['nlg'],
 	packages = setuptools.find_packages(),
 	install_requires=[
 		  'tabulate',
           'numpy',
+		  'scipy',
 		  'matplotlib'
       ],
 	python_requires = '>=3.5'
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import argparse
+
+from tabulate import tabulate
+
+from nlg.Vector import char_count_matrix
+
+###############################################################################
+
+__author__ = 'Fam Rashel <fam.rashel@fuji.waseda.jp>'
+__date__, __version__ = '17/10/2026', '0.10' # Creation
+__description__ = 'benchmarking the character featurizer: per line (line.count per symbol) vs. one pass (char_count_matrix)'
+
+__list_of_file__ = [
+	"de.words.1k",
+	"fi.words.1k",
+	"sv.words.1k",
+	"de.words.5k",
+	"fi.words.5k",
+	"sv.words.5k",
+	"de.words.10k",
+	"fi.words.10k",
+	"sv.words.10k",
+	"de.words.20k",
+	"fi.words.20k",
+	"sv.words.20k"
+]
+
+###############################################################################
+
+def read_argv():
+	this_version = 'v%s (c) %s %s' % (__version__, __date__.split('/')[2], __author__)
+	this_description = __description__
+	this_usage = """
+	%(prog)s  [FILE_OF_WORDS ...]
+	"""
+
+	parser = argparse.ArgumentParser(description=this_description, usage=this_usage, epilog=this_version)
+	parser.add_argument('files',
+					action='store', type=str, nargs='*', default=__list_of_file__,
+					help = 'files of words (default: the *.words.* files in this directory)')
+	parser.add_argument('-V', '--verbose',
+                  action='store_true', dest='verbose', default=False,
+                  help='runs in verbose mode')
+
+	return parser.parse_args()
+
+def per_line_vectors(lines):
+	"""
+	Former computation: one line.count(char) per symbol in the alphabet for each line.
+	"""
+	alphabet = sorted(list(frozenset( c for line in lines for c in line )))
+	vectors = [ tuple( line.count(char) for char in alphabet ) for line in lines ]
+	return alphabet, vectors
+
+###############################################################################
+
+if __name__ == '__main__':
+	options = read_argv()
+	os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+	time_result = []
+	for filename in options.files:
+		lines = [ line.strip() for line in open(filename) ]
+		if options.verbose: print(f'# {filename}: {len(lines)} lines', file=sys.stderr)
+
+		t_start = time.time()
+		alphabet_per_line, vectors_per_line = per_line_vectors(lines)
+		duration_per_line = time.time() - t_start
+
+		t_start = time.time()
+		alphabet_one_pass, counts = char_count_matrix(lines)
+		duration_one_pass = time.time() - t_start
+
+		identical = alphabet_per_line == alphabet_one_pass \
+			and [ tuple(row) for row in counts.toarray().tolist() ] == vectors_per_line
+		time_result.append([filename, len(lines), len(alphabet_one_pass),
+			duration_per_line, duration_one_pass, duration_per_line / max(duration_one_pass, 1e-9), identical])
+
+	print(tabulate(time_result, headers=["Filename", "Lines", "Alphabet", "Per line (s)", "One pass (s)", "Speed-up", "Identical"]))
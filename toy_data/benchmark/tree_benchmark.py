@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from tabulate import tabulate
+
+from nlg.Vector import Vectors
+from nlg.nlgCluster.nlgclu import FeatureMatrix
+
+###############################################################################
+
+__author__ = 'Fam Rashel <fam.rashel@fuji.waseda.jp>'
+__date__, __version__ = '17/10/2026', '0.10' # Creation
+__description__ = 'benchmarking the construction of the feature matrix for the feature tree: ' \
+					'one np.append per word and one sort per column vs. one allocation and one lexsort'
+
+__list_of_file__ = [
+	"de.words.5k",
+	"fi.words.5k",
+	"sv.words.5k",
+	"de.words.10k",
+	"fi.words.10k",
+	"sv.words.10k",
+	"de.words.20k",
+	"fi.words.20k",
+	"sv.words.20k"
+]
+
+###############################################################################
+
+def read_argv():
+	this_version = 'v%s (c) %s %s' % (__version__, __date__.split('/')[2], __author__)
+	this_description = __description__
+	this_usage = """
+	%(prog)s  [FILE_OF_WORDS ...]
+	"""
+
+	parser = argparse.ArgumentParser(description=this_description, usage=this_usage, epilog=this_version)
+	parser.add_argument('files',
+					action='store', type=str, nargs='*', default=__list_of_file__,
+					help = 'files of words (default: the *.words.{5,10,20}k files in this directory)')
+	parser.add_argument('-V', '--verbose',
+                  action='store_true', dest='verbose', default=False,
+                  help='runs in verbose mode')
+
+	return parser.parse_args()
+
+def former_feature_matrix(vectors):
+	"""
+	Former computation: one np.append per word to add its index,
+	then one stable argsort and one copy of the whole matrix per column.
+	Return the levels (first level of 0's) and the words in the order of the tree.
+	"""
+	rows = {}
+	for i, word in enumerate(vectors):
+		rows[word] = np.append(np.array(vectors[word]), i)
+	lines = { rows[word][-1] : word for word in rows }
+	fv = np.array([ rows[word] for word in rows ])
+	for i in range(fv.shape[1])[::-1]:
+		fv = fv[fv[:,i].argsort(kind='mergesort')]
+	matrix = np.transpose(fv)
+	fm = np.append(np.zeros((1, len(matrix[0])), dtype=np.int64), matrix[:-1], axis=0)
+	return fm, [ lines[i] for i in matrix[-1] ]
+
+###############################################################################
+
+if __name__ == '__main__':
+	options = read_argv()
+	os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+	time_result = []
+	for filename in options.files:
+		vectors = Vectors.fromFile([ line.strip() for line in open(filename) ])
+		if options.verbose: print(f'# {filename}: {len(vectors)} words, {len(vectors.dimension)} features', file=sys.stderr)
+
+		t_start = time.time()
+		fm_former, lines_former = former_feature_matrix(vectors)
+		duration_former = time.time() - t_start
+
+		t_start = time.time()
+		fm = FeatureMatrix(vectors)
+		duration = time.time() - t_start
+
+		identical = lines_former == fm.lines and np.array_equal(fm_former, np.array(fm))
+		time_result.append([filename, len(vectors), len(vectors.dimension), np.array(fm).dtype,
+			duration_former, duration, duration_former / max(duration, 1e-9), identical])
+
+	print(tabulate(time_result, headers=["Filename", "Words", "Features", "Type", "Former (s)", "New (s)", "Speed-up", "Identical"]))